@@ -1,17 +1,41 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from ..core.database import get_db
 from ..models import Comic
 from ..schemas import Comic as ComicSchema, ComicCreate
+from ..services.data_versions import CATALOG, COMICS, data_versions
+from ..services.model_registry import model_registry
 from .auth import get_current_user
+from .etags import etag, not_modified
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[ComicSchema])
-def get_comics(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    comics = db.query(Comic).offset(skip).limit(limit).all()
+def get_comics(request: Request, response: Response, skip: int = 0, limit: int = 100,
+               character: Optional[str] = None, db: Session = Depends(get_db)):
+    # Listed comics show every column, image_url included, so tags follow the comics version
+    catalog_version, comics_version = data_versions.get(db, CATALOG, COMICS)
+    if character is None:
+        cached = not_modified(request, response, etag('comics', comics_version))
+        if cached is not None:
+            return cached
+        # Both paths page in id order, so a page holds the same comics whichever one serves it
+        comics = db.query(Comic).order_by(Comic.id).offset(skip).limit(limit).all()
+        return comics
+
+    # Served from the in-memory character index rather than scanning the JSON column
+    model = model_registry.get_model(db, catalog_version)
+    # The index may still lag the catalog, so the tag also follows the model
+    cached = not_modified(request, response, etag('comics', comics_version, *model.cache_key))
+    if cached is not None:
+        return cached
+    # Catalog order puts edited comics last, so sort to page in id order like the unfiltered list
+    comic_ids = sorted(model.catalog.ids_with_character(character).tolist())[skip:skip + limit]
+    if not comic_ids:
+        return []
+    comics = db.query(Comic).filter(Comic.id.in_(comic_ids)).order_by(Comic.id).all()
     return comics
 
 
@@ -29,4 +53,5 @@ def create_comic(comic: ComicCreate, db: Session = Depends(get_db), current_user
     db.add(db_comic)
     db.commit()
     db.refresh(db_comic)
-    return db_comic
\ No newline at end of file
+    # The commit queued the comic for the model; the background rebuild adds it to the live index
+    return db_comic
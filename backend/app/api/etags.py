@@ -0,0 +1,23 @@
+from typing import Hashable, Optional
+from fastapi import Request, Response
+
+
+def etag(*versions: Hashable) -> str:
+    """Weak ETag of a response that is fully determined by the given data versions"""
+    return 'W/"' + '-'.join(str(version) for version in versions) + '"'
+
+
+def not_modified(request: Request, response: Response, tag: str, private: bool = False) -> Optional[Response]:
+    """A 304 response if the client already holds tag; otherwise tag is set on response and None returned.
+
+    Responses for the authenticated user must pass private, so shared caches
+    do not store them and clients keep one copy per Authorization header.
+    """
+    headers = {'ETag': tag}
+    if private:
+        headers.update({'Cache-Control': 'private', 'Vary': 'Authorization'})
+    held = {value.strip() for value in request.headers.get('if-none-match', '').split(',')}
+    if tag in held or '*' in held:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
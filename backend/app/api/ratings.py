@@ -1,14 +1,26 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from ..core.database import get_db
 from ..models import UserRating, User
 from ..schemas import RatingCreate, Rating as RatingSchema
+from ..services.cache import recommendation_cache
+from ..services.collaborative import co_rating_model
+from ..services.data_versions import data_versions, user_ratings_key
+from ..services.popularity import popularity_ranking
 from .auth import get_current_user
+from .etags import etag, not_modified
 
 router = APIRouter()
 
 
+def _after_rating_saved(user_id: int, comic_id: int, old_rating, new_rating: float):
+    """Keep the in-memory recommendation state in step with a committed rating"""
+    co_rating_model.update(user_id, comic_id, new_rating)
+    popularity_ranking.record(comic_id, old_rating, new_rating)
+    recommendation_cache.invalidate_user(user_id)
+
+
 @router.post("/", response_model=RatingSchema)
 def create_rating(rating: RatingCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     # Check if user already rated this comic
@@ -19,9 +31,11 @@ def create_rating(rating: RatingCreate, db: Session = Depends(get_db), current_u
     
     if existing_rating:
         # Update existing rating
+        old_rating = existing_rating.rating
         existing_rating.rating = rating.rating
         db.commit()
         db.refresh(existing_rating)
+        _after_rating_saved(current_user.id, rating.comic_id, old_rating, rating.rating)
         return existing_rating
     else:
         # Create new rating
@@ -33,11 +47,18 @@ def create_rating(rating: RatingCreate, db: Session = Depends(get_db), current_u
         db.add(db_rating)
         db.commit()
         db.refresh(db_rating)
+        _after_rating_saved(current_user.id, rating.comic_id, None, rating.rating)
         return db_rating
 
 
 @router.get("/", response_model=List[RatingSchema])
-def get_user_ratings(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_user_ratings(request: Request, response: Response, db: Session = Depends(get_db),
+                     current_user: User = Depends(get_current_user)):
+    # Counters of different users can match, so the tag names the user
+    user_version, = data_versions.get(db, user_ratings_key(current_user.id))
+    cached = not_modified(request, response, etag('ratings', current_user.id, user_version), private=True)
+    if cached is not None:
+        return cached
     ratings = db.query(UserRating).filter(UserRating.user_id == current_user.id).all()
     return ratings
 
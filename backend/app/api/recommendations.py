@@ -1,9 +1,14 @@
-from typing import List
-from fastapi import APIRouter, Depends
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
+from ..core.config import settings
 from ..core.database import get_db
 from ..models import User
 from ..schemas import Recommendation
+from ..services.cache import recommendation_cache
+from ..services.executor import ExecutorBusy, recommendation_executor
+from ..services.model_registry import model_registry
+from ..services.pagination import CursorExpired, InvalidCursor
 from ..services.recommendation import RecommendationService
 from .auth import get_current_user
 
@@ -12,10 +17,55 @@ router = APIRouter()
 
 @router.get("/", response_model=List[Recommendation])
 def get_recommendations(
-    limit: int = 5,
+    response: Response,
+    limit: int = Query(5, ge=1, le=settings.recommendation_max_page_size),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    """A page of recommendations, best first.
+
+    While more remain, the X-Next-Cursor header holds the cursor of the next
+    page. A cursor answers 410 once the user rated a comic or the catalog
+    changed; start again from the first page then.
+    """
     recommendation_service = RecommendationService(db)
-    recommendations = recommendation_service.get_recommendations(current_user.id, limit)
-    return recommendations
\ No newline at end of file
+    try:
+        recommendations, next_cursor = recommendation_service.get_page(current_user.id, limit, cursor)
+    except ExecutorBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"},
+        )
+    except CursorExpired as e:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=str(e))
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    response.headers["Server-Timing"] = _server_timing(recommendation_service.stage_timings)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return recommendations
+
+
+def _server_timing(stages) -> str:
+    """Server-Timing header value, e.g. 'content;dur=0.41;desc="n=120"' with n the stage's item count"""
+    return ", ".join(
+        f'{name};dur={milliseconds:.2f}' + (f';desc="n={count}"' if count is not None else '')
+        for name, milliseconds, count in stages
+    )
+
+
+@router.get("/cache")
+def get_cache_stats(current_user: User = Depends(get_current_user)):
+    """Hit/miss counters of the per-user recommendation cache"""
+    return recommendation_cache.stats()
+
+
+@router.get("/status")
+def get_recommendation_status(current_user: User = Depends(get_current_user)):
+    """Live model version, last rebuild duration and worker pool load"""
+    return {
+        "model": model_registry.status(),
+        "executor": recommendation_executor.stats(),
+    }
@@ -1,17 +1,35 @@
-from typing import Dict
-from fastapi import APIRouter, Depends
+from typing import Dict, Optional, Tuple
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from ..core.database import get_db
 from ..models import Comic
+from ..services.data_versions import COMICS, data_versions
+from .etags import etag, not_modified
 
 router = APIRouter()
 
+# (comics version, stats) of the last computed stats; they only change with the comics table
+_stats_cache: Optional[Tuple[int, Dict]] = None
+
 
 @router.get("/stats")
-def get_comic_stats(db: Session = Depends(get_db)) -> Dict:
+def get_comic_stats(request: Request, response: Response, db: Session = Depends(get_db)) -> Dict:
     """Get statistics about the comic database"""
-    
+    global _stats_cache
+    # Sources count external_id, which the model ignores, so the stats follow every comic column
+    comics_version = data_versions.get(db, COMICS)[0]
+    cached = not_modified(request, response, etag('stats', comics_version))
+    if cached is not None:
+        return cached
+    if _stats_cache is not None and _stats_cache[0] == comics_version:
+        return _stats_cache[1]
+    _stats_cache = (comics_version, _compute_stats(db))
+    return _stats_cache[1]
+
+
+def _compute_stats(db: Session) -> Dict:
+    """Totals, sources and top genres of the catalog"""
     # Total comics
     total_comics = db.query(Comic).count()
     
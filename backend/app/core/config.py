@@ -16,6 +16,45 @@ class Settings(BaseSettings):
     # ComicVine API settings
     comic_vine_api_key: Optional[str] = None
     
+    # Recommendation engine settings
+    recommendation_strategy: str = "profile"  # "profile", "neighbors", "ann", "collaborative", "als", "characters", "pipeline" or "sharded"
+    pipeline_generators: str = "content,co_rating,popularity,characters"  # Candidate generators of the "pipeline" strategy
+    pipeline_candidate_budget: int = 400  # Candidates scored per request by the "pipeline" strategy
+    pipeline_generator_weight: float = 0.3  # Share of the "pipeline" score from generator evidence
+    shard_min_affinity: float = 0.0  # "sharded" scores genres holding more than this share of the user's likes
+    shard_workers: Optional[int] = None  # Threads scoring shards in parallel; unset = one per core
+    character_weight: float = 0.3  # Share of the "characters" score that comes from shared characters
+    recommendation_features: str = "tfidf"  # "tfidf", "hashing" to add new comics without a refit, or "lsa" dense embeddings
+    lsa_dimensions: int = 128  # Embedding size of the "lsa" backend, 64-256 is typical
+    hashing_features_bits: int = 18  # Hashing backend uses 2**bits feature columns
+    recommendation_neighbors: int = 50  # Precomputed similar comics kept per comic
+    vector_precision: Optional[str] = None  # "float32", "float16" or "int8" to store features and factors compactly; unset = as built
+    diversity_lambda: Optional[float] = None  # MMR re-ranking, 1.0 = pure relevance, lower = more diverse; unset = off
+    diversity_candidates: int = 300  # Candidates the MMR stage re-ranks
+    co_rating_check_seconds: int = 30  # How often the co-rating model looks for ratings written by other processes
+    popularity_prior_weight: float = 5.0  # Pseudo-ratings at the global mean in the Bayesian average
+    popularity_refresh_seconds: int = 60  # How often the popularity aggregates are reloaded from the database
+    popularity_rerank_seconds: int = 5  # How often ratings recorded by this process are folded into the ranking
+    feature_store_dir: Optional[str] = None  # e.g. ./model_data/features to share one mmap'd model across workers
+    index_refit_drift: float = 0.2  # Refit once comics added or tombstoned since the last fit pass this share of it
+    catalog_rebuild_interval: int = 300  # Seconds between scheduled catalog checks by the background model rebuild; 0 = only on change
+    recommendation_executor: str = "thread"  # "thread", or "process" (best with feature_store_dir)
+    recommendation_workers: int = 2  # Concurrent recommendation computations
+    recommendation_queue_depth: int = 16  # Waiting computations before requests get a 503
+    recommendation_ranking_size: int = 100  # Comics ranked at once per user; pages are served from this ranking
+    recommendation_max_page_size: int = 50  # Largest limit a recommendations page may ask for
+    recommendation_cache_size: int = 1024  # Cached rankings (user, ranking size, model and ratings version)
+    recommendation_cache_ttl: int = 300  # Seconds before a cached ranking is recomputed
+    
+    # Approximate nearest-neighbor (LSH) index used by the "ann" strategy
+    ann_tables: int = 8
+    ann_bits: Optional[int] = None  # Sized from the catalog when unset
+    ann_probes: int = 2
+    ann_index_path: Optional[str] = None  # Reuse the index across restarts when set
+    
+    # Matrix-factorization model written by train_als.py and served by the "als" strategy
+    als_model_dir: str = "./model_data/als"
+    
     # For demo purposes, we'll use a free comic image API
     comic_image_api_base: str = "https://comicvine.gamespot.com/api"
     
@@ -1,6 +1,6 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from .config import settings
 
 # Use SQLite with check_same_thread=False for FastAPI compatibility
@@ -18,4 +18,26 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def _data_versions():
+    # Imported on first flush: the services are built on the models, which are built on this module
+    from ..services.data_versions import data_versions
+    return data_versions
+
+
+# Every ORM writer bumps the catalog and ratings data versions, scripts as well as the API
+@event.listens_for(Session, 'after_flush')
+def _bump_data_versions(session, flush_context):
+    _data_versions().flushed(session)
+
+
+@event.listens_for(Session, 'after_commit')
+def _commit_data_versions(session):
+    _data_versions().session_committed(session)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _roll_back_data_versions(session):
+    _data_versions().session_rolled_back(session)
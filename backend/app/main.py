@@ -15,6 +15,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Recommendation paging
 )
 
 # Include routers
@@ -32,6 +33,18 @@ async def startup_event():
     from .core.database import engine
     from .models import Base
     Base.metadata.create_all(bind=engine)
+    # Build the first model in the background, then run scheduled and on-change rebuilds
+    from .services.model_registry import model_registry
+    model_registry.warm()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Stop the recommendation worker pool and the model rebuild thread"""
+    from .services.executor import recommendation_executor
+    from .services.model_registry import model_registry
+    recommendation_executor.shutdown()
+    model_registry.stop(timeout=5)
+
 
 @app.get("/")
 def read_root():
@@ -40,4 +40,11 @@ class UserRating(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="ratings")
-    comic = relationship("Comic", back_populates="ratings")
\ No newline at end of file
+    comic = relationship("Comic", back_populates="ratings")
+
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+
+    key = Column(String, primary_key=True)  # "catalog", "catalog:edits", "comics", "ratings" or "ratings:user:<id>"
+    version = Column(Integer, nullable=False, default=0)  # Bumped by every flush that changes that data
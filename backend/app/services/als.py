@@ -0,0 +1,198 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional, Tuple
+import numpy as np
+from scipy import sparse
+from .quantization import QuantizedDense, quantize
+
+# Every save_factors call writes a v-<stamp> directory of these and points CURRENT at it
+CURRENT_FILE = 'CURRENT'
+FACTOR_FILES = ('user_ids.npy', 'item_ids.npy', 'user_factors.npy', 'item_factors.npy')
+# Per-row scales of quantized user and item factors
+SCALE_FILES = ('user_scales.npy', 'item_scales.npy')
+
+
+def _solve_block(fixed: np.ndarray, matrix: sparse.csr_matrix, start: int, stop: int,
+                 regularization: float) -> np.ndarray:
+    """Least-squares factors for rows start..stop of the rating matrix, holding the other side fixed"""
+    n_factors = fixed.shape[1]
+    block = matrix[start:stop]
+    counts = np.diff(block.indptr)
+    factors = np.zeros((stop - start, n_factors), dtype=np.float32)
+    rated = np.flatnonzero(counts)
+    if len(rated) == 0:
+        return factors
+
+    # Gram matrices as one sparse product: (rows x touched columns) @ (column outer products)
+    columns, local = np.unique(block.indices, return_inverse=True)
+    vectors = fixed[columns]
+    outer = (vectors[:, :, None] * vectors[:, None, :]).reshape(len(columns), n_factors * n_factors)
+    shape = (stop - start, len(columns))
+    indicator = sparse.csr_matrix((np.ones_like(block.data), local, block.indptr), shape=shape)
+    values = sparse.csr_matrix((block.data, local, block.indptr), shape=shape)
+    gram = (indicator @ outer).reshape(-1, n_factors, n_factors)[rated]
+    rhs = (values @ vectors)[rated]
+
+    # Weighted-lambda regularization: each row is penalized by its number of ratings
+    gram += (regularization * counts[rated])[:, None, None] * np.eye(n_factors, dtype=np.float32)
+    factors[rated] = np.linalg.solve(gram, rhs[:, :, None])[:, :, 0]
+    return factors
+
+
+def _solve_side(fixed: np.ndarray, matrix: sparse.csr_matrix, regularization: float,
+                pool: ThreadPoolExecutor, max_block_bytes: int) -> np.ndarray:
+    """Solve every row of the rating matrix in blocks spread across the thread pool"""
+    n_factors = fixed.shape[1]
+    # Keep each block's column outer products under max_block_bytes
+    max_nnz = max(1, max_block_bytes // (4 * n_factors * n_factors))
+    blocks, start = [], 0
+    while start < matrix.shape[0]:
+        stop = int(np.searchsorted(matrix.indptr, matrix.indptr[start] + max_nnz, side='right')) - 1
+        stop = min(max(stop, start + 1), matrix.shape[0])
+        blocks.append((start, stop))
+        start = stop
+    results = pool.map(lambda block: _solve_block(fixed, matrix, block[0], block[1], regularization), blocks)
+    return np.vstack(list(results)) if blocks else np.zeros((0, n_factors), dtype=np.float32)
+
+
+def train_als(ratings: Iterable[Tuple[int, int, float]], n_factors: int = 32, regularization: float = 0.1,
+              iterations: int = 10, n_jobs: Optional[int] = None, seed: int = 0,
+              max_block_bytes: int = 64 * 1024 * 1024):
+    """Explicit-feedback alternating least squares on (user_id, comic_id, rating) rows.
+
+    Returns (user_factors, item_factors, user_ids, item_ids). Each half-step
+    solves the per-user (or per-item) normal equations in batches with NumPy;
+    the batches run on n_jobs threads, which LAPACK and the NumPy kernels
+    release the GIL for.
+    """
+    ratings = list(ratings)
+    users, items, values = zip(*ratings) if ratings else ((), (), ())
+    user_ids, user_index = np.unique(np.asarray(users, dtype=np.int64), return_inverse=True)
+    item_ids, item_index = np.unique(np.asarray(items, dtype=np.int64), return_inverse=True)
+    by_user = sparse.csr_matrix(
+        (np.asarray(values, dtype=np.float32), (user_index, item_index)),
+        shape=(len(user_ids), len(item_ids)),
+    )
+    by_item = by_user.T.tocsr()
+
+    rng = np.random.default_rng(seed)
+    user_factors = np.zeros((len(user_ids), n_factors), dtype=np.float32)
+    item_factors = (rng.standard_normal((len(item_ids), n_factors)) / np.sqrt(n_factors)).astype(np.float32)
+
+    with ThreadPoolExecutor(max_workers=n_jobs or os.cpu_count()) as pool:
+        for _ in range(iterations):
+            user_factors = _solve_side(item_factors, by_user, regularization, pool, max_block_bytes)
+            item_factors = _solve_side(user_factors, by_item, regularization, pool, max_block_bytes)
+
+    return user_factors, item_factors, user_ids, item_ids
+
+
+def save_factors(directory: str, user_factors: np.ndarray, item_factors: np.ndarray,
+                 user_ids: np.ndarray, item_ids: np.ndarray, precision: Optional[str] = None,
+                 keep_versions: int = 2) -> str:
+    """Write the factor matrices and id arrays as a new version and make it live. Returns its name.
+
+    Like the FeatureStore, each version is written to a temporary directory,
+    renamed to v-<stamp> and only then made live by atomically replacing the
+    CURRENT pointer, so readers never see a mix of two trainings. With
+    precision "float16" or "int8" the factor files hold quantized codes and
+    SCALE_FILES their per-row scales.
+    """
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f'.tmp-{uuid.uuid4().hex}')
+    os.makedirs(tmp_path)
+    factors = [quantize(factors.astype(np.float32), precision) for factors in (user_factors, item_factors)]
+    files = [(name, matrix.row_scales) for name, matrix in zip(SCALE_FILES, factors) if isinstance(matrix, QuantizedDense)]
+    files += zip(FACTOR_FILES, (
+        user_ids.astype(np.int64), item_ids.astype(np.int64),
+        *(matrix.codes if isinstance(matrix, QuantizedDense) else matrix for matrix in factors),
+    ))
+    for name, array in files:
+        np.save(os.path.join(tmp_path, name), array)
+
+    name = f'v-{time.time_ns()}'
+    os.rename(tmp_path, os.path.join(directory, name))
+    pointer_path = os.path.join(directory, CURRENT_FILE)
+    pointer_tmp = f'{pointer_path}.{uuid.uuid4().hex}'
+    with open(pointer_tmp, 'w') as f:
+        f.write(name)
+    os.replace(pointer_tmp, pointer_path)
+    # Readers still mapping a removed version keep their pages until they reload
+    versions = sorted(entry for entry in os.listdir(directory) if entry.startswith('v-'))
+    for old in versions[:-keep_versions]:
+        if old != name:
+            shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+    return name
+
+
+def _live_path(directory: str) -> Optional[str]:
+    """Directory of the live factor version, or None if nothing was trained yet"""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            return os.path.join(directory, f.read().strip())
+    except FileNotFoundError:
+        # Factors written straight into directory by an older trainer
+        return directory if os.path.exists(os.path.join(directory, 'item_factors.npy')) else None
+
+
+class ALSModel:
+    """Memory-mapped ALS factors of one trained version, for serving recommendations"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.version = os.path.basename(path)
+        self.user_ids, self.item_ids, self.user_factors, self.item_factors = (
+            np.load(os.path.join(path, name), mmap_mode='r') for name in FACTOR_FILES
+        )
+        if self.item_factors.dtype != np.float32:
+            self.user_factors, self.item_factors = (
+                QuantizedDense(codes, np.load(os.path.join(path, name), mmap_mode='r'))
+                for codes, name in zip((self.user_factors, self.item_factors), SCALE_FILES)
+            )
+        self._user_row = {int(user_id): row for row, user_id in enumerate(self.user_ids)}
+        self._item_row = {int(item_id): row for row, item_id in enumerate(self.item_ids)}
+        # (catalog version, rows) replaced as one reference, so concurrent rankers never mix two catalogs
+        self._catalog_rows: Optional[Tuple[object, np.ndarray]] = None
+
+    def user_vector(self, user_id: int, liked_item_ids: Iterable[int]) -> Optional[np.ndarray]:
+        """The user's trained factors, or the mean of their liked items' factors if they are new"""
+        row = self._user_row.get(user_id)
+        if row is not None:
+            return np.asarray(self.user_factors[row])
+        rows = [self._item_row[item_id] for item_id in liked_item_ids if item_id in self._item_row]
+        if not rows:
+            return None
+        return np.asarray(self.item_factors[rows]).mean(axis=0)
+
+    def item_scores(self, user_vector: np.ndarray) -> np.ndarray:
+        """Predicted rating of every trained item, in item_ids order"""
+        return self.item_factors @ user_vector
+
+    def catalog_rows(self, id_to_row: dict, version) -> np.ndarray:
+        """Content-model row of every trained item (-1 if no longer in the catalog), cached per version"""
+        cached = self._catalog_rows
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        rows = np.array([id_to_row.get(int(item_id), -1) for item_id in self.item_ids], dtype=np.intp)
+        self._catalog_rows = (version, rows)
+        return rows
+
+
+_loaded_model: Optional[ALSModel] = None
+_load_lock = threading.Lock()
+
+
+def load_als_model(directory: str) -> Optional[ALSModel]:
+    """Return the memory-mapped live version, reloading it when the trainer publishes a new one"""
+    global _loaded_model
+    path = _live_path(directory)
+    if path is None:
+        return None
+    with _load_lock:
+        if _loaded_model is None or _loaded_model.path != path:
+            _loaded_model = ALSModel(path)
+        return _loaded_model
@@ -0,0 +1,222 @@
+import copy
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from scipy import sparse
+from .quantization import full_precision
+
+# Feature spaces at least this wide (the hashing backend's) get hashed hyperplanes instead of stored ones
+HASHED_PLANES_MIN_FEATURES = 1 << 14
+
+
+class LSHIndex:
+    """Approximate cosine nearest-neighbor index using random-hyperplane LSH.
+
+    Every row is hashed into one bucket per table by the signs of n_bits random
+    projections. A query only re-ranks the rows that share a bucket with it in
+    some table, so its cost depends on bucket size rather than catalog size.
+
+    Tuning knobs:
+    - n_tables: more tables raise recall and memory linearly
+    - n_bits: more bits mean smaller buckets, lower latency and lower recall;
+      left as None it is sized so buckets hold about 16 rows on average
+    - n_probes: extra neighboring buckets visited per table at query time,
+      trading latency for recall without rebuilding
+
+    In feature spaces of HASHED_PLANES_MIN_FEATURES columns or more, the
+    hyperplanes are not stored: each column's +-1 entries are hashed from
+    (seed, column, table, bit) when needed, and only the columns a vector
+    actually uses are projected. A 2**18-column hashing backend thus costs
+    no plane memory and a query costs O(its nonzeros), not O(columns).
+    """
+
+    def __init__(self, n_tables: int = 8, n_bits: Optional[int] = None, n_probes: int = 2, seed: int = 0):
+        if n_bits is not None and not 1 <= n_bits <= 62:
+            raise ValueError("n_bits must be between 1 and 62")
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.n_probes = n_probes
+        self.seed = seed
+        self.vectors = None
+        self.planes = None        # (n_tables, dim, n_bits) random hyperplanes; None when hashed
+        self.sorted_codes = None  # (n_tables, n_rows) bucket codes, ascending
+        self.sorted_rows = None   # (n_tables, n_rows) rows in bucket order
+
+    def _hashed_planes(self, columns: np.ndarray) -> np.ndarray:
+        """+-1 hyperplane entries of the given columns for every table and bit: (len(columns), n_tables * n_bits)"""
+        width = self.n_tables * self.n_bits
+        keys = columns.astype(np.uint64)[:, None] * np.uint64(width) + np.arange(width, dtype=np.uint64)
+        # splitmix64 of the key, offset by the seed; wraparound is intended
+        z = keys + np.uint64((self.seed * 0x632BE59BD9B4E019 + 0x9E3779B97F4A7C15) % (1 << 64))
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z ^= z >> np.uint64(31)
+        return np.where(z >> np.uint64(63), 1.0, -1.0).astype(np.float32)
+
+    def _project(self, vectors) -> np.ndarray:
+        """Projections of the vectors onto every table's hyperplanes: (n_tables, n, n_bits)"""
+        if self.planes is not None:
+            return np.stack([np.asarray(vectors @ planes) for planes in self.planes])
+        vectors = full_precision(vectors)
+        if sparse.issparse(vectors):
+            vectors = sparse.csr_matrix(vectors)
+            columns = np.unique(vectors.indices)
+        else:  # A query profile
+            columns = np.flatnonzero(np.any(vectors != 0, axis=0))
+        projections = np.asarray(vectors[:, columns] @ self._hashed_planes(columns))
+        return projections.reshape(vectors.shape[0], self.n_tables, self.n_bits).transpose(1, 0, 2)
+
+    def _codes(self, projections: np.ndarray) -> np.ndarray:
+        weights = np.left_shift(1, np.arange(self.n_bits, dtype=np.int64))
+        return (projections > 0).astype(np.int64) @ weights
+
+    def build(self, vectors) -> 'LSHIndex':
+        """Index L2-normalized row vectors (dense or sparse)"""
+        rng = np.random.default_rng(self.seed)
+        if self.n_bits is None:
+            self.n_bits = int(np.clip(np.log2(max(1, vectors.shape[0] // 16)), 1, 62))
+        self.vectors = vectors
+        if vectors.shape[1] < HASHED_PLANES_MIN_FEATURES:
+            self.planes = rng.standard_normal((self.n_tables, vectors.shape[1], self.n_bits)).astype(np.float32)
+        codes = self._codes(self._project(vectors))
+        self.sorted_rows = np.argsort(codes, axis=1, kind='stable').astype(np.int32)
+        self.sorted_codes = np.take_along_axis(codes, self.sorted_rows.astype(np.intp), axis=1)
+        return self
+
+    def extended(self, vectors, start: int) -> 'LSHIndex':
+        """A copy that also indexes rows start.. of vectors, hashed into the existing buckets.
+
+        The hyperplanes are kept, so only the new rows are projected and merged
+        into each table's sorted buckets. Rows tombstoned since stay in their
+        buckets; queries drop them through the excluded mask.
+        """
+        index = copy.copy(self)
+        index.vectors = vectors
+        codes = self._codes(self._project(vectors[start:]))
+        rows = np.arange(start, vectors.shape[0], dtype=np.int32)
+        sorted_codes, sorted_rows = [], []
+        for table in range(self.n_tables):
+            order = np.argsort(codes[table], kind='stable')
+            positions = np.searchsorted(self.sorted_codes[table], codes[table][order], side='right')
+            sorted_codes.append(np.insert(self.sorted_codes[table], positions, codes[table][order]))
+            sorted_rows.append(np.insert(self.sorted_rows[table], positions, rows[order]))
+        index.sorted_codes = np.stack(sorted_codes)
+        index.sorted_rows = np.stack(sorted_rows)
+        return index
+
+    def _candidates(self, query: np.ndarray) -> np.ndarray:
+        """Rows sharing a probed bucket with the query in any table"""
+        projections = self._project(query.reshape(1, -1))[:, 0, :]
+        codes = self._codes(projections)
+        # Multi-probe: also flip the bits whose projections were closest to zero
+        flips = np.argsort(np.abs(projections), axis=1)[:, :self.n_probes]
+        found = []
+        for table in range(self.n_tables):
+            probes = [codes[table]] + [codes[table] ^ (1 << int(bit)) for bit in flips[table]]
+            for code in probes:
+                lo = np.searchsorted(self.sorted_codes[table], code, side='left')
+                hi = np.searchsorted(self.sorted_codes[table], code, side='right')
+                found.append(self.sorted_rows[table, lo:hi])
+        return np.unique(np.concatenate(found))
+
+    def query(self, query: np.ndarray, k: int, excluded: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top-k rows by cosine similarity to a dense query vector"""
+        candidates = self._candidates(np.asarray(query, dtype=np.float32))
+        if excluded is not None:
+            candidates = candidates[~excluded[candidates]]
+        if len(candidates) == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        scores = np.asarray(self.vectors[candidates] @ query).ravel()
+        top = np.argsort(-scores, kind='stable')[:k]
+        return candidates[top].astype(np.intp), scores[top]
+
+    @property
+    def nbytes(self) -> int:
+        planes = self.planes.nbytes if self.planes is not None else 0
+        return planes + self.sorted_codes.nbytes + self.sorted_rows.nbytes
+
+    def save(self, path: str, version=(), build: Optional[Dict[str, Any]] = None):
+        """Write the hash tables to path, exactly as given, as an .npz archive; vectors are not included.
+
+        build (JSON-serializable) records how the indexed vectors were made,
+        e.g. the feature backend and precision, for load() to check.
+
+        The archive is written to a temporary file and renamed over path, so a
+        reader never sees a partial one.
+        """
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        try:
+            # Given a file object, np.savez does not append .npz to the name
+            with open(tmp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    params=np.array([self.n_tables, self.n_bits, self.n_probes, self.seed]),
+                    version=np.asarray(version),
+                    dimensions=np.array(self.vectors.shape[1]),
+                    build=np.array(json.dumps(build or {}, sort_keys=True)),
+                    planes=self.planes if self.planes is not None else np.empty((0, 0, 0), dtype=np.float32),
+                    sorted_codes=self.sorted_codes,
+                    sorted_rows=self.sorted_rows,
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str, vectors, version=(), build: Optional[Dict[str, Any]] = None,
+             n_tables: Optional[int] = None, n_bits: Optional[int] = None, seed: Optional[int] = None,
+             n_probes: Optional[int] = None) -> 'LSHIndex':
+        """Load tables written by save() and attach them to the vectors they index.
+
+        Raises ValueError if the file was built for a different catalog version,
+        number of rows, vector width or build, or with other n_tables, n_bits or
+        seed than given (None accepts any). n_probes is a query-time knob: when
+        given it replaces the saved one.
+        """
+        with np.load(path) as data:
+            if data['version'].tolist() != list(version) or data['sorted_rows'].shape[1] != vectors.shape[0]:
+                raise ValueError(f"ANN index at {path} was built for a different catalog")
+            if 'dimensions' not in data.files or int(data['dimensions']) != vectors.shape[1]:
+                raise ValueError(f"ANN index at {path} was built for {vectors.shape[1]}-wide vectors")
+            if json.loads(str(data['build'])) != json.loads(json.dumps(build or {})):
+                raise ValueError(f"ANN index at {path} was built from other features")
+            saved = dict(zip(('n_tables', 'n_bits', 'n_probes', 'seed'), data['params'].tolist()))
+            expected = {'n_tables': n_tables, 'n_bits': n_bits, 'seed': seed}
+            if any(value is not None and saved[name] != value for name, value in expected.items()):
+                raise ValueError(f"ANN index at {path} was built with other parameters: {saved}")
+            if n_probes is not None:
+                saved['n_probes'] = n_probes
+            index = cls(**saved)
+            index.planes = data['planes'] if data['planes'].size else None  # Empty when hashed
+            index.sorted_codes = data['sorted_codes']
+            index.sorted_rows = data['sorted_rows']
+        index.vectors = vectors
+        return index
+
+
+def compare_with_exact(index: LSHIndex, queries: List[np.ndarray], k: int = 10) -> Dict[str, float]:
+    """Measure recall@k and latency of an ANN index against exact brute-force search"""
+    recalls, ann_seconds, exact_seconds = [], 0.0, 0.0
+    for query in queries:
+        start = time.perf_counter()
+        exact_scores = np.asarray(index.vectors @ query).ravel()
+        exact = set(np.argsort(-exact_scores, kind='stable')[:k].tolist())
+        exact_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        approximate, _ = index.query(query, k)
+        ann_seconds += time.perf_counter() - start
+
+        recalls.append(len(exact.intersection(approximate.tolist())) / max(1, len(exact)))
+
+    n = max(1, len(queries))
+    return {
+        'recall_at_k': float(np.mean(recalls)) if recalls else 0.0,
+        'ann_ms': 1000 * ann_seconds / n,
+        'exact_ms': 1000 * exact_seconds / n,
+    }
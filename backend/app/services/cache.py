@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+from ..core.config import settings
+from .model_registry import model_registry
+
+
+class RecommendationCache:
+    """Bounded LRU cache of computed recommendation rankings with a time-to-live.
+
+    Entries are keyed by (user id, size, version); the recommendation service
+    passes a version that includes the model's cache key and the user's
+    ratings version, so a rating written by any worker makes the user's entries
+    unreachable. Keys are also indexed per user so a rating write in this
+    process drops every entry of that user at once.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[Tuple, Tuple[float, Any]]' = OrderedDict()
+        self._user_keys: Dict[int, Set[Tuple]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _drop(self, key: Tuple):
+        self._entries.pop(key, None)
+        user_keys = self._user_keys.get(key[0])
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._user_keys[key[0]]
+
+    def get(self, user_id: int, limit: int, version: Hashable) -> Optional[Any]:
+        key = (user_id, limit, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, user_id: int, limit: int, version: Hashable, value: Any):
+        key = (user_id, limit, version)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            self._user_keys.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached list of one user, e.g. after they rate a comic"""
+        with self._lock:
+            for key in list(self._user_keys.get(user_id, ())):
+                self._drop(key)
+
+    def clear(self):
+        """Drop everything, e.g. after the model was rebuilt"""
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+recommendation_cache = RecommendationCache(
+    max_entries=settings.recommendation_cache_size,
+    ttl_seconds=settings.recommendation_cache_ttl,
+)
+# A rebuilt model makes every cached list stale
+model_registry.add_rebuild_listener(recommendation_cache.clear)
@@ -0,0 +1,116 @@
+import sys
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from ..models import Comic
+from .characters import CharacterIndex
+
+# (id, title, description, characters, genre) of one comic, as read by catalog_rows()
+CatalogRow = Tuple[int, str, str, Optional[List[str]], str]
+
+
+def catalog_rows(db: Session, after_id: int = 0, ids: Optional[Iterable[int]] = None) -> List[CatalogRow]:
+    """The columns the recommender needs, without materializing Comic objects; ids limits them to those comics"""
+    query = db.query(
+        Comic.id, Comic.title, Comic.description, Comic.characters, Comic.genre
+    ).filter(Comic.id > after_id)
+    if ids is not None:
+        query = query.filter(Comic.id.in_(list(ids)))
+    return query.order_by(Comic.id).all()
+
+
+def content_text(row: CatalogRow) -> str:
+    """Combine description, characters, and genre for content analysis"""
+    _, _, description, characters, genre = row
+    characters_text = ' '.join(characters) if characters else ''
+    return f"{description} {characters_text} {genre}"
+
+
+def _frozen(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+class CatalogSnapshot:
+    """Immutable, array-backed view of the comic catalog shared by every read path.
+
+    Comic ids and genre codes are NumPy arrays indexed by row, titles are
+    interned strings and genre names are stored once, and a CharacterIndex
+    maps character names to rows. A row is a comic's
+    position in the model's feature matrix. Never mutate a snapshot; build a
+    new one with appended() instead, so readers holding the old one are safe.
+
+    Rows of deleted comics, and the old rows of edited comics that were
+    appended again, are tombstoned: they keep their position so the feature
+    and neighbor arrays stay aligned, but id_to_row and the id lookups skip
+    them and rankings must exclude them.
+    """
+
+    def __init__(self, ids: np.ndarray, titles: Sequence[str], genre_codes: np.ndarray, genres: Sequence[str],
+                 characters: CharacterIndex, tombstones: Optional[np.ndarray] = None):
+        self.ids = _frozen(np.asarray(ids, dtype=np.int64))
+        self.titles: Tuple[str, ...] = tuple(sys.intern(str(title)) for title in titles)
+        self.genre_codes = _frozen(np.asarray(genre_codes, dtype=np.int32))
+        self.genres: Tuple[str, ...] = tuple(genres)
+        self.characters = characters
+        self.tombstones = _frozen(
+            np.zeros(len(self.ids), dtype=bool) if tombstones is None else np.asarray(tombstones, dtype=bool)
+        )
+        self.id_to_row: Dict[int, int] = {
+            int(comic_id): row for row, comic_id in enumerate(self.ids) if not self.tombstones[row]
+        }
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[CatalogRow]) -> 'CatalogSnapshot':
+        return cls.empty().appended(rows)
+
+    @classmethod
+    def empty(cls) -> 'CatalogSnapshot':
+        return cls(np.empty(0, dtype=np.int64), (), np.empty(0, dtype=np.int32), (), CharacterIndex.build(()))
+
+    def appended(self, rows: Iterable[CatalogRow], tombstoned: Iterable[int] = ()) -> 'CatalogSnapshot':
+        """A new snapshot with rows added after the existing ones and the tombstoned rows dropped"""
+        rows = list(rows)
+        genre_to_code = {genre: code for code, genre in enumerate(self.genres)}
+        genres = list(self.genres)
+        ids, titles, codes = [], [], []
+        for comic_id, title, _, _, genre in rows:
+            if genre not in genre_to_code:
+                genre_to_code[genre] = len(genres)
+                genres.append(genre)
+            ids.append(comic_id)
+            titles.append(title)
+            codes.append(genre_to_code[genre])
+        return CatalogSnapshot(
+            np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)]),
+            self.titles + tuple(titles),
+            np.concatenate([self.genre_codes, np.asarray(codes, dtype=np.int32)]),
+            genres,
+            self.characters.appended(characters for _, _, _, characters, _ in rows),
+            self._tombstones_after(len(rows), tombstoned),
+        )
+
+    def _tombstones_after(self, n_appended: int, tombstoned: Iterable[int]) -> np.ndarray:
+        tombstones = np.concatenate([self.tombstones, np.zeros(n_appended, dtype=bool)])
+        tombstones[list(tombstoned)] = True
+        return tombstones
+
+    @property
+    def live_ids(self) -> np.ndarray:
+        """Ids of the comics in the catalog, without tombstoned rows"""
+        return self.ids[~self.tombstones] if self.tombstones.any() else self.ids
+
+    @property
+    def live_count(self) -> int:
+        return len(self.ids) - int(self.tombstones.sum())
+
+    def genre_of(self, row: int) -> str:
+        return self.genres[self.genre_codes[row]]
+
+    def ids_with_character(self, name: str) -> np.ndarray:
+        """Ids of the comics featuring the character, in catalog order"""
+        rows = self.characters.rows_for(name)
+        return self.ids[rows[~self.tombstones[rows]]]
+
+    def __len__(self) -> int:
+        return len(self.ids)
@@ -0,0 +1,90 @@
+import threading
+from typing import Callable, Iterable, Set, Tuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from ..models import Comic
+
+# Columns the content model reads; edits to any other column leave it unchanged
+CONTENT_COLUMNS = ('title', 'description', 'characters', 'genre')
+
+_PENDING_KEY = 'comic_changes'
+
+
+class CatalogChanges:
+    """Ids of comics inserted, updated or deleted by committed transactions, not yet applied to the model"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._upserted: Set[int] = set()
+        self._deleted: Set[int] = set()
+
+    def record(self, upserted: Iterable[int] = (), deleted: Iterable[int] = ()):
+        with self._lock:
+            for comic_id in upserted:
+                self._deleted.discard(comic_id)
+                self._upserted.add(comic_id)
+            for comic_id in deleted:
+                self._upserted.discard(comic_id)
+                self._deleted.add(comic_id)
+
+    def drain(self) -> Tuple[Set[int], Set[int]]:
+        """(upserted ids, deleted ids) recorded so far, clearing them"""
+        with self._lock:
+            changes = self._upserted, self._deleted
+            self._upserted, self._deleted = set(), set()
+            return changes
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._upserted) + len(self._deleted)
+
+
+def track_comic_changes(changes: CatalogChanges, on_commit: Callable[[], None]) -> Callable[[], None]:
+    """Record Comic inserts, content updates and deletes into changes once their transaction commits.
+
+    Flushed changes wait in the session until commit, so rolled back ones are
+    never seen. on_commit is called after every commit that changed a comic.
+    Bulk query.update() / query.delete() bypass these ORM events; the
+    registry's catalog version check still catches their inserts and deletes.
+    Returns a function that stops the tracking, e.g. for tests that commit
+    comics to a database of their own.
+    """
+    def pending(session: Session) -> Tuple[Set[int], Set[int]]:
+        return session.info.setdefault(_PENDING_KEY, (set(), set()))
+
+    def comic_inserted(mapper, connection, comic):
+        pending(inspect(comic).session)[0].add(comic.id)
+
+    def comic_updated(mapper, connection, comic):
+        state = inspect(comic)
+        if any(state.attrs[column].history.has_changes() for column in CONTENT_COLUMNS):
+            pending(state.session)[0].add(comic.id)
+
+    def comic_deleted(mapper, connection, comic):
+        pending(inspect(comic).session)[1].add(comic.id)
+
+    def committed(session):
+        upserted, deleted = session.info.pop(_PENDING_KEY, (set(), set()))
+        if upserted or deleted:
+            changes.record(upserted - deleted, deleted)
+            on_commit()
+
+    def rolled_back(session):
+        session.info.pop(_PENDING_KEY, None)
+
+    listeners = [
+        (Comic, 'after_insert', comic_inserted),
+        (Comic, 'after_update', comic_updated),
+        (Comic, 'after_delete', comic_deleted),
+        (Session, 'after_commit', committed),
+        (Session, 'after_rollback', rolled_back),
+    ]
+    for target, name, listener in listeners:
+        event.listen(target, name, listener)
+
+    def untrack():
+        for target, name, listener in listeners:
+            if event.contains(target, name, listener):
+                event.remove(target, name, listener)
+
+    return untrack
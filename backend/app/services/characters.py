@@ -0,0 +1,120 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from scipy import sparse
+
+
+def normalize_character(name: str) -> str:
+    """Case- and whitespace-insensitive key for a character name"""
+    return ' '.join(str(name).casefold().split())
+
+
+class CharacterIndex:
+    """Inverted index from normalized character name to the catalog rows featuring it.
+
+    Posting lists are stored back to back as one sorted int32 array of rows,
+    with indptr marking where each name's list starts: the CSC layout of a
+    binary (rows x names) matrix. Names are numbered in order of first
+    appearance, so appending comics only ever adds rows and names at the end.
+    """
+
+    def __init__(self, names: Sequence[str], indptr: np.ndarray, rows: np.ndarray, n_rows: int):
+        self.names: Tuple[str, ...] = tuple(names)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.rows = np.asarray(rows, dtype=np.int32)
+        self.n_rows = n_rows
+        self._codes: Dict[str, int] = {name: code for code, name in enumerate(self.names)}
+        self._by_row: Optional[sparse.csr_matrix] = None
+        self._idf: Optional[np.ndarray] = None
+
+    @classmethod
+    def build(cls, character_lists: Iterable[Optional[List[str]]]) -> 'CharacterIndex':
+        return cls((), np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int32), 0).appended(character_lists)
+
+    def appended(self, character_lists: Iterable[Optional[List[str]]]) -> 'CharacterIndex':
+        """A new index with one more row per character list, numbered after the existing rows"""
+        codes = dict(self._codes)
+        names = list(self.names)
+        pair_codes, pair_rows = [], []
+        row = self.n_rows
+        for characters in character_lists:
+            for name in dict.fromkeys(normalize_character(name) for name in characters or ()):
+                if not name:
+                    continue
+                if name not in codes:
+                    codes[name] = len(names)
+                    names.append(name)
+                pair_codes.append(codes[name])
+                pair_rows.append(row)
+            row += 1
+
+        # Existing postings keep their order; new rows are larger, so each list stays sorted
+        old_codes = np.repeat(np.arange(len(self.names)), np.diff(self.indptr))
+        all_codes = np.concatenate([old_codes, np.asarray(pair_codes, dtype=np.int64)])
+        all_rows = np.concatenate([self.rows, np.asarray(pair_rows, dtype=np.int32)])
+        order = np.lexsort((all_rows, all_codes))
+        indptr = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(all_codes, minlength=len(names)), out=indptr[1:])
+        return CharacterIndex(names, indptr, all_rows[order], row)
+
+    def rows_for(self, name: str) -> np.ndarray:
+        """Sorted rows of the comics featuring the character, empty if unknown"""
+        code = self._codes.get(normalize_character(name))
+        if code is None:
+            return np.empty(0, dtype=np.int32)
+        return self.rows[self.indptr[code]:self.indptr[code + 1]]
+
+    def _matrix(self) -> sparse.csr_matrix:
+        """The postings as a row-major (rows x names) matrix, built on first use"""
+        if self._by_row is None:
+            matrix = sparse.csc_matrix(
+                (np.ones(len(self.rows), dtype=np.float32), self.rows, self.indptr),
+                shape=(self.n_rows, len(self.names)),
+            )
+            document_frequency = np.diff(self.indptr)
+            # Rare characters say more about a comic than ever-present ones
+            self._idf = np.log((1 + self.n_rows) / (1 + document_frequency)).astype(np.float32) + 1
+            self._by_row = matrix.tocsr()
+        return self._by_row
+
+    def overlap_scores(self, liked_rows: np.ndarray) -> np.ndarray:
+        """Per-row score in [0, 1] for sharing characters with the liked rows.
+
+        Each shared character contributes its IDF weight times the number of
+        liked comics it appears in; scores are divided by the best one.
+        """
+        matrix = self._matrix()
+        if len(self.names) == 0:
+            return np.zeros(self.n_rows, dtype=np.float32)
+        weights = np.asarray(matrix[liked_rows].sum(axis=0)).ravel() * self._idf
+        scores = matrix @ weights
+        best = scores.max()
+        return scores / best if best > 0 else scores
+
+    def candidates(self, liked_rows: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Up to limit rows sharing characters with the liked rows, best first.
+
+        Reads only the posting lists of the liked comics' characters instead
+        of scoring the whole catalog like overlap_scores does.
+        """
+        matrix = self._matrix()
+        liked_codes = matrix[liked_rows].indices
+        if len(liked_codes) == 0 or limit <= 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        codes, counts = np.unique(liked_codes, return_counts=True)
+        starts, stops = self.indptr[codes], self.indptr[codes + 1]
+        rows = np.concatenate([self.rows[start:stop] for start, stop in zip(starts, stops)])
+        weights = np.repeat(counts * self._idf[codes], stops - starts)
+        candidates, inverse = np.unique(rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+        if len(candidates) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return candidates[order], scores[order]
+
+    @property
+    def nbytes(self) -> int:
+        return self.indptr.nbytes + self.rows.nbytes
+
+    def __len__(self) -> int:
+        return len(self.names)
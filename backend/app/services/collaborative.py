@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models import UserRating
+from .data_versions import RATINGS, data_versions
+
+
+class CoRatingModel:
+    """Item-item collaborative filtering over user_ratings, updated incrementally.
+
+    Two sparse matrices are kept in dictionary-of-keys form:
+    - R, the user x comic rating matrix, as {user_id: {comic_id: rating}}
+    - C = R^T R, the comic x comic co-rating dot products, as {comic_id: {comic_id: dot}}
+
+    The cosine similarity of two comics is C[i][j] / sqrt(C[i][i] * C[j][j]);
+    the diagonal is also kept on its own, so scoring reads it without
+    indexing every row. Changing one rating only touches the row and column
+    of that comic for the comics the same user rated, so an update costs
+    O(ratings of that user).
+    Ratings written by other processes are picked up by a background reload
+    once the RATINGS data version moves past this process's own writes. That
+    reload reads every rating: user_ratings has no updated-at watermark to
+    replay only the changed ones, so with several workers each one re-reads
+    the table about every check_seconds while ratings keep arriving.
+    """
+
+    def __init__(self, check_seconds: float = 30, session_factory: Callable[[], Session] = SessionLocal):
+        self.check_seconds = check_seconds
+        self.session_factory = session_factory
+        self._ratings: Dict[int, Dict[int, float]] = {}
+        self._dots: Dict[int, Dict[int, float]] = defaultdict(dict)
+        self._norms: Dict[int, float] = {}  # C[i][i]
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        # Updates recorded while a load runs, applied to its result before the swap
+        self._pending: Optional[List[Tuple[int, int, float]]] = None
+        # RATINGS bumps committed by other processes that the model includes, and when that was last checked.
+        # Models loaded from explicit rows are never checked.
+        self._external_version = 0
+        self._checked_at: Optional[float] = None
+        self.loaded = False
+
+    @staticmethod
+    def _apply(ratings: Dict[int, Dict[int, float]], dots: Dict[int, Dict[int, float]],
+               norms: Dict[int, float], user_id: int, comic_id: int, rating: float):
+        user_ratings = ratings.setdefault(user_id, {})
+        old = user_ratings.get(comic_id, 0.0)
+        delta = rating - old
+        if delta == 0:
+            return
+        row = dots[comic_id]
+        for other_id, other_rating in user_ratings.items():
+            if other_id == comic_id:
+                continue
+            row[other_id] = row.get(other_id, 0.0) + delta * other_rating
+            other_row = dots[other_id]
+            other_row[comic_id] = other_row.get(comic_id, 0.0) + delta * other_rating
+        row[comic_id] = norms[comic_id] = row.get(comic_id, 0.0) + rating * rating - old * old
+        user_ratings[comic_id] = rating
+
+    def load(self, ratings: Iterable[Tuple[int, int, float]]):
+        """Replace the model with one built from (user_id, comic_id, rating) rows.
+
+        The current model keeps serving while the rows are read; updates
+        recorded meanwhile are applied to the new one before it is swapped in.
+        """
+        with self._lock:
+            self._pending = []
+        user_ratings: Dict[int, Dict[int, float]] = {}
+        dots: Dict[int, Dict[int, float]] = defaultdict(dict)
+        norms: Dict[int, float] = {}
+        try:
+            for user_id, comic_id, rating in ratings:
+                self._apply(user_ratings, dots, norms, user_id, comic_id, rating)
+        finally:
+            with self._lock:
+                pending, self._pending = self._pending, None
+        with self._lock:
+            for update in pending:
+                self._apply(user_ratings, dots, norms, *update)
+            self._ratings, self._dots, self._norms = user_ratings, dots, norms
+            self.loaded = True
+
+    @staticmethod
+    def _external_ratings_version(db: Session) -> int:
+        """RATINGS bumps committed by other processes; this one's own arrive through update()"""
+        version, = data_versions.get(db, RATINGS)
+        return version - data_versions.committed(RATINGS)
+
+    def _reload(self, db: Session):
+        """Load the model from the user_ratings table. Callers hold self._load_lock."""
+        external_version = self._external_ratings_version(db)
+        self.load(db.query(UserRating.user_id, UserRating.comic_id, UserRating.rating).yield_per(10000))
+        self._external_version = external_version
+        self._checked_at = time.monotonic()
+
+    def _reload_in_background(self):
+        if not self._load_lock.acquire(blocking=False):
+            return  # Already loading
+
+        def run():
+            db = self.session_factory()
+            try:
+                self._reload(db)
+            except Exception as e:
+                # Keep serving the current model; the next check retries
+                print(f"❌ Co-rating reload failed: {type(e).__name__}: {e}")
+            finally:
+                db.close()
+                self._load_lock.release()
+
+        threading.Thread(target=run, name='co-rating-reload', daemon=True).start()
+
+    def ensure_loaded(self, db: Session):
+        """Build the model from the user_ratings table on first use, and reload it once other processes wrote ratings.
+
+        The RATINGS data version is checked at most every check_seconds; a
+        reload runs in the background while the current model keeps serving.
+        """
+        if not self.loaded:
+            with self._load_lock:
+                if not self.loaded:
+                    self._reload(db)
+            return
+        if self._checked_at is None or time.monotonic() - self._checked_at < self.check_seconds:
+            return
+        self._checked_at = time.monotonic()
+        if self._external_ratings_version(db) != self._external_version:
+            self._reload_in_background()
+
+    def update(self, user_id: int, comic_id: int, rating: float):
+        """Record a new or changed rating. Re-applying the same rating is a no-op."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((user_id, comic_id, rating))
+            if self.loaded:
+                self._apply(self._ratings, self._dots, self._norms, user_id, comic_id, rating)
+            # Otherwise the first load will read it from the database
+
+    def similar(self, comic_ids: Iterable[int]) -> Dict[int, float]:
+        """Sum of cosine similarities from each given comic to every co-rated comic.
+
+        Only the given comics' rows and their entries' norms are copied under
+        the lock, with C-level dict copies, so rating writes wait for the copy
+        rather than for the scoring, which runs vectorized outside it.
+        """
+        sources, targets, dots, target_norms = [], [], [], []
+        with self._lock:
+            for comic_id in comic_ids:
+                row = self._dots.get(comic_id)
+                if not row or row.get(comic_id, 0.0) <= 0:
+                    continue
+                row = dict(row)
+                sources.append((comic_id, row[comic_id], len(row)))
+                targets.append(np.fromiter(row.keys(), dtype=np.int64, count=len(row)))
+                dots.append(np.fromiter(row.values(), dtype=np.float64, count=len(row)))
+                target_norms.append(np.fromiter(map(self._norms.get, row.keys()), dtype=np.float64, count=len(row)))
+        if not sources:
+            return {}
+        source_ids, source_norms, lengths = (np.array(values) for values in zip(*sources))
+        targets, dots, target_norms = np.concatenate(targets), np.concatenate(dots), np.concatenate(target_norms)
+        source_norms = np.repeat(source_norms, lengths)
+        keep = (targets != np.repeat(source_ids, lengths)) & (dots > 0) & (target_norms > 0)
+        targets, similarities = targets[keep], dots[keep] / np.sqrt(source_norms[keep] * target_norms[keep])
+        # Sum each comic's similarities over the given comics
+        unique_targets, positions = np.unique(targets, return_inverse=True)
+        scores = np.bincount(positions, weights=similarities, minlength=len(unique_targets))
+        return dict(zip(unique_targets.tolist(), scores.tolist()))
+
+
+co_rating_model = CoRatingModel(check_seconds=settings.co_rating_check_seconds)
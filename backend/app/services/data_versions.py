@@ -0,0 +1,138 @@
+import itertools
+import threading
+import weakref
+from collections import Counter
+from typing import Iterable, Set, Tuple
+from sqlalchemy import inspect, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from ..models import Comic, DataVersion, UserRating
+from .catalog_changes import CONTENT_COLUMNS
+
+# Version keys: a comic's content changed (what the model reads), an existing comic's content was
+# edited, any comic column changed (what the comic listings and stats show), any rating changed, and one
+# user's ratings changed
+CATALOG = 'catalog'
+CATALOG_EDITS = 'catalog:edits'
+COMICS = 'comics'
+RATINGS = 'ratings'
+
+_PENDING_KEY = 'data_version_bumps'
+_UPSERTS = {'sqlite': sqlite_insert, 'postgresql': postgresql_insert}
+
+
+def user_ratings_key(user_id: int) -> str:
+    return f"ratings:user:{user_id}"
+
+
+def _content_changed(comic: Comic) -> bool:
+    """Whether a flushed comic edit touched a column the content model reads; image_url backfills do not"""
+    state = inspect(comic)
+    return any(state.attrs[column].history.has_changes() for column in CONTENT_COLUMNS)
+
+
+def changed_keys(session: Session) -> Set[str]:
+    """Version keys of the comics and ratings a flush inserted, modified or deleted"""
+    keys = set()
+    for obj in itertools.chain(session.new, session.deleted):
+        if isinstance(obj, Comic):
+            keys.update((CATALOG, COMICS))
+        elif isinstance(obj, UserRating):
+            keys.update((RATINGS, user_ratings_key(obj.user_id)))
+    for obj in session.dirty:
+        if not session.is_modified(obj):
+            continue
+        if isinstance(obj, Comic):
+            keys.add(COMICS)
+            if _content_changed(obj):
+                keys.update((CATALOG, CATALOG_EDITS))
+        elif isinstance(obj, UserRating):
+            keys.update((RATINGS, user_ratings_key(obj.user_id)))
+    return keys
+
+
+class DataVersions:
+    """Monotonically increasing change counters for the catalog, all ratings and each user's ratings.
+
+    The counters live in the data_versions table, so every worker and script
+    sees the same values. They are bumped from after_flush inside the writing
+    transaction: a rolled back change never bumps them, and a committed one is
+    visible together with its bump. Reading any number of counters is one
+    primary key lookup. The process also counts the bumps it committed
+    itself, so a reader can tell its own changes from other processes'.
+    app.core.database registers the session listeners for every ORM writer.
+
+    Every rating write updates the one RATINGS row, so on PostgreSQL
+    concurrent rating transactions queue on its row lock until they commit.
+    Transactions are one rating long, which keeps the wait short.
+    """
+
+    def __init__(self):
+        self._committed: Counter = Counter()
+        self._lock = threading.Lock()
+        self._ready = weakref.WeakSet()
+
+    def _has_table(self, connection: Connection, create: bool = False) -> bool:
+        """Whether the table exists, creating it on databases older than it if create is set"""
+        if connection.engine not in self._ready:
+            if create:
+                DataVersion.__table__.create(connection, checkfirst=True)
+            elif not inspect(connection).has_table(DataVersion.__tablename__):
+                return False
+            self._ready.add(connection.engine)
+        return True
+
+    def get(self, db: Session, *keys: str) -> Tuple[int, ...]:
+        """Current version of each key, 0 for data never changed"""
+        if not self._has_table(db.connection()):
+            return (0,) * len(keys)  # Nothing was written since the table was introduced
+        versions = dict(db.query(DataVersion.key, DataVersion.version).filter(DataVersion.key.in_(keys)).all())
+        return tuple(versions.get(key, 0) for key in keys)
+
+    def committed(self, key: str) -> int:
+        """How many times this process has bumped key in committed transactions"""
+        with self._lock:
+            return self._committed[key]
+
+    def bump(self, connection: Connection, keys: Iterable[str]):
+        """Increment the keys' counters (creating them at 1) in the connection's transaction"""
+        keys = sorted(keys)  # A fixed order, so concurrent writers lock rows alike
+        if not keys:
+            return
+        self._has_table(connection, create=True)
+        upsert = _UPSERTS.get(connection.dialect.name)
+        if upsert is not None:
+            statement = upsert(DataVersion).values([{'key': key, 'version': 1} for key in keys])
+            connection.execute(statement.on_conflict_do_update(
+                index_elements=[DataVersion.key], set_={'version': DataVersion.version + 1},
+            ))
+            return
+        existing = set(connection.execute(select(DataVersion.key).where(DataVersion.key.in_(keys))).scalars())
+        if existing:
+            connection.execute(update(DataVersion).where(DataVersion.key.in_(existing)).values(version=DataVersion.version + 1))
+        missing = [{'key': key, 'version': 1} for key in keys if key not in existing]
+        if missing:
+            connection.execute(DataVersion.__table__.insert(), missing)
+
+    def flushed(self, session: Session):
+        """after_flush: bump the versions of whatever the flush changed, in its transaction"""
+        keys = changed_keys(session)
+        if keys:
+            self.bump(session.connection(), keys)
+            session.info.setdefault(_PENDING_KEY, Counter()).update(keys)
+
+    def session_committed(self, session: Session):
+        """after_commit: count the session's bumps as committed by this process"""
+        bumps = session.info.pop(_PENDING_KEY, None)
+        if bumps:
+            with self._lock:
+                self._committed.update(bumps)
+
+    def session_rolled_back(self, session: Session):
+        """after_rollback: forget the session's bumps, the database dropped them"""
+        session.info.pop(_PENDING_KEY, None)
+
+
+data_versions = DataVersions()
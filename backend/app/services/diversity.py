@@ -0,0 +1,59 @@
+import numpy as np
+from scipy import sparse
+
+
+def mmr(features, relevance: np.ndarray, n: int, lambda_: float = 0.7) -> np.ndarray:
+    """Maximal marginal relevance: pick n candidates that are relevant but unlike each other.
+
+    features holds one L2-normalized row per candidate and relevance their
+    strategy scores. Each step picks the candidate maximizing
+    lambda_ * relevance - (1 - lambda_) * (max similarity to those already
+    picked). Each step costs one sparse matrix-vector product and a few vector
+    updates; there are no per-pair Python loops and no candidate-by-candidate
+    matrix. lambda_ = 1 keeps the original order.
+
+    Returns positions into the candidate arrays, in pick order.
+    """
+    m = len(relevance)
+    n = min(n, m)
+    if n <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    # Put relevance on the same 0..1 scale as cosine similarity, whatever the strategy's scores are
+    low, high = relevance.min(), relevance.max()
+    relevance = (relevance - low) / (high - low) if high > low else np.ones(m)
+
+    similarity_to = _similarity_rows(features)
+    picked = np.empty(n, dtype=np.intp)
+    max_similarity = np.zeros(m)
+    available = np.ones(m, dtype=bool)
+    for step in range(n):
+        marginal = lambda_ * relevance - (1 - lambda_) * max_similarity
+        marginal[~available] = -np.inf
+        best = int(np.argmax(marginal))
+        picked[step] = best
+        available[best] = False
+        np.maximum(max_similarity, similarity_to(best), out=max_similarity)
+    return picked
+
+
+def _similarity_rows(features):
+    """Function returning the similarities of one candidate to all of them"""
+    if not sparse.issparse(features):
+        features = np.asarray(features)
+        return lambda row: features @ features[row]
+
+    features = sparse.csr_matrix(features)
+    # Scatter the row into a reusable dense vector: one sparse mat-vec per pick,
+    # never a dense copy of the whole (possibly 2**18-wide) feature block
+    buffer = np.zeros(features.shape[1], dtype=features.dtype)
+
+    def similarity_to(row: int) -> np.ndarray:
+        start, stop = features.indptr[row], features.indptr[row + 1]
+        columns = features.indices[start:stop]
+        buffer[columns] = features.data[start:stop]
+        similarities = features @ buffer
+        buffer[columns] = 0
+        return similarities
+
+    return similarity_to
@@ -0,0 +1,39 @@
+from typing import Iterable, Optional
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+
+class LSAVectorizer:
+    """Latent semantic analysis: TF-IDF reduced to dense comic embeddings by truncated SVD.
+
+    The SVD keeps the n_components directions that explain most of the TF-IDF
+    variance, merging words that co-occur and dropping noise, so it can afford
+    a much larger vocabulary than the plain TF-IDF backend. Embeddings are
+    L2-normalized, C-contiguous float32 rows: n_components * 4 bytes per comic
+    whatever its description length, and dot products are cosines.
+    """
+
+    def __init__(self, n_components: int = 128, max_features: Optional[int] = 20000, seed: int = 0):
+        self.n_components = n_components
+        self.seed = seed
+        self.tfidf = TfidfVectorizer(stop_words='english', max_features=max_features)
+        self.svd: Optional[TruncatedSVD] = None
+
+    @staticmethod
+    def _normalized(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        # Comics with no known words keep an all-zero embedding
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+    def fit_transform(self, documents: Iterable[str]) -> np.ndarray:
+        weights = self.tfidf.fit_transform(documents)
+        # The SVD cannot keep more directions than there are comics or words
+        n_components = max(1, min(self.n_components, weights.shape[0] - 1, weights.shape[1] - 1))
+        self.svd = TruncatedSVD(n_components=n_components, random_state=self.seed)
+        return self._normalized(self.svd.fit_transform(weights))
+
+    def transform(self, documents: Iterable[str]) -> np.ndarray:
+        return self._normalized(self.svd.transform(self.tfidf.transform(documents)))
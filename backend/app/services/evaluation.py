@@ -0,0 +1,94 @@
+import math
+import random
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Sequence, Set, Tuple
+import numpy as np
+
+# (user_id, comic_id, rating, created_at); pass rows in insertion order so equal timestamps keep it
+RatingRow = Tuple[int, int, float, Any]
+
+
+def split_ratings(ratings: Iterable[RatingRow], test_fraction: float = 0.2, by: str = 'time',
+                  seed: int = 0) -> Tuple[List[RatingRow], List[RatingRow]]:
+    """Split every user's ratings into train and test sets.
+
+    by='time' holds out each user's most recent ratings, which is what the
+    recommender faces in production; by='random' holds out a seeded random
+    sample. Users with a single rating keep it in train.
+    """
+    if by not in ('time', 'random'):
+        raise ValueError(f"Unknown split: {by}")
+    by_user: Dict[int, List[RatingRow]] = defaultdict(list)
+    for row in ratings:
+        by_user[row[0]].append(row)
+
+    rng = random.Random(seed)
+    train, test = [], []
+    for user_id in sorted(by_user):
+        rows = by_user[user_id]
+        n_test = int(round(len(rows) * test_fraction)) if len(rows) > 1 else 0
+        n_test = min(n_test, len(rows) - 1)
+        if by == 'time':
+            rows = sorted(rows, key=lambda row: (row[3] is not None, row[3]))
+        else:
+            rows = rows[:]
+            rng.shuffle(rows)
+        cut = len(rows) - n_test
+        train.extend(rows[:cut])
+        test.extend(rows[cut:])
+    return train, test
+
+
+def ranking_metrics(recommended: Sequence[int], relevant: Set[int], k: int) -> Tuple[float, float, float]:
+    """(precision@k, recall@k, NDCG@k) with binary relevance"""
+    top = list(recommended)[:k]
+    gains = [1.0 if comic_id in relevant else 0.0 for comic_id in top]
+    hits = sum(gains)
+    dcg = sum(gain / math.log2(position + 2) for position, gain in enumerate(gains))
+    ideal = sum(1.0 / math.log2(position + 2) for position in range(min(len(relevant), k)))
+    return hits / k, hits / len(relevant) if relevant else 0.0, dcg / ideal if ideal else 0.0
+
+
+def latency_percentiles(seconds: Sequence[float]) -> Dict[str, float]:
+    """p50/p95/p99 and mean of per-user latencies, in milliseconds"""
+    if not seconds:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0}
+    ms = np.asarray(seconds) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), "mean_ms": float(ms.mean())}
+
+
+def evaluate_strategy(rank, model, train_by_user: Dict[int, Dict[int, float]],
+                      relevant_by_user: Dict[int, Set[int]], k: int) -> Dict[str, Any]:
+    """Accuracy, coverage and latency of one strategy.
+
+    rank is called as rank(model, user_id, train_ratings, k) and returns
+    (comic_id, score, explanation) tuples, like RecommendationService.rank.
+    Only users with at least one relevant held-out comic are scored.
+    """
+    precisions, recalls, ndcgs, latencies = [], [], [], []
+    recommended_ids: Set[int] = set()
+    empty = 0
+    for user_id, relevant in relevant_by_user.items():
+        started = time.perf_counter()
+        ranked = rank(model, user_id, train_by_user.get(user_id, {}), k)
+        latencies.append(time.perf_counter() - started)
+        comic_ids = [comic_id for comic_id, _, _ in ranked]
+        empty += not comic_ids
+        recommended_ids.update(comic_ids)
+        precision, recall, ndcg = ranking_metrics(comic_ids, relevant, k)
+        precisions.append(precision)
+        recalls.append(recall)
+        ndcgs.append(ndcg)
+
+    users = len(relevant_by_user)
+    return {
+        "users": users,
+        "empty_lists": empty,
+        f"precision@{k}": float(np.mean(precisions)) if users else 0.0,
+        f"recall@{k}": float(np.mean(recalls)) if users else 0.0,
+        f"ndcg@{k}": float(np.mean(ndcgs)) if users else 0.0,
+        "coverage": len(recommended_ids) / len(model) if len(model) else 0.0,
+        "latency": latency_percentiles(latencies),
+    }
@@ -0,0 +1,94 @@
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from ..core.config import settings
+
+
+class ExecutorBusy(Exception):
+    """Raised when every worker is busy and the waiting queue is full"""
+
+
+class RecommendationExecutor:
+    """Bounded pool that runs recommendation scoring off the shared request threadpool.
+
+    At most max_workers tasks run at once and at most queue_depth more wait;
+    anything beyond that is rejected with ExecutorBusy instead of piling up.
+
+    In "process" mode tasks run in spawned worker processes, so NumPy and
+    scikit-learn work never holds the API process's GIL. Each worker loads the
+    content model itself, which is cheap when FEATURE_STORE_DIR is set because
+    the workers then memory-map the shared on-disk model.
+    """
+
+    def __init__(self, mode: str = 'thread', max_workers: int = 2, queue_depth: int = 16):
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor mode: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self._slots = threading.BoundedSemaphore(max_workers + queue_depth)
+        self._pool: Optional[Executor] = None
+        self._pool_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_pool(self) -> Executor:
+        with self._pool_lock:
+            if self._pool is None:
+                if self.mode == 'process':
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='recommendations')
+            return self._pool
+
+    def _release(self, _future):
+        with self._stats_lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def run(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) on the pool and wait for its result, or raise ExecutorBusy"""
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.rejected += 1
+            raise ExecutorBusy("Recommendation workers are busy, try again shortly")
+        try:
+            future = self._get_pool().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._stats_lock:
+            self.in_flight += 1
+        future.add_done_callback(self._release)
+        return future.result()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "mode": self.mode,
+                "max_workers": self.max_workers,
+                "queue_depth": self.queue_depth,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+recommendation_executor = RecommendationExecutor(
+    mode=settings.recommendation_executor,
+    max_workers=settings.recommendation_workers,
+    queue_depth=settings.recommendation_queue_depth,
+)
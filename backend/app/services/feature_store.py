@@ -0,0 +1,196 @@
+import json
+import os
+import pickle
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+import numpy as np
+from scipy import sparse
+from .catalog import CatalogSnapshot
+from .characters import CharacterIndex
+from .quantization import Matrix, QuantizedDense, QuantizedSparse, stored_values
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to unsynchronized builds
+    fcntl = None
+
+ARRAYS = ('data', 'indices', 'indptr', 'row_scales', 'ids', 'genre_codes', 'character_indptr', 'character_rows',
+          'neighbors', 'neighbor_scores')
+
+
+def _feature_arrays(features) -> Dict[str, np.ndarray]:
+    """data/indices/indptr/row_scales of CSR, dense or quantized features; unused ones are empty"""
+    empty = np.empty(0, dtype=np.int32)
+    if isinstance(features, QuantizedSparse):
+        return {'data': features.data, 'indices': features.indices, 'indptr': features.indptr,
+                'row_scales': features.row_scales}
+    if isinstance(features, QuantizedDense):
+        return {'data': features.codes, 'indices': empty, 'indptr': empty, 'row_scales': features.row_scales}
+    if not sparse.issparse(features):
+        return {'data': np.ascontiguousarray(features), 'indices': empty, 'indptr': empty, 'row_scales': empty}
+    features = sparse.csr_matrix(features)
+    return {'data': features.data, 'indices': features.indices, 'indptr': features.indptr, 'row_scales': empty}
+
+
+def _features(manifest: Dict[str, Any], arrays: Dict[str, np.ndarray]):
+    """The features described by a manifest, over the mapped arrays"""
+    quantized = manifest.get('precision') in ('float16', 'int8')
+    if manifest.get('layout') == 'dense':
+        return QuantizedDense(arrays['data'], arrays['row_scales']) if quantized else arrays['data']
+    if quantized:
+        return QuantizedSparse(arrays['data'], arrays['indices'], arrays['indptr'], arrays['row_scales'],
+                               manifest['shape'])
+    return sparse.csr_matrix(
+        (arrays['data'], arrays['indices'], arrays['indptr']), shape=tuple(manifest['shape']), copy=False,
+    )
+
+
+class StoredModel:
+    """Read-only, memory-mapped arrays of one published model version"""
+
+    def __init__(self, path: str, manifest: Dict[str, Any], arrays: Dict[str, np.ndarray],
+                 titles, genres, character_names, vectorizer):
+        self.path = path
+        self.manifest = manifest
+        self.version = tuple(manifest['catalog_version'])
+        self.features = _features(manifest, arrays)
+        self.ids = arrays['ids']
+        self.genre_codes = arrays['genre_codes']
+        self.characters = CharacterIndex(
+            character_names, arrays['character_indptr'], arrays['character_rows'], len(self.ids),
+        )
+        self.neighbors = arrays['neighbors']
+        self.neighbor_scores = arrays['neighbor_scores']
+        self.titles = titles
+        self.genres = genres
+        self.vectorizer = vectorizer
+
+
+class FeatureStore:
+    """Versioned on-disk copy of the content model, shared by every uvicorn worker.
+
+    Layout under root:
+        CURRENT        name of the live version directory
+        v-<stamp>/     manifest.json, data/indices/indptr.npy (CSR features;
+                       dense embeddings are all in data.npy), row_scales.npy
+                       (quantized features only; unused arrays are empty),
+                       ids.npy, genre_codes.npy, character_indptr.npy,
+                       character_rows.npy, neighbors.npy, neighbor_scores.npy,
+                       catalog.json (titles, genre and character names),
+                       vectorizer.pkl
+
+    A version is written to a temporary directory, renamed into place and only
+    then made live by atomically replacing CURRENT. Workers memory-map the
+    arrays read-only, so they all share one copy through the page cache.
+    """
+
+    def __init__(self, root: str, keep_versions: int = 2):
+        self.root = root
+        self.keep_versions = keep_versions
+
+    @property
+    def _current_path(self) -> str:
+        return os.path.join(self.root, 'CURRENT')
+
+    def current_manifest(self) -> Optional[Dict[str, Any]]:
+        """Manifest of the live version, or None if nothing was published yet"""
+        try:
+            with open(self._current_path) as f:
+                name = f.read().strip()
+            with open(os.path.join(self.root, name, 'manifest.json')) as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        manifest['name'] = name
+        return manifest
+
+    def attach(self) -> Optional[StoredModel]:
+        """Memory-map the live version read-only"""
+        manifest = self.current_manifest()
+        if manifest is None:
+            return None
+        path = os.path.join(self.root, manifest['name'])
+        try:
+            arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in ARRAYS}
+            with open(os.path.join(path, 'catalog.json')) as f:
+                catalog = json.load(f)
+            with open(os.path.join(path, 'vectorizer.pkl'), 'rb') as f:
+                vectorizer = pickle.load(f)
+        except FileNotFoundError:
+            # Written by an older layout, or pruned by a concurrent publish; the caller rebuilds
+            return None
+        return StoredModel(path, manifest, arrays, catalog['titles'], catalog['genres'], catalog['characters'],
+                           vectorizer)
+
+    def publish(self, version, features: Matrix, catalog: CatalogSnapshot,
+                neighbors: np.ndarray, neighbor_scores: np.ndarray, vectorizer,
+                build_settings: Optional[Dict[str, Any]] = None) -> str:
+        """Write a new version and make it live. Returns the version directory name.
+
+        build_settings (JSON-serializable) are recorded in the manifest so
+        readers can tell whether the version was built the way they would build it.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = os.path.join(self.root, f'.tmp-{uuid.uuid4().hex}')
+        os.makedirs(tmp_path)
+        arrays = {
+            **_feature_arrays(features),
+            'ids': catalog.ids,
+            'genre_codes': catalog.genre_codes,
+            'character_indptr': catalog.characters.indptr,
+            'character_rows': catalog.characters.rows,
+            'neighbors': neighbors,
+            'neighbor_scores': neighbor_scores,
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f'{name}.npy'), array)
+        with open(os.path.join(tmp_path, 'catalog.json'), 'w') as f:
+            json.dump({
+                'titles': list(catalog.titles),
+                'genres': list(catalog.genres),
+                'characters': list(catalog.characters.names),
+            }, f)
+        with open(os.path.join(tmp_path, 'vectorizer.pkl'), 'wb') as f:
+            pickle.dump(vectorizer, f)
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w') as f:
+            json.dump({
+                'catalog_version': list(version),
+                'shape': list(features.shape),
+                'nnz': int(stored_values(features).size),
+                'layout': 'csr' if sparse.issparse(features) or isinstance(features, QuantizedSparse) else 'dense',
+                'precision': getattr(features, 'precision', None) or str(stored_values(features).dtype),
+                'created_at': time.time(),
+                **(build_settings or {}),
+            }, f)
+
+        name = f'v-{time.time_ns()}'
+        os.rename(tmp_path, os.path.join(self.root, name))
+        pointer_tmp = f'{self._current_path}.{uuid.uuid4().hex}'
+        with open(pointer_tmp, 'w') as f:
+            f.write(name)
+        os.replace(pointer_tmp, self._current_path)
+        self._remove_old_versions(name)
+        return name
+
+    def _remove_old_versions(self, live: str):
+        # Workers still mapping a removed version keep their pages until they re-attach
+        versions = sorted(entry for entry in os.listdir(self.root) if entry.startswith('v-'))
+        for name in versions[:-self.keep_versions]:
+            if name != live:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    @contextmanager
+    def build_lock(self):
+        """Cross-process lock so only one worker rebuilds a stale version at a time"""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, '.build.lock'), 'w') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,513 @@
+import copy
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models import Comic
+from .ann import LSHIndex
+from .catalog import CatalogRow, CatalogSnapshot, catalog_rows, content_text
+from .catalog_changes import CatalogChanges, track_comic_changes
+from .data_versions import CATALOG, CATALOG_EDITS, data_versions
+from .embeddings import LSAVectorizer
+from .feature_store import FeatureStore, StoredModel
+from .neighbors import NeighborIndex
+from .quantization import full_precision, quantize, stack_rows, stored_values
+from .shards import ShardedIndex
+
+
+def _make_vectorizer():
+    """Text vectorizer for the configured feature backend"""
+    if settings.recommendation_features == 'lsa':
+        return LSAVectorizer(n_components=settings.lsa_dimensions)
+    if settings.recommendation_features == 'hashing':
+        # Vocabulary-free: any comic can be vectorized on its own, no fit needed
+        return HashingVectorizer(
+            stop_words='english',
+            n_features=2 ** settings.hashing_features_bits,
+            alternate_sign=False,
+            norm='l2',
+        )
+    return TfidfVectorizer(stop_words='english', max_features=1000)
+
+
+# (comic count, max comic id, catalog data version)
+CatalogVersion = Tuple[int, int, int]
+
+# Strategies that read the precomputed neighbor lists; the O(n^2) build is skipped for the others
+NEIGHBOR_STRATEGIES = ('neighbors', 'pipeline')
+
+
+def _build_settings(neighbors_k: int) -> Dict[str, Any]:
+    """Settings that shape a built model, as recorded in its feature store manifest"""
+    dimensions = {'lsa': settings.lsa_dimensions, 'hashing': 2 ** settings.hashing_features_bits}
+    return {
+        'features': settings.recommendation_features,
+        'vector_precision': settings.vector_precision,
+        'dimensions': dimensions.get(settings.recommendation_features),
+        'neighbors_k': neighbors_k,  # 0 when no neighbor lists were built
+    }
+
+
+def _built_as_configured(manifest: Dict[str, Any]) -> bool:
+    """Whether a published model was built the way this worker would build it"""
+    expected = _build_settings(settings.recommendation_neighbors)
+    if settings.recommendation_strategy not in NEIGHBOR_STRATEGIES:
+        del expected['neighbors_k']  # The neighbor lists are not read
+    return all(manifest.get(key) == value for key, value in expected.items())
+
+
+class ContentModel:
+    """Fitted content-based model for one version of the comic catalog"""
+
+    def __init__(self, version: CatalogVersion, rows: List[CatalogRow]):
+        self.version = version
+        # Incremental updates applied since the fit, and the catalog size the vectorizer was fitted on
+        self.revision = 0
+        self.catalog = CatalogSnapshot.from_rows(rows)
+        self.fitted_rows = len(self.catalog)
+        self.vectorizer = _make_vectorizer()
+        self.features = None
+        self.neighbor_index = None
+        self.ann_index = None
+        self.shard_index = None
+        # There is nothing to compare with fewer than two comics
+        if len(self.catalog) >= 2:
+            self.features = self.vectorizer.fit_transform(content_text(row) for row in rows)
+            if settings.recommendation_strategy in NEIGHBOR_STRATEGIES:
+                self.neighbor_index = NeighborIndex.build(self.features, k=settings.recommendation_neighbors)
+            # Neighbors come from the exact features; everything after works on the stored form
+            self.features = quantize(self.features, settings.vector_precision)
+            if settings.recommendation_strategy == 'ann':
+                self.ann_index = self._load_or_build_ann()
+        self.shard_index = self._build_shards()
+
+    @classmethod
+    def attached(cls, stored: StoredModel) -> 'ContentModel':
+        """A model served from the memory-mapped arrays of a published feature store version"""
+        model = cls.__new__(cls)
+        model.version = stored.version
+        model.revision = 0
+        model.catalog = CatalogSnapshot(stored.ids, stored.titles, stored.genre_codes, stored.genres, stored.characters)
+        model.fitted_rows = len(model.catalog)
+        model.vectorizer = stored.vectorizer
+        model.features = stored.features
+        model.neighbor_index = None
+        if settings.recommendation_strategy in NEIGHBOR_STRATEGIES:
+            if stored.neighbors.shape[0] == len(model.catalog):
+                model.neighbor_index = NeighborIndex(stored.neighbors, stored.neighbor_scores)
+            else:  # Published by a worker that did not need them
+                model.neighbor_index = NeighborIndex.build(full_precision(model.features), k=settings.recommendation_neighbors)
+        model.ann_index = model._load_or_build_ann() if settings.recommendation_strategy == 'ann' else None
+        model.shard_index = model._build_shards()
+        return model
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self.catalog.ids
+
+    @property
+    def titles(self) -> Tuple[str, ...]:
+        return self.catalog.titles
+
+    @property
+    def id_to_row(self) -> Dict[int, int]:
+        return self.catalog.id_to_row
+
+    @property
+    def cache_key(self) -> Tuple[int, ...]:
+        """Identifies the model's contents: the catalog version and the incremental updates applied since"""
+        return tuple(self.version) + (self.revision,)
+
+    @property
+    def can_update(self) -> bool:
+        """Whether comics can be added or removed without refitting the vectorizer"""
+        return self.features is not None
+
+    @property
+    def drift(self) -> float:
+        """Share of rows tombstoned or vectorized since the fit, relative to the fitted catalog"""
+        changed = int(self.catalog.tombstones.sum()) + len(self) - self.fitted_rows
+        return changed / max(1, self.fitted_rows)
+
+    def updated(self, version: CatalogVersion, rows: List[CatalogRow],
+                removed_ids: Iterable[int] = ()) -> 'ContentModel':
+        """A new model with rows (new or edited comics) added and removed_ids dropped.
+
+        Only the given comics are vectorized, with the fitted vocabulary, and the
+        neighbor lists and ANN buckets (if built) are extended rather than rebuilt. An edited comic's old
+        row and a removed comic's row are tombstoned, not deleted, so the other
+        rows keep their positions. This model is left untouched, so requests still
+        holding it keep working while the new one is swapped in.
+
+        The features grow into spare capacity, in O(len(rows)) amortized (see
+        stack_rows). The catalog arrays and neighbor lists are copied, since
+        tombstones and existing rows' neighbors change under requests holding
+        this model; the catalog copy is a few bytes per comic, and the neighbor
+        extension compares every row with the new ones anyway.
+        """
+        replaced = [comic_id for comic_id, _, _, _, _ in rows] + list(removed_ids)
+        tombstoned = [self.id_to_row[comic_id] for comic_id in replaced if comic_id in self.id_to_row]
+        model = copy.copy(self)
+        model.version = version
+        model.revision = self.revision + 1
+        model.catalog = self.catalog.appended(rows, tombstoned)
+        if not rows:
+            return model
+        new_features = self.vectorizer.transform(content_text(row) for row in rows)
+        model.features = stack_rows(self.features, new_features)
+        if self.neighbor_index is not None:
+            model.neighbor_index = self.neighbor_index.extended(
+                full_precision(model.features), len(self), dead=model.catalog.tombstones,
+            )
+        if self.ann_index is not None:
+            model.ann_index = self.ann_index.extended(model.features, len(self))
+        if self.shard_index is not None:
+            # Only the genres that gained comics are re-sliced; other shards are shared
+            changed = np.unique(model.catalog.genre_codes[len(self):])
+            model.shard_index = self.shard_index.rebuilt(model.features, model.catalog.genre_codes, changed)
+        return model
+
+    def _build_shards(self) -> Optional[ShardedIndex]:
+        """Per-genre shards of the features, for the "sharded" strategy"""
+        if settings.recommendation_strategy != 'sharded' or self.features is None:
+            return None
+        return ShardedIndex.build(self.features, self.catalog.genre_codes)
+
+    def _load_or_build_ann(self) -> LSHIndex:
+        """Load the ANN index saved for this catalog version and these settings, or build and save it"""
+        path = settings.ann_index_path
+        build = {'features': settings.recommendation_features, 'vector_precision': settings.vector_precision}
+        if path and os.path.exists(path):
+            try:
+                return LSHIndex.load(
+                    path, self.features, version=self.version, build=build,
+                    n_tables=settings.ann_tables, n_bits=settings.ann_bits, n_probes=settings.ann_probes,
+                )
+            except ValueError:
+                pass  # Stale index from an older catalog, feature backend or ANN settings; rebuild below
+            except Exception as e:
+                # Truncated or corrupt file (BadZipFile, EOFError, KeyError, ...); the rebuild overwrites it
+                print(f"⚠️ Could not read the ANN index at {path}, rebuilding: {type(e).__name__}: {e}")
+        index = LSHIndex(
+            n_tables=settings.ann_tables,
+            n_bits=settings.ann_bits,
+            n_probes=settings.ann_probes,
+        ).build(self.features)
+        if path:
+            try:
+                index.save(path, version=self.version, build=build)
+            except OSError as e:
+                print(f"❌ Could not save the ANN index to {path}: {e}")
+        return index
+
+    def __len__(self) -> int:
+        return len(self.catalog)
+
+
+class ModelRegistry:
+    """Keeps one fitted ContentModel for the life of the process.
+
+    The model changes only when the catalog does. Requests compare the
+    catalog data version, one primary key lookup shared by every worker, with
+    the live model's. The rebuild also checks the (row count, max id) of the
+    comics table, which catches writes that bypass the ORM. ORM inserts,
+    content edits and deletes committed in this process are queued in changes
+    and wake the rebuild thread. They are applied to the live model
+    incrementally: comics are vectorized with the fitted vocabulary and
+    appended, their old rows tombstoned. A full refit happens once the model's
+    drift would pass refit_drift, or when the catalog changed in ways this
+    process has no ids for: comics deleted in bulk or by other processes, or
+    content edits committed by other processes. Comics inserted by other
+    processes (the ingest scripts) are found past the live model's max id and
+    appended like this process's own.
+
+    Only the very first model is built in the request that needs it. After
+    that, rebuilds run on a background thread: the new model is built next to
+    the live one, validated, and swapped in by replacing a single reference.
+    Requests keep serving the previous model meanwhile, and requests already
+    holding it finish on it.
+    """
+
+    def __init__(self, store: Optional[FeatureStore] = None,
+                 session_factory: Callable[[], Session] = SessionLocal,
+                 rebuild_interval: float = 0, changes: Optional[CatalogChanges] = None,
+                 refit_drift: float = 0.2):
+        self.store = store
+        self.session_factory = session_factory
+        self.rebuild_interval = rebuild_interval
+        self.changes = changes if changes is not None else CatalogChanges()
+        self.refit_drift = refit_drift
+        self._model: Optional[ContentModel] = None
+        # Content edits committed by other processes that the live model includes
+        self._external_edits = 0
+        self._lock = threading.Lock()
+        self._first_load_lock = threading.Lock()
+        self._rebuild_listeners: List[Callable[[], None]] = []
+        self._rebuild_requested = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.rebuilding = False
+        self.rebuilds = 0
+        self.built_at: Optional[float] = None
+        self.last_build_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def add_rebuild_listener(self, listener: Callable[[], None]):
+        """Call listener whenever the model is replaced"""
+        self._rebuild_listeners.append(listener)
+
+    def _notify_rebuild(self):
+        for listener in self._rebuild_listeners:
+            listener()
+
+    def _catalog_version(self, db: Session) -> CatalogVersion:
+        count, max_id = db.query(func.count(Comic.id), func.max(Comic.id)).one()
+        return (count or 0, max_id or 0, data_versions.get(db, CATALOG)[0])
+
+    @staticmethod
+    def _external_edits_version(db: Session) -> int:
+        """Content edits committed by other processes; this process's own are queued in changes"""
+        # Read before the database, so a commit landing in between errs towards a refit
+        committed = data_versions.committed(CATALOG_EDITS)
+        return data_versions.get(db, CATALOG_EDITS)[0] - committed
+
+    def get_model(self, db: Session, data_version: Optional[int] = None) -> ContentModel:
+        """Return the live model, scheduling a background rebuild if the catalog changed.
+
+        data_version is the catalog data version, if the caller already read it.
+        """
+        model = self._model
+        if model is not None:
+            if data_version is None:
+                data_version = data_versions.get(db, CATALOG)[0]
+            if model.version[2] != data_version:
+                self.request_rebuild()
+            return model
+
+        return self._load_first(db)
+
+    def _load_first(self, db: Session) -> ContentModel:
+        """Build the first model, once; callers arriving meanwhile wait for it"""
+        with self._first_load_lock:
+            # Another request or the warm-up may have built it while we waited for the lock
+            if self._model is None:
+                external_edits = self._external_edits_version(db)
+                # A full build already includes every queued change
+                self.changes.drain()
+                model = self._timed_load(db, self._catalog_version(db))
+                with self._lock:
+                    self._swap(model, external_edits)
+            return self._model
+
+    def warm(self):
+        """Build the first model on the rebuild thread, so the first request does not have to"""
+        self.request_rebuild()
+
+    def request_rebuild(self):
+        """Ask the background thread to check the catalog and rebuild if it changed"""
+        self._rebuild_requested.set()
+        self.start()
+
+    def start(self):
+        """Start the background rebuild thread if it is not running"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._rebuild_loop, name='model-rebuild', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the background rebuild thread, letting a running build finish"""
+        self._stopping.set()
+        self._rebuild_requested.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _rebuild_loop(self):
+        while not self._stopping.is_set():
+            # Wake up on request, or every rebuild_interval seconds when scheduled
+            self._rebuild_requested.wait(self.rebuild_interval or None)
+            self._rebuild_requested.clear()
+            if self._stopping.is_set():
+                return
+            self.rebuild()
+
+    def rebuild(self) -> bool:
+        """Build, validate and swap in a model for the current catalog. Returns whether it was swapped."""
+        db = self.session_factory()
+        try:
+            if self._model is None:
+                try:
+                    self._load_first(db)
+                except Exception as e:
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    print(f"❌ First model build failed: {self.last_error}")
+                    return False
+                return True
+            external_edits = self._external_edits_version(db)
+            version = self._catalog_version(db)
+            live = self._model
+            if live is not None and live.version == version and not len(self.changes):
+                return False
+            upserted, deleted = self.changes.drain()
+            # Other processes' inserts are found past the max id and their deletes fail the count check in
+            # _updated_model, but their content edits carry ids this process never saw
+            known = live is not None and external_edits == self._external_edits
+            self.rebuilding = True
+            try:
+                model = self._timed_load(db, version, (upserted, deleted) if known else None)
+                self._validate(model)
+            except Exception as e:
+                # Keep serving the previous model; the next change or tick retries
+                self.changes.record(upserted, deleted)
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"❌ Model rebuild for catalog {version} failed: {self.last_error}")
+                return False
+            finally:
+                self.rebuilding = False
+        finally:
+            db.close()
+
+        with self._lock:
+            self._swap(model, external_edits)
+        return True
+
+    def _timed_load(self, db: Session, version: CatalogVersion,
+                    changes: Optional[Tuple[Set[int], Set[int]]] = None) -> ContentModel:
+        started = time.perf_counter()
+        model = self._load_model(db, version, changes)
+        self.last_build_seconds = time.perf_counter() - started
+        return model
+
+    def _swap(self, model: ContentModel, external_edits: int):
+        """Make model live. Callers hold self._lock."""
+        self._model = model
+        self._external_edits = external_edits
+        self.rebuilds += 1
+        self.built_at = time.time()
+        self.last_error = None
+        self._notify_rebuild()
+
+    @staticmethod
+    def _validate(model: ContentModel):
+        """Reject a model whose arrays disagree with each other before it goes live"""
+        if model.catalog.live_count != model.version[0]:
+            raise ValueError(f"model has {model.catalog.live_count} comics, catalog has {model.version[0]}")
+        if model.features is None:
+            return
+        n = len(model)
+        if model.features.shape[0] != n:
+            raise ValueError("feature rows do not match the comics")
+        if not np.isfinite(stored_values(model.features)).all():
+            raise ValueError("non-finite feature values")
+        if model.neighbor_index is None:
+            return
+        neighbors = model.neighbor_index.neighbors
+        if neighbors.shape[0] != n:
+            raise ValueError("neighbor rows do not match the comics")
+        if neighbors.size and (neighbors.min() < 0 or neighbors.max() >= n):
+            raise ValueError("neighbor index points outside the catalog")
+
+    def status(self) -> Dict[str, Any]:
+        model = self._model
+        return {
+            "version": list(model.version) if model is not None else None,
+            "comics": model.catalog.live_count if model is not None else 0,
+            "revision": model.revision if model is not None else None,
+            "tombstones": int(model.catalog.tombstones.sum()) if model is not None else 0,
+            "drift": model.drift if model is not None else 0.0,
+            "refit_drift": self.refit_drift,
+            "pending_changes": len(self.changes),
+            "built_at": self.built_at,
+            "last_build_seconds": self.last_build_seconds,
+            "rebuilds": self.rebuilds,
+            "rebuilding": self.rebuilding,
+            "rebuild_interval": self.rebuild_interval,
+            "last_error": self.last_error,
+        }
+
+    def _attach(self, version: CatalogVersion) -> Optional[ContentModel]:
+        """Attach the store's live version if it matches the catalog version and the build settings"""
+        manifest = self.store.current_manifest()
+        if manifest is None or tuple(manifest['catalog_version']) != version or not _built_as_configured(manifest):
+            return None
+        stored = self.store.attach()
+        if stored is None or stored.version != version or not _built_as_configured(stored.manifest):
+            return None  # Republished in between
+        return ContentModel.attached(stored)
+
+    def _load_model(self, db: Session, version: CatalogVersion,
+                    changes: Optional[Tuple[Set[int], Set[int]]] = None) -> ContentModel:
+        """Apply the changes to the live model, or attach the shared on-disk model, or build it (and publish it).
+
+        changes are the (upserted, deleted) comic ids since the live model, None if they are unknown.
+        """
+        model = self._updated_model(db, version, *changes) if changes is not None else None
+        if model is not None:
+            # Kept in memory only: the store holds full builds, which have no tombstones
+            return model
+        if self.store is None:
+            return ContentModel(version, catalog_rows(db))
+
+        model = self._attach(version)
+        if model is not None:
+            return model
+        with self.store.build_lock():
+            # Another worker may have published this version while we waited
+            model = self._attach(version)
+            if model is not None:
+                return model
+            model = ContentModel(version, catalog_rows(db))
+            if model.features is None:
+                return model
+            # Strategies without neighbor lists publish empty ones
+            neighbors = model.neighbor_index or NeighborIndex(
+                np.empty((0, 0), dtype=np.int32), np.empty((0, 0), dtype=np.float32),
+            )
+            neighbors_k = settings.recommendation_neighbors if model.neighbor_index is not None else 0
+            self.store.publish(
+                model.version, model.features, model.catalog, neighbors.neighbors, neighbors.scores, model.vectorizer,
+                _build_settings(neighbors_k),
+            )
+        # Serve from the shared mapping rather than keeping a private copy
+        return self._attach(version) or model
+
+    def _updated_model(self, db: Session, version: CatalogVersion,
+                       upserted: Iterable[int], deleted: Iterable[int]) -> Optional[ContentModel]:
+        """The live model with the changed comics applied, or None if it needs a full refit"""
+        model = self._model
+        if model is None or not model.can_update:
+            return None
+        live = model.id_to_row.keys()
+        # Inserts by other processes or bulk writes raise no event here, but their ids are past the max id
+        upserted = set(upserted) | {comic_id for (comic_id,) in db.query(Comic.id).filter(Comic.id > model.version[1])}
+        rows = catalog_rows(db, ids=upserted) if upserted else []
+        found = {row[0] for row in rows}
+        removed = (set(deleted) | (upserted - found)) & live
+        if model.catalog.live_count + len(found - live) - len(removed) != version[0]:
+            return None  # Comics were deleted without an event saying which
+        if model.drift + (len(rows) + len(found & live) + len(removed)) / max(1, model.fitted_rows) > self.refit_drift:
+            return None
+        try:
+            return model.updated(version, rows, removed)
+        except Exception as e:
+            # A full refit includes the changes too; retrying the same update would fail the same way
+            print(f"⚠️ Incremental update for catalog {version} failed, refitting: {type(e).__name__}: {e}")
+            return None
+
+
+catalog_changes = CatalogChanges()
+model_registry = ModelRegistry(
+    FeatureStore(settings.feature_store_dir) if settings.feature_store_dir else None,
+    rebuild_interval=settings.catalog_rebuild_interval,
+    changes=catalog_changes,
+    refit_drift=settings.index_refit_drift,
+)
+untrack_comic_changes = track_comic_changes(catalog_changes, on_commit=model_registry.request_rebuild)
@@ -0,0 +1,142 @@
+from typing import Optional, Tuple, Union
+import numpy as np
+from scipy import sparse
+
+
+def _rows(matrix) -> Union[sparse.csr_matrix, np.ndarray]:
+    """Feature rows as CSR, or as a contiguous array for dense embeddings"""
+    return sparse.csr_matrix(matrix) if sparse.issparse(matrix) else np.ascontiguousarray(matrix)
+
+
+def _similarities(rows, columns_t) -> np.ndarray:
+    product = rows @ columns_t
+    return product.toarray() if sparse.issparse(product) else product
+
+
+class NeighborIndex:
+    """Top-K most similar comics for every comic in the catalog.
+
+    Neighbors are stored as two (n_comics, k) arrays: int32 row positions and
+    float32 cosine scores, sorted by descending score. That is 8 bytes per
+    neighbor instead of the 8 * n_comics bytes per row a dense similarity
+    matrix needs.
+    """
+
+    def __init__(self, neighbors: np.ndarray, scores: np.ndarray):
+        self.neighbors = neighbors
+        self.scores = scores
+
+    @property
+    def k(self) -> int:
+        return self.neighbors.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        return self.neighbors.nbytes + self.scores.nbytes
+
+    @staticmethod
+    def _top_k(candidates: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-row top-k of candidate columns, sorted by descending score"""
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        return np.take_along_axis(candidates, top, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    @classmethod
+    def build(cls, matrix: sparse.spmatrix, k: int = 50,
+              max_chunk_bytes: int = 64 * 1024 * 1024) -> 'NeighborIndex':
+        """Build the index from L2-normalized feature rows (sparse or dense), a chunk of rows at a time.
+
+        Each chunk materializes at most max_chunk_bytes of dense similarities,
+        so peak memory is bounded no matter how large the catalog is.
+        """
+        matrix = _rows(matrix)
+        n = matrix.shape[0]
+        k = max(0, min(k, n - 1))
+        neighbors = np.empty((n, k), dtype=np.int32)
+        scores = np.empty((n, k), dtype=np.float32)
+        if k == 0:
+            return cls(neighbors, scores)
+
+        cls._fill_rows(matrix, 0, n, neighbors, scores, max_chunk_bytes)
+        return cls(neighbors, scores)
+
+    @classmethod
+    def _fill_rows(cls, matrix, start: int, stop: int,
+                   neighbors: np.ndarray, scores: np.ndarray, max_chunk_bytes: int,
+                   dead: Optional[np.ndarray] = None):
+        """Compute the neighbor lists of rows start..stop against every row of matrix except dead ones"""
+        n = matrix.shape[0]
+        k = neighbors.shape[1]
+        chunk_size = max(1, max_chunk_bytes // (n * 8))
+        matrix_t = matrix.T.tocsc() if sparse.issparse(matrix) else matrix.T
+        columns = np.arange(n, dtype=np.int32)
+        for chunk_start in range(start, stop, chunk_size):
+            chunk_stop = min(chunk_start + chunk_size, stop)
+            sims = _similarities(matrix[chunk_start:chunk_stop], matrix_t)
+            # A comic is never its own neighbor
+            sims[np.arange(chunk_stop - chunk_start), np.arange(chunk_start, chunk_stop)] = -np.inf
+            if dead is not None:
+                sims[:, dead] = -np.inf
+            candidates = np.broadcast_to(columns, sims.shape)
+            neighbors[chunk_start:chunk_stop], scores[chunk_start:chunk_stop] = cls._top_k(candidates, sims, k)
+
+    def extended(self, matrix: sparse.spmatrix, start: int,
+                 max_chunk_bytes: int = 64 * 1024 * 1024, dead: Optional[np.ndarray] = None) -> 'NeighborIndex':
+        """A new index for matrix, whose rows from start on were appended since this one was built.
+
+        New rows get full neighbor lists. Existing rows only compare against the
+        new rows and keep whichever of their old or new candidates score best, so
+        the cost is O(n_rows * n_new_rows) rather than a full rebuild. Rows
+        flagged in the dead mask are never added as neighbors, but existing
+        lists may still hold them; readers filter them out.
+
+        The lists are copied rather than updated in place: existing rows' lists
+        change, and requests still holding this index must keep reading the old
+        ones. The copy is O(n_rows), below the comparison cost.
+        """
+        matrix = _rows(matrix)
+        n = matrix.shape[0]
+        k = self.k
+        if k == 0 or start == 0:
+            return NeighborIndex.build(matrix, k=k or n, max_chunk_bytes=max_chunk_bytes)
+
+        neighbors = np.empty((n, k), dtype=np.int32)
+        scores = np.empty((n, k), dtype=np.float32)
+        new_rows_t = matrix[start:].T.tocsc() if sparse.issparse(matrix) else matrix[start:].T
+        new_columns = np.arange(start, n, dtype=np.int32)
+        chunk_size = max(1, max_chunk_bytes // ((n - start + k) * 8))
+        for chunk_start in range(0, start, chunk_size):
+            chunk_stop = min(chunk_start + chunk_size, start)
+            sims = _similarities(matrix[chunk_start:chunk_stop], new_rows_t)
+            candidates = np.hstack([
+                self.neighbors[chunk_start:chunk_stop],
+                np.broadcast_to(new_columns, sims.shape),
+            ])
+            candidate_scores = np.hstack([self.scores[chunk_start:chunk_stop], sims])
+            neighbors[chunk_start:chunk_stop], scores[chunk_start:chunk_stop] = self._top_k(candidates, candidate_scores, k)
+
+        # Appended rows compare against the whole catalog, exactly as in build()
+        self._fill_rows(matrix, start, n, neighbors, scores, max_chunk_bytes, dead)
+        return NeighborIndex(neighbors, scores)
+
+    def lookup(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Merge the neighbor lists of several comics.
+
+        Returns (candidate rows, best score, source row) with one entry per
+        distinct candidate, sorted by descending score. The source row is the
+        input comic that gave the candidate its best score.
+        """
+        rows = np.asarray(rows, dtype=np.int32)
+        candidates = self.neighbors[rows].ravel()
+        candidate_scores = self.scores[rows].ravel()
+        sources = np.repeat(rows, self.k)
+
+        order = np.argsort(-candidate_scores, kind='stable')
+        candidates = candidates[order]
+        # np.unique keeps the first (best scoring) occurrence of each candidate
+        _, first = np.unique(candidates, return_index=True)
+        first.sort()
+        best = order[first]
+        return candidates[first], candidate_scores[best], sources[best]
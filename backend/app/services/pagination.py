@@ -0,0 +1,49 @@
+import base64
+import binascii
+import hashlib
+from typing import Hashable, Sequence, Tuple
+import numpy as np
+
+
+class InvalidCursor(ValueError):
+    """The cursor was not issued by this API"""
+
+
+class CursorExpired(InvalidCursor):
+    """The ranking the cursor points into is outdated: the models or the ratings it was ranked from changed"""
+
+
+def _fingerprint(user_id: int, size: int, version: Hashable, ranked_ids: Sequence[int]) -> str:
+    # The ranked ids tie the cursor to one ordering: workers at the same versions can still rank differently,
+    # e.g. one serving incremental updates to its model and one that refit it
+    digest = hashlib.blake2b(repr((user_id, size, version)).encode(), digest_size=8)
+    digest.update(np.asarray(ranked_ids, dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def encode_cursor(offset: int, size: int, user_id: int, version: Hashable, ranked_ids: Sequence[int]) -> str:
+    """Opaque cursor for the page at offset of the user's size-long ranking of ranked_ids at version"""
+    raw = f"{offset}.{size}.{_fingerprint(user_id, size, version, ranked_ids)}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, max_size: int) -> Tuple[int, int, str]:
+    """(offset, ranking size, fingerprint) of a cursor; check the fingerprint with check_cursor.
+
+    Sizes above max_size were never issued, so they are rejected before anything is ranked.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        offset, size, fingerprint = raw.split('.')
+        offset, size = int(offset), int(size)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor("malformed cursor")
+    if not 0 < offset < size <= max_size:
+        raise InvalidCursor("malformed cursor")
+    return offset, size, fingerprint
+
+
+def check_cursor(fingerprint: str, user_id: int, size: int, version: Hashable, ranked_ids: Sequence[int]):
+    """Raise CursorExpired unless a decoded cursor was issued for this ranking of the user's at version"""
+    if fingerprint != _fingerprint(user_id, size, version, ranked_ids):
+        raise CursorExpired("the recommendations changed since this cursor was issued; request the first page again")
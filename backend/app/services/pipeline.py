@@ -0,0 +1,78 @@
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from .model_registry import ContentModel
+
+# (model, liked rows, limit) -> (candidate rows, scores), at most limit of each, higher scores better
+CandidateGenerator = Callable[[ContentModel, np.ndarray, int], Tuple[np.ndarray, np.ndarray]]
+
+# (stage name, milliseconds, candidate count or None)
+StageTiming = Tuple[str, float, Optional[int]]
+
+
+def content_candidates(model: ContentModel, liked_rows: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Merged precomputed neighbor lists of the liked comics"""
+    rows, scores, _ = model.neighbor_index.lookup(liked_rows)
+    return rows[:limit], scores[:limit]
+
+
+def character_candidates(model: ContentModel, liked_rows: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Comics featuring the liked comics' characters, rarer characters weighing more"""
+    return model.catalog.characters.candidates(liked_rows, limit)
+
+
+class CandidatePipeline:
+    """Two-stage ranking: bounded candidate generators, then one ranker over their union.
+
+    Each generator proposes at most budget / len(generators) comics, so the
+    per-request work is capped by budget whatever the catalog size. The ranker
+    merges and dedupes the candidates, drops comics the user already rated and
+    scores only the union: the profile's cosine similarity, blended with
+    generator_weight of the generators' evidence (each generator's scores
+    scaled to 0..1, averaged over all generators, so a comic proposed by
+    several of them gets more).
+    """
+
+    def __init__(self, generators: Dict[str, CandidateGenerator], budget: int = 400,
+                 generator_weight: float = 0.3):
+        self.generators = generators
+        self.budget = budget
+        self.generator_weight = generator_weight
+
+    def run(self, model: ContentModel, liked_rows: np.ndarray, excluded: np.ndarray,
+            profile: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, List[StageTiming]]:
+        """(candidate rows, scores, stage timings); candidates are unsorted"""
+        stages: List[StageTiming] = []
+        limit = max(1, self.budget // max(1, len(self.generators)))
+        # Rated comics are dropped after generation, so ask for enough to survive that
+        limit += min(int(excluded.sum()), limit)
+
+        proposals = []
+        for name, generate in self.generators.items():
+            started = time.perf_counter()
+            rows, scores = generate(model, liked_rows, limit)
+            rows = np.asarray(rows, dtype=np.intp)
+            stages.append((name, (time.perf_counter() - started) * 1000, len(rows)))
+            proposals.append((rows, np.asarray(scores, dtype=np.float64)))
+
+        started = time.perf_counter()
+        union = np.unique(np.concatenate([rows for rows, _ in proposals])) if proposals else np.empty(0, dtype=np.intp)
+        union = union[~excluded[union]]
+        evidence = np.zeros(len(union))
+        for rows, scores in proposals:
+            keep = ~excluded[rows]
+            rows, scores = rows[keep], scores[keep]
+            if len(rows) == 0:
+                continue
+            low, high = scores.min(), scores.max()
+            scaled = (scores - low) / (high - low) if high > low else np.ones(len(scores))
+            # Rows are unique within one generator's proposal
+            evidence[np.searchsorted(union, rows)] += scaled
+        evidence /= max(1, len(proposals))
+        stages.append(('merge', (time.perf_counter() - started) * 1000, len(union)))
+
+        started = time.perf_counter()
+        similarity = model.features[union] @ profile if profile is not None else np.zeros(len(union))
+        scores = (1 - self.generator_weight) * similarity + self.generator_weight * evidence
+        stages.append(('score', (time.perf_counter() - started) * 1000, len(union)))
+        return union, scores, stages
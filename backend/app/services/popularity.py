@@ -0,0 +1,161 @@
+import hashlib
+import threading
+import time
+from typing import Callable, Dict, Hashable, Iterable, Optional, Tuple
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models import UserRating
+
+
+class PopularityRanking:
+    """Per-comic rating aggregates and a precomputed popularity ranking.
+
+    Comics are ranked by Bayesian average, (prior_weight * global mean + sum)
+    / (prior_weight + count), so a single 5-star rating does not outrank a
+    comic with fifty 4.8s. Unrated comics follow in catalog order.
+
+    Only the first load runs in a request. After that a background thread
+    reloads the aggregates from the database every refresh_seconds, which
+    also picks up writes made by other workers, and re-ranks every
+    rerank_seconds if ratings were recorded from this process meanwhile. Both
+    build the new ranking outside the lock and swap it in, so requests never
+    wait on the GROUP BY or the sort. version fingerprints the live ranking,
+    so workers that rank alike agree on it.
+    """
+
+    def __init__(self, prior_weight: float = 5.0, refresh_seconds: float = 60, rerank_seconds: float = 5,
+                 session_factory: Callable[[], Session] = SessionLocal):
+        self.prior_weight = prior_weight
+        self.refresh_seconds = refresh_seconds
+        self.rerank_seconds = rerank_seconds
+        self.session_factory = session_factory
+        self.version: Optional[str] = None
+        self._counts: Dict[int, int] = {}
+        self._sums: Dict[int, float] = {}
+        self._loaded_at: Optional[float] = None
+        # Ratings recorded in place so far, and how many of them the live ranking includes
+        self._recorded = 0
+        self._ranked_recorded = 0
+        # Rated comic ids, most popular first, and the same filtered to one catalog version
+        self._rated: Optional[np.ndarray] = None
+        self._ranked: Optional[np.ndarray] = None
+        self._ranked_for: Optional[Hashable] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _query(db: Session) -> Tuple[Dict[int, int], Dict[int, float]]:
+        rows = db.query(UserRating.comic_id, func.count(UserRating.id), func.sum(UserRating.rating)).group_by(
+            UserRating.comic_id
+        ).all()
+        return {comic_id: count for comic_id, count, _ in rows}, {comic_id: float(total) for comic_id, _, total in rows}
+
+    def _rank(self, counts: Dict[int, int], sums: Dict[int, float]) -> np.ndarray:
+        """Rated comic ids by descending Bayesian average"""
+        ids = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        count_values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        sum_values = np.fromiter((sums[comic_id] for comic_id in counts), dtype=np.float64, count=len(counts))
+        mean = sum_values.sum() / count_values.sum() if len(count_values) else 0.0
+        averages = (self.prior_weight * mean + sum_values) / (self.prior_weight + count_values)
+        # Highest average first; ties broken by id so every worker ranks alike
+        return ids[np.lexsort((ids, -averages))]
+
+    def _swap(self, rated: np.ndarray, recorded: int, aggregates: Optional[Tuple[Dict[int, int], Dict[int, float]]] = None):
+        """Make a ranking (and the aggregates it was built from, if reloaded) live. Callers hold self._lock."""
+        if aggregates is not None:
+            self._counts, self._sums = aggregates
+            self._loaded_at = time.monotonic()
+        self._rated, self._ranked = rated, None
+        self._ranked_recorded = recorded
+        self.version = hashlib.blake2b(rated.tobytes(), digest_size=8).hexdigest()
+
+    def load(self, ratings: Iterable[Tuple[int, float]]):
+        """Replace the aggregates with ones computed from (comic_id, rating) rows"""
+        counts: Dict[int, int] = {}
+        sums: Dict[int, float] = {}
+        for comic_id, rating in ratings:
+            counts[comic_id] = counts.get(comic_id, 0) + 1
+            sums[comic_id] = sums.get(comic_id, 0.0) + rating
+        rated = self._rank(counts, sums)
+        with self._lock:
+            self._swap(rated, self._recorded, (counts, sums))
+
+    def record(self, comic_id: int, old_rating: Optional[float], new_rating: float):
+        """Apply a new (old_rating None) or changed rating; the ranking follows within rerank_seconds"""
+        with self._lock:
+            if self._loaded_at is None:
+                return  # The first load will read it from the database
+            if old_rating is None:
+                self._counts[comic_id] = self._counts.get(comic_id, 0) + 1
+                old_rating = 0.0
+            self._sums[comic_id] = self._sums.get(comic_id, 0.0) + new_rating - old_rating
+            self._recorded += 1
+
+    def reload(self):
+        """Reload the aggregates from the database and swap them in with their ranking"""
+        db = self.session_factory()
+        try:
+            counts, sums = self._query(db)
+        finally:
+            db.close()
+        rated = self._rank(counts, sums)
+        with self._lock:
+            # Ratings recorded while the query ran are in the database; the next reload sees them if not
+            self._swap(rated, self._recorded, (counts, sums))
+
+    def rerank(self):
+        """Rank the aggregates again if ratings were recorded since the last ranking"""
+        with self._lock:
+            if self._recorded == self._ranked_recorded:
+                return
+            counts, sums, recorded = dict(self._counts), dict(self._sums), self._recorded
+        rated = self._rank(counts, sums)
+        with self._lock:
+            self._swap(rated, recorded)
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.rerank_seconds)
+            try:
+                if time.monotonic() - self._loaded_at > self.refresh_seconds:
+                    self.reload()
+                else:
+                    self.rerank()
+            except Exception as e:
+                # Keep serving the current ranking; the next tick retries
+                print(f"❌ Popularity refresh failed: {type(e).__name__}: {e}")
+
+    def _start(self):
+        """Start the background refresh, unless reloads are disabled. Callers hold self._lock."""
+        if self._thread is None and self.refresh_seconds != float('inf'):
+            self._thread = threading.Thread(target=self._refresh_loop, name='popularity-refresh', daemon=True)
+            self._thread.start()
+
+    def ensure_loaded(self, db: Session):
+        """Load the aggregates on first use and start the background refresh"""
+        with self._lock:
+            if self._loaded_at is None:
+                counts, sums = self._query(db)
+                self._swap(self._rank(counts, sums), self._recorded, (counts, sums))
+            self._start()
+
+    def ranked_ids(self, db: Session, catalog_ids: np.ndarray, catalog_version: Hashable) -> np.ndarray:
+        """Every catalog comic id, most popular first"""
+        self.ensure_loaded(db)
+        with self._lock:
+            if self._ranked is None or self._ranked_for != catalog_version:
+                rated = self._rated[np.isin(self._rated, catalog_ids)]
+                unrated = catalog_ids[~np.isin(catalog_ids, rated)]
+                self._ranked = np.concatenate([rated, unrated]).astype(np.int64)
+                self._ranked_for = catalog_version
+            return self._ranked
+
+
+popularity_ranking = PopularityRanking(
+    prior_weight=settings.popularity_prior_weight,
+    refresh_seconds=settings.popularity_refresh_seconds,
+    rerank_seconds=settings.popularity_rerank_seconds,
+)
@@ -0,0 +1,302 @@
+import weakref
+from typing import Optional, Tuple, Union
+import numpy as np
+from scipy import sparse
+
+# None keeps matrices as built; "float32" only casts; "float16" and "int8" store quantized codes
+PRECISIONS = (None, 'float32', 'float16', 'int8')
+
+# Values dequantized at a time by the scoring kernels, bounding their scratch memory
+BLOCK_VALUES = 1 << 20
+
+# Buffers allocated by _append with spare rows at the end, by id
+_growable = weakref.WeakValueDictionary()
+
+
+def _append(array: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """array with rows added at the end, copying array only when its buffer is full.
+
+    array is returned as a view of a buffer with spare capacity, which later
+    appends fill in place, so adding rows costs O(rows) amortized rather than
+    O(len(array)). Arrays sharing the buffer are prefixes of the result and
+    never see the added rows. A view's rows past its end are only overwritten
+    when a longer view of them was discarded, as the model registry does with
+    a model that fails validation.
+    """
+    n, added = len(array), len(rows)
+    buffer = array.base
+    if (isinstance(buffer, np.ndarray) and _growable.get(id(buffer)) is buffer
+            and array.ctypes.data == buffer.ctypes.data and len(buffer) >= n + added):
+        buffer[n:n + added] = rows
+        return buffer[:n + added]
+    buffer = np.empty((max(n + added, 2 * n, 16),) + array.shape[1:], dtype=array.dtype)
+    buffer[:n] = array
+    buffer[n:n + added] = rows
+    _growable[id(buffer)] = buffer
+    return buffer[:n + added]
+
+
+def _row_scales(values: np.ndarray, codes: np.ndarray, row_of_value: np.ndarray, n_rows: int) -> np.ndarray:
+    """Per-row factor giving each dequantized row the norm of the original row"""
+    original = np.sqrt(np.bincount(row_of_value, weights=np.square(values, dtype=np.float64), minlength=n_rows))
+    coded = np.sqrt(np.bincount(row_of_value, weights=np.square(codes, dtype=np.float64), minlength=n_rows))
+    scales = np.zeros(n_rows, dtype=np.float32)
+    np.divide(original, coded, out=scales, where=coded > 0, casting='unsafe')
+    return scales
+
+
+def _codes(values: np.ndarray, peaks: np.ndarray, precision: str) -> np.ndarray:
+    """float16 values, or int8 codes of values divided by their row's peak (one peak per value)"""
+    if precision == 'float16':
+        return values.astype(np.float16)
+    if precision == 'int8':
+        scaled = np.divide(values, peaks, out=np.zeros(len(values), dtype=np.float32), where=peaks > 0)
+        return np.rint(scaled * 127).astype(np.int8)
+    raise ValueError(f"unknown quantized precision {precision!r}")
+
+
+class QuantizedSparse:
+    """CSR matrix stored as float16 values or int8 codes with one float32 scale per row.
+
+    Row r is data[indptr[r]:indptr[r + 1]] * row_scales[r] over the matching
+    column indices. The scale is chosen so each dequantized row keeps the norm
+    of the original row: L2-normalized features stay normalized and their dot
+    products stay cosines. Column indices are uint16 when the matrix is at
+    most 65536 columns wide. Products dequantize a block of rows at a time, so
+    a float copy of the whole matrix is never made.
+    """
+
+    def __init__(self, data: np.ndarray, indices: np.ndarray, indptr: np.ndarray,
+                 row_scales: np.ndarray, shape: Tuple[int, int]):
+        self.data = data
+        self.indices = indices
+        self.indptr = indptr
+        self.row_scales = row_scales
+        self.shape = tuple(shape)
+
+    @classmethod
+    def quantize(cls, matrix: sparse.spmatrix, precision: str) -> 'QuantizedSparse':
+        matrix = sparse.csr_matrix(matrix)
+        n_rows, n_columns = matrix.shape
+        values = matrix.data.astype(np.float32)
+        row_of_value = np.repeat(np.arange(n_rows), np.diff(matrix.indptr))
+        peaks = np.zeros(n_rows, dtype=np.float32)
+        if precision == 'int8':
+            # Segments run from one non-empty row's start to the next's, skipping empty rows
+            nonempty = np.diff(matrix.indptr) > 0
+            peaks[nonempty] = np.maximum.reduceat(np.abs(values), matrix.indptr[:-1][nonempty])
+        codes = _codes(values, peaks[row_of_value], precision)
+        index_dtype = np.uint16 if n_columns <= 1 << 16 else np.int32
+        return cls(codes, matrix.indices.astype(index_dtype), matrix.indptr.astype(np.int64),
+                   _row_scales(values, codes, row_of_value, n_rows), matrix.shape)
+
+    @property
+    def precision(self) -> str:
+        return 'int8' if self.data.dtype == np.int8 else 'float16'
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + self.indices.nbytes + self.indptr.nbytes + self.row_scales.nbytes
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def _codes_block(self, start: int, stop: int) -> sparse.csr_matrix:
+        """Rows start..stop as float32 codes, before their row scales are applied"""
+        first, last = self.indptr[start], self.indptr[stop]
+        return sparse.csr_matrix(
+            (self.data[first:last].astype(np.float32), self.indices[first:last].astype(np.int32),
+             self.indptr[start:stop + 1] - first),
+            shape=(stop - start, self.shape[1]),
+        )
+
+    def _block(self, start: int, stop: int) -> sparse.csr_matrix:
+        """Rows start..stop dequantized to float32"""
+        first, last = self.indptr[start], self.indptr[stop]
+        lengths = np.diff(self.indptr[start:stop + 1])
+        data = self.data[first:last].astype(np.float32) * np.repeat(self.row_scales[start:stop], lengths)
+        return sparse.csr_matrix(
+            (data, self.indices[first:last].astype(np.int32), self.indptr[start:stop + 1] - first),
+            shape=(stop - start, self.shape[1]),
+        )
+
+    def _blocks(self):
+        """(start, stop) row ranges of about BLOCK_VALUES stored values each"""
+        start, n = 0, self.shape[0]
+        while start < n:
+            stop = int(np.searchsorted(self.indptr, self.indptr[start] + BLOCK_VALUES, side='right')) - 1
+            stop = min(max(stop, start + 1), n)
+            yield start, stop
+            start = stop
+
+    def __matmul__(self, other) -> np.ndarray:
+        """Product with a dense vector or matrix, as float32"""
+        other = np.asarray(other, dtype=np.float32)
+        blocks = [self._codes_block(start, stop) @ other for start, stop in self._blocks()]
+        if not blocks:
+            return np.zeros((0,) + other.shape[1:], dtype=np.float32)
+        # Scaling the products is cheaper than scaling every stored value
+        product = np.concatenate(blocks)
+        return product * (self.row_scales[:, None] if product.ndim == 2 else self.row_scales)
+
+    def _gather(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(positions of the rows' stored values, indptr of the rows on their own)"""
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        return np.repeat(starts - indptr[:-1], lengths) + np.arange(indptr[-1]), indptr
+
+    def __getitem__(self, rows) -> sparse.csr_matrix:
+        """The given rows (an index array, slice or int) dequantized to a float32 CSR matrix"""
+        rows = np.atleast_1d(np.arange(self.shape[0])[rows])
+        positions, indptr = self._gather(rows)
+        data = self.data[positions].astype(np.float32) * np.repeat(self.row_scales[rows], np.diff(indptr))
+        return sparse.csr_matrix((data, self.indices[positions].astype(np.int32), indptr),
+                                 shape=(len(rows), self.shape[1]))
+
+    def take(self, rows: np.ndarray) -> 'QuantizedSparse':
+        """The given rows as a new quantized matrix, without dequantizing them"""
+        rows = np.asarray(rows)
+        positions, indptr = self._gather(rows)
+        return QuantizedSparse(self.data[positions], self.indices[positions], indptr, self.row_scales[rows],
+                               (len(rows), self.shape[1]))
+
+    def tocsr(self) -> sparse.csr_matrix:
+        """The whole matrix dequantized to float32"""
+        return self._block(0, self.shape[0])
+
+    def appended(self, matrix: sparse.spmatrix) -> 'QuantizedSparse':
+        """A new matrix with matrix's rows quantized and added below; existing codes are reused"""
+        new = QuantizedSparse.quantize(matrix, self.precision)
+        return QuantizedSparse(
+            _append(self.data, new.data),
+            _append(self.indices, new.indices),
+            _append(self.indptr, new.indptr[1:] + self.indptr[-1]),
+            _append(self.row_scales, new.row_scales),
+            (self.shape[0] + new.shape[0], self.shape[1]),
+        )
+
+
+class QuantizedDense:
+    """Dense row-major matrix stored as float16 values or int8 codes with one float32 scale per row"""
+
+    def __init__(self, codes: np.ndarray, row_scales: np.ndarray):
+        self.codes = codes
+        self.row_scales = row_scales
+
+    @classmethod
+    def quantize(cls, matrix: np.ndarray, precision: str) -> 'QuantizedDense':
+        values = np.asarray(matrix, dtype=np.float32)
+        n_rows, n_columns = values.shape
+        peaks = np.abs(values).max(axis=1) if values.size else np.zeros(n_rows, dtype=np.float32)
+        codes = _codes(values.ravel(), np.repeat(peaks, n_columns), precision).reshape(values.shape)
+        return cls(codes, _row_scales(values.ravel(), codes.ravel(), np.repeat(np.arange(n_rows), n_columns), n_rows))
+
+    @property
+    def precision(self) -> str:
+        return 'int8' if self.codes.dtype == np.int8 else 'float16'
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.row_scales.nbytes
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    def __matmul__(self, other) -> np.ndarray:
+        """Product with a dense vector or matrix, as float32, a block of rows at a time"""
+        n = self.codes.shape[0]
+        step = max(1, BLOCK_VALUES // max(1, self.codes.shape[1]))
+        other = np.asarray(other, dtype=np.float32)
+        blocks = [self.codes[start:start + step].astype(np.float32) @ other for start in range(0, n, step)]
+        if not blocks:
+            return np.zeros((0,) + other.shape[1:], dtype=np.float32)
+        product = np.concatenate(blocks)
+        return product * (self.row_scales[:, None] if product.ndim == 2 else self.row_scales)
+
+    def __getitem__(self, rows) -> np.ndarray:
+        """The given rows (an index array, slice or int) dequantized to float32"""
+        values = self.codes[rows].astype(np.float32)
+        scales = self.row_scales[rows]
+        return values * (scales[..., None] if values.ndim == 2 else scales)
+
+    def take(self, rows: np.ndarray) -> 'QuantizedDense':
+        """The given rows as a new quantized matrix, without dequantizing them"""
+        return QuantizedDense(self.codes[rows], self.row_scales[rows])
+
+    def appended(self, matrix: np.ndarray) -> 'QuantizedDense':
+        """A new matrix with matrix's rows quantized and added below; existing codes are reused"""
+        new = QuantizedDense.quantize(matrix, self.precision)
+        return QuantizedDense(_append(self.codes, new.codes), _append(self.row_scales, new.row_scales))
+
+
+Matrix = Union[np.ndarray, sparse.spmatrix, QuantizedSparse, QuantizedDense]
+
+
+def quantize(matrix: Matrix, precision: Optional[str]) -> Matrix:
+    """matrix stored at precision (one of PRECISIONS)"""
+    if precision not in PRECISIONS:
+        raise ValueError(f"unknown precision {precision!r}, expected one of {PRECISIONS}")
+    if precision is None or isinstance(matrix, (QuantizedSparse, QuantizedDense)):
+        return matrix
+    if precision == 'float32':
+        return matrix.astype(np.float32)
+    if sparse.issparse(matrix):
+        return QuantizedSparse.quantize(matrix, precision)
+    return QuantizedDense.quantize(matrix, precision)
+
+
+def full_precision(matrix: Matrix) -> Union[np.ndarray, sparse.spmatrix]:
+    """matrix as a plain float array or CSR matrix, dequantizing it if needed"""
+    if isinstance(matrix, QuantizedSparse):
+        return matrix.tocsr()
+    if isinstance(matrix, QuantizedDense):
+        return matrix[:]
+    return matrix
+
+
+def stack_rows(matrix: Matrix, rows: Union[np.ndarray, sparse.spmatrix]) -> Matrix:
+    """matrix with rows added below, stored the same way as matrix.
+
+    The stored arrays grow into spare capacity (see _append), so this costs
+    O(added rows) amortized. matrix itself is left as it was: it still holds
+    only its own rows, so a model being served keeps its features while the
+    model holding the new rows is swapped in.
+    """
+    if isinstance(matrix, (QuantizedSparse, QuantizedDense)):
+        return matrix.appended(rows)
+    if isinstance(matrix, np.ndarray):
+        return _append(matrix, np.asarray(rows, dtype=matrix.dtype))
+    matrix = sparse.csr_matrix(matrix)
+    rows = sparse.csr_matrix(rows)
+    return sparse.csr_matrix(
+        (_append(matrix.data, rows.data.astype(matrix.dtype)), _append(matrix.indices, rows.indices),
+         _append(matrix.indptr, rows.indptr[1:] + matrix.indptr[-1])),
+        shape=(matrix.shape[0] + rows.shape[0], matrix.shape[1]),
+    )
+
+
+def stored_values(matrix: Matrix) -> np.ndarray:
+    """The values a matrix stores: CSR data, the dense array, or the quantized codes"""
+    if isinstance(matrix, QuantizedDense):
+        return matrix.codes
+    if isinstance(matrix, QuantizedSparse) or sparse.issparse(matrix):
+        return matrix.data
+    return np.asarray(matrix)
+
+
+def matrix_nbytes(matrix: Matrix) -> int:
+    """Bytes held by a dense, CSR or quantized matrix"""
+    if sparse.issparse(matrix):
+        matrix = sparse.csr_matrix(matrix)
+        return int(matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes)
+    return int(matrix.nbytes)
@@ -1,143 +1,395 @@
-from typing import List, Dict
+import time
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
 import numpy as np
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
 from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..core.database import SessionLocal
 from ..models import Comic, UserRating
 from ..schemas import Recommendation
+from .als import load_als_model
+from .cache import RecommendationCache, recommendation_cache
+from .collaborative import CoRatingModel, co_rating_model
+from .data_versions import CATALOG, RATINGS, data_versions, user_ratings_key
+from .diversity import mmr
+from .executor import RecommendationExecutor, recommendation_executor
+from .model_registry import ContentModel, ModelRegistry, model_registry
+from .pagination import check_cursor, decode_cursor, encode_cursor
+from .pipeline import CandidateGenerator, CandidatePipeline, StageTiming, character_candidates, content_candidates
+from .popularity import PopularityRanking, popularity_ranking
+from .shards import shard_executor
+
+
+# A ranked recommendation before its Comic row is loaded: (comic_id, score, explanation)
+RankedComic = Tuple[int, float, str]
+
+# 3+ star ratings count as liked; users with none get the popularity ranking
+LIKED_RATING = 3.0
+# Strategies that read every user's ratings (co-rating) or the popularity ranking, besides the cold-start fallback
+RATINGS_STRATEGIES = ('collaborative', 'pipeline')
+POPULARITY_STRATEGIES = ('pipeline',)
+
+
+def _top_n(scores: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the n highest finite scores, best first"""
+    n = min(n, int(np.isfinite(scores).sum()))
+    if n <= 0:
+        return np.empty(0, dtype=np.intp)
+    top = np.argpartition(-scores, n - 1)[:n]
+    return top[np.argsort(-scores[top], kind='stable')]
 
 
 class RecommendationService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, registry: ModelRegistry = model_registry,
+                 co_rating: CoRatingModel = co_rating_model,
+                 cache: RecommendationCache = recommendation_cache,
+                 popularity: PopularityRanking = popularity_ranking,
+                 executor: RecommendationExecutor = recommendation_executor):
         self.db = db
-        self.vectorizer = TfidfVectorizer(stop_words='english', max_features=1000)
-        
-    def _create_content_features(self, comics: List[Comic]) -> pd.DataFrame:
-        """Create content features for comics using TF-IDF"""
-        data = []
-        for comic in comics:
-            # Combine description, characters, and genre for content analysis
-            characters_text = ' '.join(comic.characters) if comic.characters else ''
-            combined_text = f"{comic.description} {characters_text} {comic.genre}"
-            data.append({
-                'id': comic.id,
-                'title': comic.title,
-                'content': combined_text,
-                'genre': comic.genre,
-                'characters': comic.characters
-            })
-        return pd.DataFrame(data)
-    
-    def _get_user_preferences(self, user_id: int) -> List[int]:
-        """Get comics that user rated highly (3+ stars)"""
-        high_ratings = self.db.query(UserRating).filter(
-            UserRating.user_id == user_id,
-            UserRating.rating >= 3.0
-        ).all()
-        return [rating.comic_id for rating in high_ratings]
+        self.registry = registry
+        self.co_rating = co_rating
+        self.cache = cache
+        self.popularity = popularity
+        self.executor = executor
+        # Per-stage (name, ms, candidates) of the last request, for the Server-Timing header
+        self.stage_timings: List[StageTiming] = []
+        # Candidate generators of the "pipeline" strategy: (model, liked rows, limit) -> (rows, scores)
+        self.generators: Dict[str, CandidateGenerator] = {
+            'content': content_candidates,
+            'co_rating': self._co_rating_candidates,
+            'popularity': self._popular_candidates,
+            'characters': character_candidates,
+        }
+        # Ranking strategies: (model, user id, liked rows, excluded mask, n) -> (rows, scores)
+        self.strategies: Dict[str, Callable] = {
+            'profile': self._rank_by_profile,
+            'neighbors': self._rank_by_neighbors,
+            'ann': self._rank_by_ann,
+            'collaborative': self._rank_by_co_rating,
+            'als': self._rank_by_als,
+            'characters': self._rank_by_characters,
+            'pipeline': self._rank_by_pipeline,
+            'sharded': self._rank_by_shards,
+        }
+    
+    def _get_user_ratings(self, user_id: int) -> Dict[int, float]:
+        """Get every rating of the user as {comic_id: rating} in one query"""
+        return dict(self.db.query(UserRating.comic_id, UserRating.rating).filter(
+            UserRating.user_id == user_id
+        ).all())
+    
+    def _load_comics(self, comic_ids: List[int]) -> Dict[int, Comic]:
+        """Load the given comics with a single IN query"""
+        if not comic_ids:
+            return {}
+        return {comic.id: comic for comic in self.db.query(Comic).filter(Comic.id.in_(comic_ids)).all()}
+    
+    def _profile_vector(self, model: ContentModel, liked_rows: np.ndarray) -> Optional[np.ndarray]:
+        """Sum of the liked rows, normalized so dot products are cosine similarities"""
+        profile = np.asarray(model.features[liked_rows].sum(axis=0)).ravel()
+        norm = np.linalg.norm(profile)
+        return profile / norm if norm > 0 else None
+    
+    def _rank_by_profile(self, model: ContentModel, user_id: int, liked_rows: np.ndarray,
+                         excluded: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Score the whole catalog against one user-profile vector"""
+        profile = self._profile_vector(model, liked_rows)
+        if profile is None:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        scores = model.features @ profile
+        scores[excluded] = -np.inf
+        rows = _top_n(scores, n)
+        return rows, scores[rows]
+    
+    def _rank_by_characters(self, model: ContentModel, user_id: int, liked_rows: np.ndarray,
+                            excluded: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Blend profile similarity with how many characters each comic shares with the liked ones"""
+        profile = self._profile_vector(model, liked_rows)
+        scores = model.features @ profile if profile is not None else np.zeros(len(model))
+        weight = settings.character_weight
+        scores = (1 - weight) * scores + weight * model.catalog.characters.overlap_scores(liked_rows)
+        scores[excluded] = -np.inf
+        rows = _top_n(scores, n)
+        return rows, scores[rows]
+    
+    def _rank_by_shards(self, model: ContentModel, user_id: int, liked_rows: np.ndarray,
+                        excluded: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Profile scoring over only the genre shards the user likes, shards in parallel"""
+        profile = self._profile_vector(model, liked_rows)
+        if profile is None:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        genres, counts = np.unique(model.catalog.genre_codes[liked_rows], return_counts=True)
+        keys = genres[counts / len(liked_rows) > settings.shard_min_affinity].tolist()
+        return model.shard_index.top_k(profile, n, excluded, keys=keys, executor=shard_executor)
+    
+    def _rank_by_neighbors(self, model: ContentModel, user_id: int, liked_rows: np.ndarray,
+                           excluded: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Merge the precomputed neighbor lists of the liked comics"""
+        candidate_rows, scores, _ = model.neighbor_index.lookup(liked_rows)
+        keep = ~excluded[candidate_rows]
+        return candidate_rows[keep][:n], scores[keep][:n]
+    
+    def _rank_by_ann(self, model: ContentModel, user_id: int, liked_rows: np.ndarray,
+                     excluded: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate profile scoring through the LSH index"""
+        profile = self._profile_vector(model, liked_rows)
+        if profile is None:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        return model.ann_index.query(profile, n, excluded)
+    
+    def _rank_by_co_rating(self, model: ContentModel, user_id: int, liked_rows: np.ndarray,
+                           excluded: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Rank comics that were co-rated with the liked comics by other users.
+
+        Falls back to the profile ranking when nobody else rated the liked comics.
+        """
+        self.co_rating.ensure_loaded(self.db)
+        similar = self.co_rating.similar(int(comic_id) for comic_id in model.ids[liked_rows])
+        known = [(model.id_to_row[comic_id], score) for comic_id, score in similar.items() if comic_id in model.id_to_row]
+        scores = np.full(len(model), -np.inf)
+        if known:
+            rows, values = zip(*known)
+            scores[list(rows)] = values
+        scores[excluded] = -np.inf
+        rows = _top_n(scores, n)
+        if len(rows) == 0:
+            return self._rank_by_profile(model, user_id, liked_rows, excluded, n)
+        return rows, scores[rows]
+    
+    def _rank_by_als(self, model: ContentModel, user_id: int, liked_rows: np.ndarray,
+                     excluded: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Rank by the dot product of memory-mapped ALS user and item factors.
+
+        Falls back to the profile ranking when there are no factors for the user or their liked comics.
+        """
+        als = load_als_model(settings.als_model_dir)
+        user_vector = als.user_vector(user_id, (int(comic_id) for comic_id in model.ids[liked_rows])) if als else None
+        if user_vector is None:
+            return self._rank_by_profile(model, user_id, liked_rows, excluded, n)
+        item_rows = als.catalog_rows(model.id_to_row, model.cache_key)
+        known = item_rows >= 0
+        scores = np.full(len(model), -np.inf)
+        scores[item_rows[known]] = als.item_scores(user_vector)[known]
+        scores[excluded] = -np.inf
+        rows = _top_n(scores, n)
+        if len(rows) == 0:
+            return self._rank_by_profile(model, user_id, liked_rows, excluded, n)
+        return rows, scores[rows]
+    
+    def _co_rating_candidates(self, model: ContentModel, liked_rows: np.ndarray,
+                              limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Comics most co-rated with the liked ones"""
+        self.co_rating.ensure_loaded(self.db)
+        similar = self.co_rating.similar(int(comic_id) for comic_id in model.ids[liked_rows])
+        known = [(model.id_to_row[comic_id], score) for comic_id, score in similar.items() if comic_id in model.id_to_row]
+        if not known:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        rows, scores = (np.array(values) for values in zip(*known))
+        top = _top_n(scores, limit)
+        return rows[top], scores[top]
+    
+    def _popular_candidates(self, model: ContentModel, liked_rows: np.ndarray,
+                            limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """The head of the popularity ranking, scored by position"""
+        popular_ids = self.popularity.ranked_ids(self.db, model.catalog.live_ids, model.cache_key)[:limit]
+        rows = np.array([model.id_to_row[int(comic_id)] for comic_id in popular_ids], dtype=np.intp)
+        return rows, np.linspace(1.0, 0.0, num=len(rows), endpoint=False)
+    
+    def _rank_by_pipeline(self, model: ContentModel, user_id: int, liked_rows: np.ndarray,
+                          excluded: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Score only the union of the configured candidate generators' proposals"""
+        names = [name.strip() for name in settings.pipeline_generators.split(',') if name.strip()]
+        pipeline = CandidatePipeline(
+            {name: self.generators[name] for name in names},
+            budget=settings.pipeline_candidate_budget,
+            generator_weight=settings.pipeline_generator_weight,
+        )
+        rows, scores, stages = pipeline.run(model, liked_rows, excluded, self._profile_vector(model, liked_rows))
+        self.stage_timings.extend(stages)
+        top = _top_n(scores, n)
+        return rows[top], scores[top]
+    
+    def _explain(self, model: ContentModel, rows: np.ndarray,
+                 liked_rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """For each recommended row, the liked row it is most similar to and that similarity"""
+        similarities = model.features[rows] @ model.features[liked_rows].T
+        similarities = similarities.toarray() if sparse.issparse(similarities) else similarities
+        best = similarities.argmax(axis=1)
+        return liked_rows[best], similarities[np.arange(len(rows)), best]
     
     def get_recommendations(self, user_id: int, num_recommendations: int = 5) -> List[Recommendation]:
-        """Generate recommendations using content-based filtering"""
-        # Get all comics
-        all_comics = self.db.query(Comic).all()
-        if len(all_comics) < 2:
+        """The user's top recommendations: the first page of get_page"""
+        return self.get_page(user_id, num_recommendations)[0]
+    
+    def get_page(self, user_id: int, limit: int = 5,
+                 cursor: Optional[str] = None) -> Tuple[List[Recommendation], Optional[str]]:
+        """A page of the user's recommendations and the cursor of the next page, None after the last.
+
+        The first page ranks max(limit, RECOMMENDATION_RANKING_SIZE) comics once
+        and caches the ranking while the user's ratings, the model and the
+        shared data it read (see _shared_versions) are unchanged; every later
+        page is a slice of it, costing one query for its comics. Raises ExecutorBusy when the recommendation workers are
+        saturated, InvalidCursor for a cursor this API did not issue, and
+        CursorExpired once the ranking it points into is outdated or was
+        ranked differently by another worker.
+        """
+        # One lookup tells whether the catalog, any rating or this user's ratings changed, in any worker
+        catalog_version, ratings_version, user_version = data_versions.get(
+            self.db, CATALOG, RATINGS, user_ratings_key(user_id),
+        )
+        model = self.registry.get_model(self.db, catalog_version)
+        if cursor is None:
+            offset, size, fingerprint = 0, max(limit, settings.recommendation_ranking_size), None
+        else:
+            max_size = max(settings.recommendation_max_page_size, settings.recommendation_ranking_size)
+            offset, size, fingerprint = decode_cursor(cursor, max_size)
+        version = (settings.recommendation_strategy, user_version)
+        ranked, shared_versions = self._ranking(model, user_id, size, (model.cache_key,) + version, ratings_version)
+        # Cursors outlive this process's model revisions, so they are checked against versions every worker agrees on
+        # and the ranked ids themselves, which differ between workers whose models were built differently
+        page_version = (tuple(model.version),) + version + shared_versions
+        ranked_ids = [comic_id for comic_id, _, _ in ranked]
+        if fingerprint is not None:
+            check_cursor(fingerprint, user_id, size, page_version, ranked_ids)
+        
+        started = time.perf_counter()
+        end = offset + limit
+        result = self._to_recommendations(ranked[offset:end])
+        self.stage_timings.append(('load', (time.perf_counter() - started) * 1000, len(result)))
+        next_cursor = encode_cursor(end, size, user_id, page_version, ranked_ids) if end < len(ranked) else None
+        return result, next_cursor
+    
+    def _shared_versions(self, strategy: str, cold: bool, ratings_version: int) -> Tuple:
+        """Versions of the data shared by all users that a ranking reads, beyond the catalog and the user's ratings.
+
+        Only rankings that read them carry them, so another user's rating or a
+        popularity re-rank does not invalidate everyone's cached rankings and cursors.
+        """
+        versions = ()
+        if strategy in RATINGS_STRATEGIES:
+            versions += (('ratings', ratings_version),)
+        if cold or strategy in POPULARITY_STRATEGIES:
+            self.popularity.ensure_loaded(self.db)
+            versions += (('popularity', self.popularity.version),)
+        if strategy == 'als':
+            als = load_als_model(settings.als_model_dir)
+            versions += (('als', als.version if als else None),)
+        return versions
+    
+    def _ranking(self, model: ContentModel, user_id: int, size: int, version: Hashable,
+                 ratings_version: int) -> Tuple[List[RankedComic], Tuple]:
+        """The user's top size comics, from the cache or ranked now, and the shared versions they were ranked at"""
+        strategy = settings.recommendation_strategy
+        started = time.perf_counter()
+        cached = self.cache.get(user_id, size, version)
+        if cached is not None:
+            cold, shared_versions, ranked = cached
+            if shared_versions == self._shared_versions(strategy, cold, ratings_version):
+                self.stage_timings = [('cache', (time.perf_counter() - started) * 1000, len(ranked))]
+                return ranked, shared_versions
+        
+        started = time.perf_counter()
+        user_ratings = self._get_user_ratings(user_id)
+        ratings_stage = ('ratings', (time.perf_counter() - started) * 1000, len(user_ratings))
+        # Taken before ranking, so a ranking is never labelled older than the data it read
+        cold = not any(rating >= LIKED_RATING for rating in user_ratings.values())
+        shared_versions = self._shared_versions(strategy, cold, ratings_version)
+        if self.executor.mode == 'process':
+            ranked, self.stage_timings = self.executor.run(rank_in_worker, user_id, user_ratings, size)
+        else:
+            ranked = self.executor.run(self.rank, model, user_id, user_ratings, size)
+        self.stage_timings.insert(0, ratings_stage)
+        self.cache.set(user_id, size, version, (cold, shared_versions, ranked))
+        return ranked, shared_versions
+    
+    def rank(self, model: ContentModel, user_id: int, user_ratings: Dict[int, float],
+             num_recommendations: int, strategy: Optional[str] = None) -> List[RankedComic]:
+        """Rank comics for a user without loading any Comic rows.
+
+        strategy overrides the configured RECOMMENDATION_STRATEGY, e.g. for offline evaluation.
+        Per-stage timings are left in self.stage_timings.
+        """
+        self.stage_timings = []
+        if len(model) < 2:
             return []
         
-        # Get user's highly rated comics
-        liked_comic_ids = self._get_user_preferences(user_id)
+        liked_comic_ids = [comic_id for comic_id, rating in user_ratings.items() if rating >= LIKED_RATING]
         if not liked_comic_ids:
             # If user has no high ratings, return popular comics
-            return self._get_popular_comics(num_recommendations)
-        
-        # Create content features
-        comics_df = self._create_content_features(all_comics)
-        
-        # Create TF-IDF matrix
-        tfidf_matrix = self.vectorizer.fit_transform(comics_df['content'])
-        
-        # Calculate similarity scores
-        cosine_sim = cosine_similarity(tfidf_matrix)
+            started = time.perf_counter()
+            ranked = self._rank_popular(model, num_recommendations, exclude=user_ratings)
+            self.stage_timings.append(('popular', (time.perf_counter() - started) * 1000, len(ranked)))
+            return ranked
         
-        # Get recommendations for liked comics
-        recommendations = {}
-        
-        for comic_id in liked_comic_ids:
-            comic_idx = comics_df[comics_df['id'] == comic_id].index
-            if len(comic_idx) == 0:
-                continue
-            comic_idx = comic_idx[0]
-            
-            # Get similarity scores for this comic
-            sim_scores = list(enumerate(cosine_sim[comic_idx]))
-            sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-            
-            # Add top similar comics to recommendations
-            for idx, score in sim_scores[1:]:  # Skip the comic itself
-                comic_id_rec = comics_df.iloc[idx]['id']
-                if comic_id_rec not in liked_comic_ids:  # Don't recommend already liked comics
-                    if comic_id_rec not in recommendations or recommendations[comic_id_rec]['score'] < score:
-                        recommendations[comic_id_rec] = {
-                            'score': score,
-                            'similar_to': comics_df.iloc[comic_idx]['title']
-                        }
+        liked_rows = np.array([model.id_to_row[comic_id] for comic_id in liked_comic_ids if comic_id in model.id_to_row], dtype=np.intp)
+        if len(liked_rows) == 0:
+            return []
         
-        # Get user's already rated comics to exclude
-        user_ratings = self.db.query(UserRating).filter(UserRating.user_id == user_id).all()
-        rated_comic_ids = {rating.comic_id for rating in user_ratings}
+        # Exclude every comic the user already rated, and the rows of edited or deleted comics
+        excluded = model.catalog.tombstones.copy()
+        excluded[[model.id_to_row[comic_id] for comic_id in user_ratings if comic_id in model.id_to_row]] = True
         
-        # Filter out already rated comics
-        recommendations = {k: v for k, v in recommendations.items() if k not in rated_comic_ids}
+        rank = self.strategies[strategy or settings.recommendation_strategy]
+        started = time.perf_counter()
+        if settings.diversity_lambda is None:
+            rows, scores = rank(model, user_id, liked_rows, excluded, num_recommendations)
+        else:
+            # Re-rank a wider candidate pool so one series cannot fill the whole list
+            rows, scores = rank(model, user_id, liked_rows, excluded,
+                                max(num_recommendations, settings.diversity_candidates))
+            order = mmr(model.features[rows], scores, num_recommendations, settings.diversity_lambda)
+            rows, scores = rows[order], scores[order]
+        self.stage_timings.append(('rank', (time.perf_counter() - started) * 1000, len(rows)))
         
-        # Sort by similarity score and get top N
-        sorted_recommendations = sorted(
-            recommendations.items(), 
-            key=lambda x: x[1]['score'], 
-            reverse=True
-        )[:num_recommendations]
+        started = time.perf_counter()
+        source_rows, source_scores = self._explain(model, rows, liked_rows)
+        self.stage_timings.append(('explain', (time.perf_counter() - started) * 1000, len(rows)))
         
-        # Convert to Recommendation objects
+        # Convert numpy types to plain Python so results pickle cleanly and work with SQLAlchemy
+        return [
+            (
+                int(model.ids[row]),
+                float(score),
+                f"Recommended because it's similar to '{model.titles[source_row]}' (similarity: {source_score:.2f})",
+            )
+            for row, score, source_row, source_score in zip(rows, scores, source_rows, source_scores)
+        ]
+    
+    def _rank_popular(self, model: ContentModel, num_recommendations: int = 5,
+                      exclude: Iterable[int] = ()) -> List[RankedComic]:
+        """Get popular comics as fallback when user has no high ratings"""
+        # A slice of the precomputed ranking, skipping comics the user already rated
+        exclude = set(exclude)
+        ranked = self.popularity.ranked_ids(self.db, model.catalog.live_ids, model.cache_key)
+        popular_ids = [int(comic_id) for comic_id in ranked[:num_recommendations + len(exclude)] if comic_id not in exclude]
+        return [
+            (comic_id, 0.0, "Popular comic - recommended for new users")
+            for comic_id in popular_ids[:num_recommendations]
+        ]
+    
+    def _to_recommendations(self, ranked: List[RankedComic]) -> List[Recommendation]:
+        """Load the ranked comics with one query and convert them to Recommendation objects"""
+        comics = self._load_comics([comic_id for comic_id, _, _ in ranked])
         result = []
-        for comic_id, rec_data in sorted_recommendations:
-            # Convert numpy int64 to regular Python int for SQLAlchemy compatibility
-            comic_id = int(comic_id)
-            
-            comic = self.db.query(Comic).filter(Comic.id == comic_id).first()
-            
+        for comic_id, score, explanation in ranked:
+            comic = comics.get(comic_id)
             if comic:
-                explanation = f"Recommended because it's similar to '{rec_data['similar_to']}' (similarity: {rec_data['score']:.2f})"
                 result.append(Recommendation(
                     comic=comic,
-                    similarity_score=rec_data['score'],
+                    similarity_score=score,
                     explanation=explanation
                 ))
         
         return result
-    
-    def _get_popular_comics(self, num_recommendations: int = 5) -> List[Recommendation]:
-        """Get popular comics as fallback when user has no ratings"""
-        # First try to get comics with ratings, ordered by average rating
-        from sqlalchemy import func
-        popular_comics_with_ratings = self.db.query(Comic).join(UserRating).group_by(Comic.id).order_by(
-            func.avg(UserRating.rating).desc()
-        ).limit(num_recommendations).all()
-        
-        # If we don't have enough comics with ratings, get any comics
-        if len(popular_comics_with_ratings) < num_recommendations:
-            remaining_needed = num_recommendations - len(popular_comics_with_ratings)
-            # Get comics that haven't been rated yet
-            rated_comic_ids = [comic.id for comic in popular_comics_with_ratings]
-            additional_comics = self.db.query(Comic).filter(
-                ~Comic.id.in_(rated_comic_ids)
-            ).limit(remaining_needed).all()
-            popular_comics_with_ratings.extend(additional_comics)
-        
-        result = []
-        for comic in popular_comics_with_ratings:
-            result.append(Recommendation(
-                comic=comic,
-                similarity_score=0.0,
-                explanation="Popular comic - recommended for new users"
-            ))
-        
-        return result
\ No newline at end of file
+
+
+def rank_in_worker(user_id: int, user_ratings: Dict[int, float],
+                   num_recommendations: int) -> Tuple[List[RankedComic], List[StageTiming]]:
+    """Executor entry point for worker processes, which keep their own model state"""
+    db = SessionLocal()
+    try:
+        service = RecommendationService(db)
+        ranked = service.rank(service.registry.get_model(db), user_id, user_ratings, num_recommendations)
+        return ranked, service.stage_timings
+    finally:
+        db.close()
@@ -0,0 +1,95 @@
+import heapq
+import itertools
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from scipy import sparse
+from ..core.config import settings
+from .quantization import Matrix, QuantizedDense, QuantizedSparse, matrix_nbytes
+
+
+class Shard:
+    """The feature rows of one slice of the catalog, with their global row numbers"""
+
+    def __init__(self, key: int, rows: np.ndarray, features: Matrix):
+        self.key = key
+        self.rows = rows
+        self.features = features
+
+    def top_k(self, query: np.ndarray, k: int, excluded: Optional[np.ndarray]) -> List[Tuple[float, int]]:
+        """(score, global row) of the shard's k best rows, best first"""
+        scores = self.features @ query
+        if excluded is not None:
+            scores[excluded[self.rows]] = -np.inf
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return list(zip(scores[top].tolist(), self.rows[top].tolist()))
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes + matrix_nbytes(self.features)
+
+
+class ShardedIndex:
+    """Content index split into shards by a per-row key, such as the genre code.
+
+    Most similarity mass stays within a genre, so a query can score only the
+    shards the user has an affinity for. Shards are scored in parallel on an
+    executor (SciPy's sparse products release the GIL) and the per-shard
+    top-k lists are merged with a heap. Shards are independent copies of
+    their feature rows, so one shard can be rebuilt while the others are
+    shared with the previous index.
+    """
+
+    def __init__(self, shards: Dict[int, Shard]):
+        self.shards = shards
+
+    @staticmethod
+    def _shard(features: Matrix, keys: np.ndarray, key: int) -> Shard:
+        rows = np.flatnonzero(keys == key).astype(np.int32)
+        # Quantized features stay quantized in their shard
+        if isinstance(features, (QuantizedSparse, QuantizedDense)):
+            return Shard(key, rows, features.take(rows))
+        if sparse.issparse(features):
+            return Shard(key, rows, sparse.csr_matrix(features[rows]))
+        return Shard(key, rows, np.ascontiguousarray(features[rows]))
+
+    @classmethod
+    def build(cls, features: Matrix, keys: np.ndarray) -> 'ShardedIndex':
+        return cls({int(key): cls._shard(features, keys, key) for key in np.unique(keys)})
+
+    def rebuilt(self, features: Matrix, keys: np.ndarray, changed: Iterable[int]) -> 'ShardedIndex':
+        """A new index where only the changed shards are rebuilt from features; the rest are shared"""
+        shards = dict(self.shards)
+        for key in changed:
+            shards[int(key)] = self._shard(features, keys, key)
+        return ShardedIndex(shards)
+
+    def top_k(self, query: np.ndarray, k: int, excluded: Optional[np.ndarray] = None,
+              keys: Optional[Iterable[int]] = None,
+              executor: Optional[Executor] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, scores) of the k best rows across the given shards (default all), best first"""
+        shards = [self.shards[key] for key in (self.shards if keys is None else keys) if key in self.shards]
+        if executor is not None and len(shards) > 1:
+            results = list(executor.map(lambda shard: shard.top_k(query, k, excluded), shards))
+        else:
+            results = [shard.top_k(query, k, excluded) for shard in shards]
+        # Each list is sorted best first; merge them lazily and stop after k
+        merged = list(itertools.islice(heapq.merge(*results, key=lambda item: -item[0]), k))
+        rows = np.array([row for _, row in merged], dtype=np.intp)
+        scores = np.array([score for score, _ in merged], dtype=np.float64)
+        return rows, scores
+
+    @property
+    def nbytes(self) -> int:
+        return sum(shard.nbytes for shard in self.shards.values())
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+
+# Threads are only started once a sharded query runs
+shard_executor = ThreadPoolExecutor(max_workers=settings.shard_workers, thread_name_prefix='shards')
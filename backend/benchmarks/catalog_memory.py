@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark: CatalogSnapshot versus the previous ORM + DataFrame catalog.
+
+The previous model loaded every comic as a Comic object, copied them into a
+list of dicts and built a pandas DataFrame it then kept for the model's
+lifetime. The snapshot is built from plain column rows and keeps only
+NumPy arrays, interned titles and the id map. Both sides start from freshly
+generated rows, the way they would arrive from the database, so title and
+text strings are counted.
+
+Usage: python benchmarks/catalog_memory.py [--comics 100000]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Comic
+from app.services.catalog import CatalogSnapshot
+from synthetic import synthetic_catalog
+
+
+def legacy_catalog(rows):
+    """The pre-snapshot path: Comic objects, a list of dicts, then a DataFrame"""
+    comics = [
+        Comic(id=comic_id, title=title, description=description, characters=characters, genre=genre)
+        for comic_id, title, description, characters, genre in rows
+    ]
+    data = []
+    for comic in comics:
+        characters_text = ' '.join(comic.characters) if comic.characters else ''
+        data.append({
+            'id': comic.id,
+            'title': comic.title,
+            'content': f"{comic.description} {characters_text} {comic.genre}",
+            'genre': comic.genre,
+            'characters': comic.characters,
+        })
+    comics_df = pd.DataFrame(data)
+    ids = comics_df['id'].to_numpy()
+    titles = comics_df['title'].to_numpy()
+    id_to_row = {int(comic_id): row for row, comic_id in enumerate(ids)}
+    return comics_df, ids, titles, id_to_row
+
+
+def snapshot_catalog(rows):
+    return CatalogSnapshot.from_rows(rows)
+
+
+def measure(build, n_comics: int):
+    """(retained bytes, peak bytes, seconds) of building a catalog from freshly loaded rows"""
+    gc.collect()
+    tracemalloc.start()
+    rows = synthetic_catalog(n_comics)
+    baseline, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    catalog = build(rows)
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    # What stays alive once the loaded rows are released
+    del rows
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del catalog
+    return retained, peak - baseline, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare catalog memory use of CatalogSnapshot and the DataFrame path")
+    parser.add_argument('--comics', type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"📚 {args.comics:,} synthetic comics")
+    print(f"{'catalog':>10} {'retained MB':>12} {'build peak MB':>14} {'build s':>8}")
+    results = {}
+    for name, build in (('dataframe', legacy_catalog), ('snapshot', snapshot_catalog)):
+        retained, peak, seconds = measure(build, args.comics)
+        results[name] = retained
+        print(f"{name:>10} {retained / 2**20:>12.1f} {peak / 2**20:>14.1f} {seconds:>8.2f}")
+    print(f"✅ Snapshot retains {results['dataframe'] / max(results['snapshot'], 1):.1f}x less memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for the recommendation strategies on synthetic catalogs.
+
+For every catalog size and feature backend this measures model build time,
+per-request latency (p50/p95/p99 of RecommendationService.rank), index
+sizes and peak RSS of each strategy. Every (size, backend) runs in its own
+subprocess so peak RSS is not inherited from the previous run.
+
+"dense" is the original recommender: an (n x n) float64 cosine_similarity
+matrix of the TF-IDF features, whose rows are sorted per liked comic. It
+is only attempted when its 8 * n^2 bytes fit in --memory-limit-gb, and then
+under that address-space limit, so a size it cannot handle fails with a
+MemoryError instead of taking the box down. The original code
+rebuilt it on every request, so its true request latency is build + request.
+
+Each --precisions entry re-runs "profile" (and "als") on float16 or int8
+copies of the features (and factors), reporting the memory saved and
+recall@k against the full-precision ranking of the same users.
+
+The top-K neighbor index is an O(n^2) build. Above --neighbor-build-limit
+comics it is timed on a sample of rows and extrapolated, and the
+"neighbors" strategy is skipped.
+
+Runs offline with no database. Only Linux reports RSS.
+
+Usage: python benchmarks/scaling.py [--sizes 1000 10000 100000 1000000] [--backends tfidf hashing lsa]
+                                    [--strategies profile neighbors ann characters collaborative als pipeline sharded dense]
+                                    [--precisions float16 int8] [--users 2000] [--requests 200] [--output scaling.json]
+"""
+import argparse
+import copy
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows: no RSS figures or address-space limit
+    resource = None
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.als import save_factors, train_als
+from app.services.ann import LSHIndex
+from app.services.cache import RecommendationCache
+from app.services.collaborative import CoRatingModel
+from app.services.evaluation import latency_percentiles
+from app.services.model_registry import ContentModel, ModelRegistry
+from app.services.neighbors import NeighborIndex
+from app.services.popularity import PopularityRanking
+from app.services.quantization import matrix_nbytes, quantize
+from app.services.recommendation import RecommendationService
+from app.services.shards import ShardedIndex
+from synthetic import synthetic_catalog, synthetic_ratings
+
+STRATEGIES = ('profile', 'neighbors', 'ann', 'characters', 'collaborative', 'als', 'pipeline', 'sharded', 'dense')
+NEIGHBOR_SAMPLE_ROWS = 2000
+
+
+def rss_mb():
+    """Current resident set size, from /proc on Linux"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None
+
+
+def available_memory_gb():
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 2**20
+    except OSError:
+        pass
+    return 4.0
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def sample_users(ratings, n_requests, seed):
+    """(user id, {comic_id: rating}) for up to n_requests users with at least one like"""
+    by_user = defaultdict(dict)
+    for user_id, comic_id, rating in ratings:
+        by_user[user_id][comic_id] = rating
+    users = [user_id for user_id, rated in by_user.items() if any(rating >= 3.0 for rating in rated.values())]
+    rng = np.random.default_rng(seed)
+    chosen = rng.choice(users, size=min(n_requests, len(users)), replace=False)
+    return [(int(user_id), by_user[user_id]) for user_id in chosen]
+
+
+def measure_requests(rank, users, k):
+    rank(*users[0], k)  # Warm lazily built state outside the timed run
+    latencies = []
+    for user_id, user_ratings in users:
+        _, seconds = timed(rank, user_id, user_ratings, k)
+        latencies.append(seconds)
+    return latency_percentiles(latencies)
+
+
+def measure_recall(rank, reference, users, k):
+    """Latency percentiles of rank, plus the share of each reference top-k it also returns"""
+    rank(*users[0], k)
+    latencies, recalls = [], []
+    for user_id, user_ratings in users:
+        ranked, seconds = timed(rank, user_id, user_ratings, k)
+        latencies.append(seconds)
+        if reference[user_id]:
+            recalls.append(len(reference[user_id].intersection(comic_id for comic_id, _, _ in ranked)) / len(reference[user_id]))
+    return {**latency_percentiles(latencies), "recall_at_k": float(np.mean(recalls)) if recalls else None}
+
+
+def measure_quantization(args, service, model, users, als_factors):
+    """Memory and recall@k of the quantized features (and ALS factors) against full precision"""
+    def rank(ranked_model, strategy):
+        return lambda user_id, user_ratings, k: service.rank(ranked_model, user_id, user_ratings, k, strategy=strategy)
+
+    reference = {
+        user_id: {comic_id for comic_id, _, _ in service.rank(model, user_id, user_ratings, args.k, strategy='profile')}
+        for user_id, user_ratings in users
+    }
+    full_dir = settings.als_model_dir
+    if als_factors:
+        als_reference = {
+            user_id: {comic_id for comic_id, _, _ in service.rank(model, user_id, user_ratings, args.k, strategy='als')}
+            for user_id, user_ratings in users
+        }
+    results = {}
+    for precision in args.precisions:
+        quantized = copy.copy(model)
+        quantized.features = quantize(model.features, precision)
+        nbytes = matrix_nbytes(quantized.features)
+        result = results[precision] = {
+            "profile": {**measure_recall(rank(quantized, 'profile'), reference, users, args.k),
+                        "bytes": nbytes, "saved": 1 - nbytes / matrix_nbytes(model.features)},
+        }
+        if als_factors:
+            with tempfile.TemporaryDirectory(prefix=f'als-{precision}-') as als_dir:
+                settings.als_model_dir = als_dir
+                save_factors(als_dir, *als_factors, precision=precision)
+                nbytes = sum(matrix_nbytes(quantize(factors, precision)) for factors in als_factors[:2])
+                result["als"] = {**measure_recall(rank(model, 'als'), als_reference, users, args.k),
+                                 "bytes": nbytes, "saved": 1 - nbytes / (als_factors[0].nbytes + als_factors[1].nbytes)}
+                settings.als_model_dir = full_dir
+    return results
+
+
+def run_models(args):
+    """Worker: build every index for one (size, backend) and time each strategy"""
+    report = {"size": args.size, "backend": args.worker, "strategies": {}}
+    started = time.perf_counter()
+    rows = synthetic_catalog(args.size, seed=args.seed)
+    ratings = synthetic_ratings(rows, args.users, seed=args.seed)
+    report["data_s"] = time.perf_counter() - started
+    users = sample_users(ratings, args.requests, args.seed)
+    report["ratings"] = len(ratings)
+    report["rss_after_data_mb"] = rss_mb()
+
+    settings.recommendation_features = args.worker
+    # The "profile" strategy skips the neighbor index; it is built and timed separately below
+    settings.recommendation_strategy = 'profile'
+    neighbors_k = settings.recommendation_neighbors
+    model, report["features_build_s"] = timed(ContentModel, (len(rows), len(rows), 0), rows)
+    report["index_bytes"] = {
+        "features": matrix_nbytes(model.features),
+        "characters": model.catalog.characters.nbytes,
+    }
+    report["features_shape"] = list(model.features.shape)
+
+    if args.size <= args.neighbor_build_limit:
+        model.neighbor_index, report["neighbors_build_s"] = timed(NeighborIndex.build, model.features, k=neighbors_k)
+        report["index_bytes"]["neighbors"] = model.neighbor_index.nbytes
+    else:
+        sample = min(NEIGHBOR_SAMPLE_ROWS, args.size)
+        _, seconds = timed(
+            NeighborIndex._fill_rows, model.features, 0, sample,
+            np.empty((sample, neighbors_k), dtype=np.int32), np.empty((sample, neighbors_k), dtype=np.float32),
+            64 * 1024 * 1024,
+        )
+        report["neighbors_build_s"] = seconds * args.size / sample
+        report["neighbors_build_estimated"] = True
+        report["index_bytes"]["neighbors"] = args.size * neighbors_k * 8
+    report["rss_after_build_mb"] = rss_mb()
+
+    strategies = [strategy for strategy in args.strategies if strategy != 'dense']
+    if 'ann' in strategies:
+        model.ann_index, report["ann_build_s"] = timed(
+            LSHIndex(n_tables=settings.ann_tables, n_bits=settings.ann_bits, n_probes=settings.ann_probes).build,
+            model.features,
+        )
+        report["index_bytes"]["ann"] = model.ann_index.nbytes
+    if 'sharded' in strategies:
+        model.shard_index, report["shards_build_s"] = timed(ShardedIndex.build, model.features, model.catalog.genre_codes)
+        report["index_bytes"]["shards"] = model.shard_index.nbytes
+    co_rating = CoRatingModel()
+    if 'collaborative' in strategies or 'pipeline' in strategies:
+        _, report["co_rating_load_s"] = timed(co_rating.load, ratings)
+    als_factors = None
+    if 'als' in strategies:
+        als_factors, report["als_train_s"] = timed(train_als, ratings, seed=args.seed)
+        report["index_bytes"]["als"] = int(als_factors[0].nbytes + als_factors[1].nbytes)
+
+    # The factors live only as long as this run
+    with tempfile.TemporaryDirectory(prefix='als-bench-') as als_dir:
+        if als_factors:
+            settings.als_model_dir = als_dir
+            save_factors(als_dir, *als_factors)
+
+        popularity = PopularityRanking(refresh_seconds=math.inf)
+        popularity.load((comic_id, rating) for _, comic_id, rating in ratings)
+        service = RecommendationService(
+            None, registry=ModelRegistry(), co_rating=co_rating,
+            cache=RecommendationCache(max_entries=0), popularity=popularity,
+        )
+        for strategy in strategies:
+            if strategy in ('neighbors', 'pipeline') and report.get("neighbors_build_estimated"):
+                report["strategies"][strategy] = {"status": "skipped: neighbor index build estimated, not run"}
+                continue
+            report["strategies"][strategy] = measure_requests(
+                lambda user_id, user_ratings, k, strategy=strategy: service.rank(model, user_id, user_ratings, k, strategy=strategy),
+                users, args.k,
+            )
+        if args.precisions:
+            report["quantization"] = measure_quantization(args, service, model, users, als_factors)
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def run_dense(args):
+    """Worker: the original full cosine-similarity recommender, under an address-space limit"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+    from app.services.catalog import content_text
+
+    report = {"size": args.size, "backend": "dense", "dense_matrix_gb": 8 * args.size ** 2 / 2**30}
+    if report["dense_matrix_gb"] > args.memory_limit_gb:
+        # Not attempted: scipy counts the product's non-zeros before allocating, an O(n^2) pass
+        # that takes hours at 1M comics before the MemoryError would come
+        report["status"] = f"does not fit: the {report['dense_matrix_gb']:.1f} GB matrix exceeds {args.memory_limit_gb:.1f} GB"
+        return report
+    rows = synthetic_catalog(args.size, seed=args.seed)
+    users = sample_users(synthetic_ratings(rows, args.users, seed=args.seed), args.requests, args.seed)
+    ids = np.array([row[0] for row in rows])
+    id_to_row = {comic_id: row for row, comic_id in enumerate(ids)}
+    if resource is not None:
+        limit = int(args.memory_limit_gb * 2**30)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    try:
+        features, report["features_build_s"] = timed(
+            TfidfVectorizer(stop_words='english', max_features=1000).fit_transform, [content_text(row) for row in rows]
+        )
+        similarities, report["similarity_build_s"] = timed(cosine_similarity, features)
+    except MemoryError:
+        report["status"] = f"MemoryError: the {report['dense_matrix_gb']:.1f} GB matrix does not fit in {args.memory_limit_gb:.1f} GB"
+        report["peak_rss_mb"] = peak_rss_mb()
+        return report
+
+    def rank(user_id, user_ratings, k):
+        # The original loop: sort each liked comic's similarity row, keep the best score per candidate
+        liked = [comic_id for comic_id, rating in user_ratings.items() if rating >= 3.0]
+        best = {}
+        for comic_id in liked:
+            row = similarities[id_to_row[comic_id]]
+            for candidate in np.argsort(-row, kind='stable')[1:]:
+                candidate_id = ids[candidate]
+                if candidate_id not in user_ratings and row[candidate] > best.get(candidate_id, -1.0):
+                    best[candidate_id] = row[candidate]
+        return sorted(best.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    report["strategies"] = {"dense": measure_requests(rank, users[:max(1, args.requests // 10)], args.k)}
+    report["index_bytes"] = {"dense": int(similarities.nbytes)}
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def run_worker(args, size, mode):
+    """Run one configuration in a fresh interpreter and return its JSON report"""
+    command = [
+        sys.executable, os.path.abspath(__file__), '--worker', mode, '--size', str(size),
+        '--users', str(args.users), '--requests', str(args.requests), '--k', str(args.k), '--seed', str(args.seed),
+        '--neighbor-build-limit', str(args.neighbor_build_limit), '--memory-limit-gb', str(args.memory_limit_gb),
+        '--strategies', *args.strategies, '--precisions', *args.precisions,
+    ]
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=args.timeout)
+    except subprocess.TimeoutExpired:
+        return {"size": size, "backend": mode, "status": f"timeout after {args.timeout}s"}
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1:] or [f"exit code {completed.returncode}"]
+        return {"size": size, "backend": mode, "status": f"failed: {error[0]}"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_report(report):
+    status = report.get("status")
+    label = f"{report['size']:>9,} {report['backend']:>8}"
+    if status:
+        print(f"{label}  ❌ {status}")
+        return
+    build = report.get("features_build_s", 0) + report.get("similarity_build_s", 0)
+    neighbors = report.get("neighbors_build_s")
+    sizes = ', '.join(f"{name} {nbytes / 2**20:.1f}MB" for name, nbytes in report.get("index_bytes", {}).items())
+    print(f"{label}  build {build:.2f}s"
+          + (f", neighbors {neighbors:.1f}s{' (est.)' if report.get('neighbors_build_estimated') else ''}" if neighbors else "")
+          + (f", peak RSS {report['peak_rss_mb']:.0f}MB" if report.get("peak_rss_mb") else "")
+          + f"; {sizes}")
+    for strategy, result in report.get("strategies", {}).items():
+        if "status" in result:
+            print(f"{'':>19}{strategy:>14}  {result['status']}")
+        else:
+            print(f"{'':>19}{strategy:>14}  p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  p99 {result['p99_ms']:>8.2f}ms")
+    for precision, result in report.get("quantization", {}).items():
+        for name, run in result.items():
+            print(f"{'':>19}{name + ' ' + precision:>14}  p50 {run['p50_ms']:>8.2f}ms  "
+                  f"recall@k {run['recall_at_k']:.3f}  {run['bytes'] / 2**20:.1f}MB ({run['saved']:.0%} saved)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recommendation strategies on synthetic catalogs")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--backends', nargs='*', default=['tfidf', 'hashing', 'lsa'], help="None to run only the dense baseline")
+    parser.add_argument('--strategies', nargs='+', default=list(STRATEGIES), choices=STRATEGIES)
+    parser.add_argument('--precisions', nargs='*', default=['float16', 'int8'], choices=('float32', 'float16', 'int8'),
+                        help="Quantized precisions to compare with full precision; none to skip")
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--neighbor-build-limit', type=int, default=100000)
+    parser.add_argument('--memory-limit-gb', type=float, default=round(available_memory_gb() * 0.8, 1))
+    parser.add_argument('--timeout', type=int, default=3600, help="Seconds per configuration")
+    parser.add_argument('--output', default='scaling.json')
+    parser.add_argument('--worker', choices=('tfidf', 'hashing', 'lsa', 'dense'), help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        report = run_dense(args) if args.worker == 'dense' else run_models(args)
+        print(json.dumps(report))
+        return
+
+    print(f"📊 Sizes {args.sizes}, backends {args.backends}, {args.users} users, "
+          f"{args.requests} requests, memory limit {args.memory_limit_gb} GB")
+    reports = []
+    for size in args.sizes:
+        modes = list(args.backends) + (['dense'] if 'dense' in args.strategies else [])
+        for mode in modes:
+            report = run_worker(args, size, mode)
+            print_report(report)
+            reports.append(report)
+            with open(args.output, 'w') as f:
+                json.dump({"created_at": time.time(), "args": vars(args), "runs": reports}, f, indent=2)
+    print(f"💾 Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Synthetic comic catalogs and rating sets for benchmarks.
+
+Catalog rows have the same shape as app.services.catalog.catalog_rows()
+returns: (id, title, description, characters, genre). Rating rows are
+(user_id, comic_id, rating). The data is skewed the way real catalogs are:
+a few genres and characters dominate, description lengths are long-tailed,
+and a few comics collect most of the ratings. Generation is seeded, so
+every run of a benchmark sees the same data.
+"""
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+GENRES = (
+    'Superhero', 'Horror', 'Science Fiction', 'Fantasy', 'Crime', 'Romance',
+    'Western', 'War', 'Humor', 'Adventure', 'Mystery', 'Slice of Life',
+)
+
+
+def _words(rng: np.random.Generator, size: int, prefix: str) -> np.ndarray:
+    """Pronounceable pseudo-words, so the text vectorizers see a realistic vocabulary"""
+    syllables = np.array(['ka', 'ro', 'mi', 'zen', 'tor', 'ul', 'vex', 'sha', 'dra', 'qui', 'bel', 'nox'])
+    parts = rng.choice(syllables, size=(size, 4))
+    return np.array([prefix + ''.join(part) for part in parts])
+
+
+def _zipf_weights(n: int, exponent: float) -> np.ndarray:
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def synthetic_catalog(n_comics: int, seed: int = 0, vocabulary: int = 5000, n_characters: int = 2000) -> List[tuple]:
+    """n_comics catalog rows with skewed genres, long-tailed descriptions and recurring characters"""
+    rng = np.random.default_rng(seed)
+    words = _words(rng, vocabulary, '').tolist()
+    characters = np.char.title(_words(rng, n_characters, 'Captain ')).tolist()
+
+    # Superhero outnumbers Slice of Life roughly ten to one
+    genres = rng.choice(len(GENRES), size=n_comics, p=_zipf_weights(len(GENRES), 1.0))
+    # Median ~35 words, a long tail of multi-paragraph blurbs
+    lengths = np.clip(rng.lognormal(np.log(35), 0.6, size=n_comics), 5, 250).astype(np.int64)
+    # Half of each description comes from its genre's slice of the vocabulary,
+    # so genres are separable; the other half is drawn from the whole vocabulary
+    own_lengths = np.maximum(lengths // 2, 1)
+    slice_size = vocabulary // len(GENRES)
+    permutation = rng.permutation(vocabulary)
+    own = permutation[np.repeat(genres * slice_size, own_lengths) + rng.integers(slice_size, size=own_lengths.sum())]
+    shared = rng.integers(vocabulary, size=(lengths - own_lengths).sum())
+    own_stops = np.cumsum(own_lengths)
+    shared_stops = np.cumsum(lengths - own_lengths)
+    # A handful of headline characters appear everywhere, most appear a few times
+    cast_sizes = np.clip(rng.poisson(1.5, size=n_comics), 0, 8)
+    casts = rng.choice(n_characters, size=cast_sizes.sum(), p=_zipf_weights(n_characters, 1.1))
+    cast_stops = np.cumsum(cast_sizes)
+
+    rows = []
+    for i in range(n_comics):
+        own_words = own[own_stops[i] - own_lengths[i]:own_stops[i]]
+        shared_words = shared[shared_stops[i] - (lengths[i] - own_lengths[i]):shared_stops[i]]
+        description = ' '.join([words[w] for w in own_words] + [words[w] for w in shared_words])
+        cast = list(dict.fromkeys(characters[c] for c in casts[cast_stops[i] - cast_sizes[i]:cast_stops[i]]))
+        genre = GENRES[genres[i]]
+        rows.append((i + 1, f"{words[own_words[0]].title()} {genre} #{i + 1}", description, cast, genre))
+    return rows
+
+
+def synthetic_ratings(catalog: Sequence[tuple], n_users: int, seed: int = 0,
+                      median_ratings: int = 20) -> List[Tuple[int, int, float]]:
+    """Ratings by n_users users who each favour one genre and gravitate to popular comics"""
+    rng = np.random.default_rng(seed + 1)
+    ids = np.array([row[0] for row in catalog], dtype=np.int64)
+    genre_of = {genre: code for code, genre in enumerate(GENRES)}
+    genres = np.array([genre_of[row[4]] for row in catalog])
+
+    # Comic popularity is Zipf-distributed, in random catalog positions
+    popularity = _zipf_weights(len(ids), 0.8)[rng.permutation(len(ids))]
+    catalog_cdf = np.cumsum(popularity)
+    genre_rows = [np.flatnonzero(genres == code) for code in range(len(GENRES))]
+    genre_cdfs = [np.cumsum(popularity[rows]) for rows in genre_rows]
+    genre_weights = np.array([popularity[rows].sum() for rows in genre_rows])
+
+    ratings = []
+    counts = np.clip(rng.lognormal(np.log(median_ratings), 0.8, size=n_users), 1, 500).astype(np.int64)
+    favourites = rng.choice(len(GENRES), size=n_users, p=genre_weights / genre_weights.sum())
+    for user, (count, favourite) in enumerate(zip(counts, favourites), start=1):
+        own_rows, own_cdf = genre_rows[favourite], genre_cdfs[favourite]
+        n_own = int(count * 0.6) if len(own_rows) else 0
+        picked = np.concatenate([
+            own_rows[np.minimum(np.searchsorted(own_cdf, rng.random(n_own) * own_cdf[-1]), len(own_rows) - 1)]
+            if n_own else np.empty(0, dtype=np.int64),
+            np.minimum(np.searchsorted(catalog_cdf, rng.random(count - n_own) * catalog_cdf[-1]), len(ids) - 1),
+        ])
+        picked = np.unique(picked)
+        liked = genres[picked] == favourite
+        scores = np.where(liked, rng.integers(4, 6, size=len(picked)), rng.integers(1, 4, size=len(picked)))
+        ratings.extend(zip([user] * len(picked), ids[picked].tolist(), scores.astype(float).tolist()))
+    return ratings
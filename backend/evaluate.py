@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation of the recommendation strategies.
+
+Splits user_ratings into train and test sets, per user by time (most recent
+ratings held out) or at random. Each strategy then ranks comics from the
+train ratings only, and is scored against the held-out comics the user
+liked: precision@k, recall@k, NDCG@k, catalog coverage, p50/p95/p99 per-user
+latency and peak memory. The co-rating, popularity and ALS models are rebuilt
+from the train split so held-out ratings never leak into the ranking.
+
+Results are printed and written as JSON so runs can be diffed.
+
+Usage: python evaluate.py [--strategies profile neighbors ...] [--k 10] [--split time|random]
+                          [--test-fraction 0.2] [--seed 0] [--output evaluation.json]
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS figure
+    resource = None
+
+sys.path.append(os.path.dirname(__file__))
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import UserRating
+from app.services.ann import LSHIndex
+from app.services.als import save_factors, train_als
+from app.services.cache import RecommendationCache
+from app.services.collaborative import CoRatingModel
+from app.services.evaluation import evaluate_strategy, split_ratings
+from app.services.model_registry import NEIGHBOR_STRATEGIES, model_registry
+from app.services.neighbors import NeighborIndex
+from app.services.popularity import PopularityRanking
+from app.services.quantization import full_precision
+from app.services.recommendation import RecommendationService
+from app.services.shards import ShardedIndex
+
+# Users whose allocations are traced for the peak-memory figure; tracing is slow, so it is not timed
+MEMORY_SAMPLE_USERS = 50
+
+
+def peak_memory_mb(rank, model, train_by_user, relevant_by_user, k):
+    """Peak Python allocations while ranking for a sample of users"""
+    sample = dict(list(relevant_by_user.items())[:MEMORY_SAMPLE_USERS])
+    tracemalloc.start()
+    try:
+        evaluate_strategy(rank, model, train_by_user, sample, k)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate recommendation strategies on held-out ratings")
+    parser.add_argument('--strategies', nargs='+', default=None, help="Default: every registered strategy")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--split', choices=('time', 'random'), default='time')
+    parser.add_argument('--test-fraction', type=float, default=0.2)
+    parser.add_argument('--relevant-rating', type=float, default=3.0, help="Held-out ratings at or above this count as hits")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='evaluation.json')
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        ratings = db.query(
+            UserRating.user_id, UserRating.comic_id, UserRating.rating, UserRating.created_at
+        ).order_by(UserRating.id).all()
+        model = model_registry.get_model(db)
+
+        train, test = split_ratings(ratings, args.test_fraction, by=args.split, seed=args.seed)
+        train_by_user = defaultdict(dict)
+        for user_id, comic_id, rating, _ in train:
+            train_by_user[user_id][comic_id] = rating
+        relevant_by_user = defaultdict(set)
+        for user_id, comic_id, rating, _ in test:
+            if rating >= args.relevant_rating:
+                relevant_by_user[user_id].add(comic_id)
+
+        print(f"📚 {len(model)} comics, {len(ratings)} ratings: {len(train)} train / {len(test)} test "
+              f"({args.split} split), {len(relevant_by_user)} users with held-out likes")
+        if not relevant_by_user:
+            print("❌ No held-out likes to evaluate against; add ratings or raise --test-fraction")
+            return
+
+        # Every model that learns from ratings sees the train split only
+        co_rating = CoRatingModel()
+        co_rating.load((user_id, comic_id, rating) for user_id, comic_id, rating, _ in train)
+        popularity = PopularityRanking(prior_weight=settings.popularity_prior_weight, refresh_seconds=math.inf)
+        popularity.load((comic_id, rating) for _, comic_id, rating, _ in train)
+        service = RecommendationService(
+            db, registry=model_registry, co_rating=co_rating,
+            cache=RecommendationCache(max_entries=0), popularity=popularity,
+        )
+        strategies = args.strategies or list(service.strategies)
+
+        if 'ann' in strategies and model.ann_index is None and model.features is not None:
+            model.ann_index = LSHIndex(
+                n_tables=settings.ann_tables, n_bits=settings.ann_bits, n_probes=settings.ann_probes,
+            ).build(model.features)
+        if set(strategies) & set(NEIGHBOR_STRATEGIES) and model.neighbor_index is None and model.features is not None:
+            model.neighbor_index = NeighborIndex.build(full_precision(model.features), k=settings.recommendation_neighbors)
+        if 'sharded' in strategies and model.shard_index is None and model.features is not None:
+            model.shard_index = ShardedIndex.build(model.features, model.catalog.genre_codes)
+
+        # The ALS factors trained on the train split live only as long as the evaluation
+        with tempfile.TemporaryDirectory(prefix='als-eval-') as als_dir:
+            if 'als' in strategies:
+                user_factors, item_factors, user_ids, item_ids = train_als(
+                    [(user_id, comic_id, rating) for user_id, comic_id, rating, _ in train], seed=args.seed,
+                )
+                save_factors(als_dir, user_factors, item_factors, user_ids, item_ids, precision=settings.vector_precision)
+                settings.als_model_dir = als_dir
+
+            results = {}
+            print(f"{'strategy':>14} {'P@k':>6} {'R@k':>6} {'NDCG':>6} {'cover':>6} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'peak MB':>8}")
+            for strategy in strategies:
+                if strategy not in service.strategies:
+                    print(f"❌ Unknown strategy: {strategy}")
+                    continue
+
+                def rank(model, user_id, user_ratings, k, strategy=strategy):
+                    return service.rank(model, user_id, user_ratings, k, strategy=strategy)
+
+                # Warm lazily built state (neighbor matrices, ALS mmap) outside the timed run
+                first_user = next(iter(relevant_by_user))
+                rank(model, first_user, train_by_user.get(first_user, {}), args.k)
+                result = evaluate_strategy(rank, model, train_by_user, relevant_by_user, args.k)
+                result["peak_memory_mb"] = peak_memory_mb(rank, model, train_by_user, relevant_by_user, args.k)
+                results[strategy] = result
+                latency = result["latency"]
+                print(f"{strategy:>14} {result[f'precision@{args.k}']:>6.3f} {result[f'recall@{args.k}']:>6.3f} "
+                      f"{result[f'ndcg@{args.k}']:>6.3f} {result['coverage']:>6.3f} {latency['p50_ms']:>7.2f} "
+                      f"{latency['p95_ms']:>7.2f} {latency['p99_ms']:>7.2f} {result['peak_memory_mb']:>8.2f}")
+    finally:
+        db.close()
+
+    report = {
+        "created_at": time.time(),
+        "config": {
+            "k": args.k,
+            "split": args.split,
+            "test_fraction": args.test_fraction,
+            "relevant_rating": args.relevant_rating,
+            "seed": args.seed,
+            "recommendation_features": settings.recommendation_features,
+            "recommendation_neighbors": settings.recommendation_neighbors,
+            "character_weight": settings.character_weight,
+            "diversity_lambda": settings.diversity_lambda,
+        },
+        "dataset": {
+            "catalog_version": list(model.version),
+            "comics": len(model),
+            "ratings": len(ratings),
+            "train_ratings": len(train),
+            "test_ratings": len(test),
+            "evaluated_users": len(relevant_by_user),
+        },
+        # ru_maxrss is in KB on Linux
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None,
+        "strategies": results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
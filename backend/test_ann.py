@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Check that the LSH index over hashing-backend features (2**18 columns) keeps
+no hyperplanes in memory, finds each indexed row from its own vector, and
+survives a save and load, and that a saved index built from other features
+or parameters is refused.
+
+Needs no database. Run with pytest or directly: python test_ann.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(__file__))
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from app.services.ann import LSHIndex
+from app.services.quantization import quantize
+
+WORDS = ["hero", "city", "mutant", "space", "magic", "detective", "vampire", "robot", "team", "villain"]
+
+
+def _hashed_features():
+    rng = np.random.default_rng(0)
+    texts = [" ".join(rng.choice(WORDS, 5)) + f" issue{i} series{i % 40}" for i in range(400)]
+    return HashingVectorizer(n_features=2 ** 18, alternate_sign=False, norm='l2').fit_transform(texts)
+
+
+def test_hashed_planes_find_indexed_rows():
+    features = _hashed_features()
+    for precision in (None, 'int8'):
+        index = LSHIndex(n_tables=8, n_probes=2).build(quantize(features, precision))
+        assert index.planes is None
+        assert index.nbytes == index.sorted_codes.nbytes + index.sorted_rows.nbytes
+        for row in range(0, 400, 37):
+            rows, _ = index.query(features[row].toarray().ravel(), k=5)
+            assert row in rows.tolist(), (precision, row)
+
+
+def test_hashed_index_save_and_load():
+    features = _hashed_features()
+    index = LSHIndex(n_tables=4, seed=7).build(features)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "ann.npz")
+        index.save(path, version=(400, 400, 1))
+        loaded = LSHIndex.load(path, features, version=(400, 400, 1))
+    assert loaded.planes is None and loaded.seed == 7
+    query = features[3].toarray().ravel()
+    assert loaded.query(query, k=5)[0].tolist() == index.query(query, k=5)[0].tolist()
+
+
+def test_load_rejects_indexes_built_otherwise():
+    features = _hashed_features()
+    build = {"features": "hashing", "vector_precision": None}
+    index = LSHIndex(n_tables=4, n_bits=6).build(features)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "ann.npz")
+        index.save(path, version=(400, 400, 1), build=build)
+
+        loaded = LSHIndex.load(path, features, version=(400, 400, 1), build=build, n_tables=4, n_probes=5)
+        assert (loaded.n_tables, loaded.n_bits, loaded.n_probes) == (4, 6, 5)
+
+        narrower = features[:, :320]  # The same catalog vectorized by another backend
+        mismatches = [
+            dict(vectors=narrower, build=build),
+            dict(vectors=features, build={"features": "tfidf", "vector_precision": None}),
+            dict(vectors=features, build=build, n_tables=16),
+            dict(vectors=features, build=build, n_bits=8),
+            dict(vectors=features, build=build, seed=1),
+        ]
+        for mismatch in mismatches:
+            vectors = mismatch.pop("vectors")
+            try:
+                LSHIndex.load(path, vectors, version=(400, 400, 1), **mismatch)
+            except ValueError:
+                continue
+            raise AssertionError(f"loaded an index built otherwise: {mismatch}")
+
+
+if __name__ == "__main__":
+    test_hashed_planes_find_indexed_rows()
+    test_hashed_index_save_and_load()
+    test_load_rejects_indexes_built_otherwise()
+    print("✅ Hashed LSH planes index the hashing backend")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Check the incremental co-rating model against cosine similarities computed
+from scratch over the full user x comic rating matrix.
+
+Needs no database: the models here are loaded from explicit rating rows.
+Run with pytest or directly: python test_collaborative.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__))
+
+import numpy as np
+
+from app.services.collaborative import CoRatingModel
+
+
+def _random_ratings(seed: int, users: int = 30, comics: int = 25, density: float = 0.3):
+    rng = np.random.default_rng(seed)
+    return [
+        (user_id, comic_id, float(rng.integers(1, 6)))
+        for user_id in range(1, users + 1)
+        for comic_id in range(1, comics + 1)
+        if rng.random() < density
+    ]
+
+
+def _exact_similar(ratings, comic_ids):
+    """Summed cosine similarities from the dense rating matrix"""
+    latest = {(user_id, comic_id): rating for user_id, comic_id, rating in ratings}
+    users = sorted({user_id for user_id, _ in latest})
+    comics = sorted({comic_id for _, comic_id in latest})
+    matrix = np.zeros((len(users), len(comics)))
+    for (user_id, comic_id), rating in latest.items():
+        matrix[users.index(user_id), comics.index(comic_id)] = rating
+    dots = matrix.T @ matrix
+    norms = np.sqrt(np.diag(dots))
+    scores = {}
+    for comic_id in comic_ids:
+        i = comics.index(comic_id)
+        for j, other_id in enumerate(comics):
+            if j != i and dots[i, j] > 0:
+                scores[other_id] = scores.get(other_id, 0.0) + dots[i, j] / (norms[i] * norms[j])
+    return scores
+
+
+def _assert_close(actual, expected):
+    assert actual.keys() == expected.keys(), set(actual) ^ set(expected)
+    for comic_id, score in expected.items():
+        assert abs(actual[comic_id] - score) < 1e-9, (comic_id, actual[comic_id], score)
+
+
+def test_similar_matches_exact_cosine():
+    ratings = _random_ratings(0)
+    model = CoRatingModel()
+    model.load(ratings)
+    for liked in ([1], [2, 5, 9], [3, 3]):
+        _assert_close(model.similar(liked), _exact_similar(ratings, liked))
+    assert model.similar([999]) == {}
+
+
+def test_incremental_updates_match_a_full_load():
+    ratings = _random_ratings(1)
+    # Changed and new ratings, including re-rating a comic and repeating a rating
+    updates = [(1, 1, 5.0), (2, 3, 1.0), (31, 4, 4.0), (31, 7, 2.0), (2, 3, 1.0)]
+    model = CoRatingModel()
+    model.load(ratings)
+    for update in updates:
+        model.update(*update)
+
+    reloaded = CoRatingModel()
+    reloaded.load(ratings + updates)
+    for liked in ([1], [3, 4, 7]):
+        _assert_close(model.similar(liked), _exact_similar(ratings + updates, liked))
+        _assert_close(model.similar(liked), reloaded.similar(liked))
+
+
+if __name__ == "__main__":
+    test_similar_matches_exact_cosine()
+    test_incremental_updates_match_a_full_load()
+    print("✅ Co-rating similarities match the exact cosine")
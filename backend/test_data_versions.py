@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Check that ORM flushes bump the catalog and ratings data versions: comic
+inserts and content edits bump the catalog, image backfills do not, and a
+rolled back write bumps nothing.
+
+Runs against an in-memory SQLite database. The global registry's comic
+change tracking is detached, so comic_recommender.db is never opened.
+Run with pytest or directly: python test_data_versions.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import Base, Comic, User, UserRating
+from app.services.data_versions import CATALOG, COMICS, RATINGS, data_versions, user_ratings_key
+from app.services.model_registry import untrack_comic_changes
+
+# Otherwise every comic committed here asks the global registry to rebuild from comic_recommender.db
+untrack_comic_changes()
+
+
+def _make_session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Comic(title="Comic #0", description="hero city", characters=["Character 0"], genre="Superhero"))
+    db.add(User(email="fan@example.com", password_hash="x"))
+    db.commit()
+    return db
+
+
+def test_comic_content_edits_bump_the_catalog():
+    db = _make_session()
+    try:
+        assert data_versions.get(db, CATALOG, COMICS) == (1, 1)
+        comic = db.query(Comic).first()
+
+        comic.image_url = "https://example.com/cover.jpg"
+        db.commit()
+        # The model ignores image backfills; the comic listings do not
+        assert data_versions.get(db, CATALOG, COMICS) == (1, 2), "an image backfill must bump only the comics version"
+
+        comic.description = "hero city mutant"
+        db.commit()
+        assert data_versions.get(db, CATALOG, COMICS) == (2, 3)
+
+        db.delete(comic)
+        db.commit()
+        assert data_versions.get(db, CATALOG, COMICS) == (3, 4)
+    finally:
+        db.close()
+
+
+def test_rating_writes_bump_the_user_and_global_versions():
+    db = _make_session()
+    try:
+        user = db.query(User).first()
+        committed = data_versions.committed(RATINGS)
+        rating = UserRating(user_id=user.id, comic_id=1, rating=4.0)
+        db.add(rating)
+        db.commit()
+        assert data_versions.get(db, RATINGS, user_ratings_key(user.id), user_ratings_key(user.id + 1)) == (1, 1, 0)
+        assert data_versions.committed(RATINGS) == committed + 1
+
+        rating.rating = 5.0
+        db.commit()
+        assert data_versions.get(db, RATINGS, user_ratings_key(user.id)) == (2, 2)
+    finally:
+        db.close()
+
+
+def test_rolled_back_writes_bump_nothing():
+    db = _make_session()
+    try:
+        committed = data_versions.committed(CATALOG)
+        db.add(Comic(title="Comic #1", description="space robot", characters=[], genre="Science Fiction"))
+        db.flush()
+        db.rollback()
+        assert data_versions.get(db, CATALOG) == (1,)
+        assert data_versions.committed(CATALOG) == committed
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    test_comic_content_edits_bump_the_catalog()
+    test_rating_writes_bump_the_user_and_global_versions()
+    test_rolled_back_writes_bump_nothing()
+    print("✅ data version checks passed")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Check MMR re-ranking against a per-pair reference implementation, for dense
+and sparse candidate features.
+
+Needs no database. Run with pytest or directly: python test_diversity.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__))
+
+import numpy as np
+from scipy import sparse
+
+from app.services.diversity import mmr
+
+
+def _features(seed: int, m: int = 60, dim: int = 12) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    features = np.abs(rng.standard_normal((m, dim)))
+    features[rng.random((m, dim)) < 0.6] = 0
+    features[:, 0] += 1e-3  # No empty rows
+    return features / np.linalg.norm(features, axis=1, keepdims=True)
+
+
+def _reference_mmr(features: np.ndarray, relevance: np.ndarray, n: int, lambda_: float):
+    low, high = relevance.min(), relevance.max()
+    relevance = (relevance - low) / (high - low)
+    picked = []
+    while len(picked) < n:
+        best, best_score = None, -np.inf
+        for i in range(len(relevance)):
+            if i in picked:
+                continue
+            redundancy = max((features[i] @ features[j] for j in picked), default=0.0)
+            score = lambda_ * relevance[i] - (1 - lambda_) * redundancy
+            if score > best_score:
+                best, best_score = i, score
+        picked.append(best)
+    return picked
+
+
+def test_mmr_matches_the_reference():
+    for seed in range(3):
+        features = _features(seed)
+        relevance = np.random.default_rng(seed + 10).random(len(features)) * 5
+        for lambda_ in (0.3, 0.7):
+            expected = _reference_mmr(features, relevance, 10, lambda_)
+            assert mmr(features, relevance, 10, lambda_).tolist() == expected
+            assert mmr(sparse.csr_matrix(features), relevance, 10, lambda_).tolist() == expected
+
+
+def test_mmr_edge_cases():
+    features = _features(0)
+    relevance = np.linspace(1.0, 0.0, len(features))
+    # lambda_ = 1 keeps the relevance order
+    assert mmr(features, relevance, 5, 1.0).tolist() == [0, 1, 2, 3, 4]
+    assert len(mmr(features, relevance, 500, 0.5)) == len(features)
+    assert len(mmr(features, relevance, 0, 0.5)) == 0
+    # Near-duplicates of the top candidate are pushed down
+    duplicates = np.vstack([features[:1]] * 3 + [features[1:10]])
+    picked = mmr(duplicates, np.linspace(1.0, 0.9, len(duplicates)), 3, 0.5).tolist()
+    assert picked[0] == 0 and 1 not in picked and 2 not in picked
+
+
+if __name__ == "__main__":
+    test_mmr_matches_the_reference()
+    test_mmr_edge_cases()
+    print("✅ MMR re-ranking matches the reference")
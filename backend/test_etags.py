@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Check the conditional GETs of the comics list, the stats and the user's
+ratings: a matching If-None-Match answers 304, and the tag changes once the
+data it was computed from does.
+
+Runs against an in-memory SQLite database. The global registry's comic
+change tracking is detached and the endpoints read the test database, so
+comic_recommender.db is never opened.
+Run with pytest or directly: python test_etags.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import get_db
+from app.core.security import create_access_token
+from app.main import app
+from app.models import Base, Comic, User, UserRating
+from app.services.model_registry import untrack_comic_changes
+
+# Otherwise every comic committed here asks the global registry to rebuild from comic_recommender.db
+untrack_comic_changes()
+
+
+class _Api:
+    """A test client reading a fresh test database"""
+
+    def __init__(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        self.session_factory = sessionmaker(bind=engine)
+        db = self.session_factory()
+        for i in range(3):
+            db.add(Comic(title=f"Comic #{i}", description="hero city", characters=[], genre="Superhero"))
+        db.add_all([User(email="fan@example.com", password_hash="x"), User(email="other@example.com", password_hash="x")])
+        db.commit()
+        db.close()
+        self.client = TestClient(app)
+
+    def __enter__(self) -> '_Api':
+        def test_db():
+            db = self.session_factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = test_db
+        return self
+
+    def __exit__(self, *exc_info):
+        app.dependency_overrides.pop(get_db, None)
+
+    def get(self, path: str, tag: str = None, user: str = None):
+        headers = {}
+        if tag is not None:
+            headers["If-None-Match"] = tag
+        if user is not None:
+            headers["Authorization"] = f"Bearer {create_access_token(data={'sub': user})}"
+        return self.client.get(path, headers=headers)
+
+    def write(self, *objects):
+        db = self.session_factory()
+        try:
+            db.add_all(objects)
+            db.commit()
+        finally:
+            db.close()
+
+
+def test_comics_and_stats_answer_304_until_the_catalog_changes():
+    with _Api() as api:
+        for path in ("/api/comics/", "/api/stats/stats"):
+            response = api.get(path)
+            assert response.status_code == 200
+            tag = response.headers["etag"]
+            assert tag.startswith('W/"')
+
+            cached = api.get(path, tag)
+            assert cached.status_code == 304
+            assert cached.headers["etag"] == tag
+            assert cached.content == b""
+            assert api.get(path, f'W/"other", {tag}').status_code == 304
+            assert api.get(path, '*').status_code == 304
+
+            api.write(Comic(title=f"New for {path}", description="space robot", characters=[], genre="Science Fiction"))
+            response = api.get(path, tag)
+            assert response.status_code == 200
+            assert response.headers["etag"] != tag
+
+
+def test_image_and_source_backfills_change_the_listings():
+    with _Api() as api:
+        comics_tag = api.get("/api/comics/").headers["etag"]
+        stats = api.get("/api/stats/stats")
+        assert stats.json()["sources"]["marvel"] == 0
+
+        db = api.session_factory()
+        try:
+            comic = db.query(Comic).first()
+            comic.image_url = "https://example.com/cover.jpg"
+            comic.external_id = "marvel_1"
+            db.commit()
+        finally:
+            db.close()
+
+        response = api.get("/api/comics/", comics_tag)
+        assert response.status_code == 200
+        assert response.json()[0]["image_url"] == "https://example.com/cover.jpg"
+        response = api.get("/api/stats/stats", stats.headers["etag"])
+        assert response.status_code == 200
+        assert response.json()["sources"]["marvel"] == 1
+        # No If-None-Match: the stats memo must not serve the old counts either
+        assert api.get("/api/stats/stats").json()["sources"]["marvel"] == 1
+
+
+def test_ratings_tag_is_private_and_per_user():
+    with _Api() as api:
+        response = api.get("/api/ratings/", user="fan@example.com")
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == "private"
+        assert "Authorization" in response.headers["vary"]
+        tag = response.headers["etag"]
+
+        cached = api.get("/api/ratings/", tag, user="fan@example.com")
+        assert cached.status_code == 304
+        assert cached.headers["cache-control"] == "private"
+        # Both users are at version 0; the tag must still not match another user's ratings
+        assert api.get("/api/ratings/", tag, user="other@example.com").status_code == 200
+
+        api.write(UserRating(user_id=2, comic_id=1, rating=4.0))
+        assert api.get("/api/ratings/", tag, user="fan@example.com").status_code == 304
+        api.write(UserRating(user_id=1, comic_id=1, rating=5.0))
+        response = api.get("/api/ratings/", tag, user="fan@example.com")
+        assert response.status_code == 200
+        assert [rating["rating"] for rating in response.json()] == [5.0]
+
+
+if __name__ == "__main__":
+    test_comics_and_stats_answer_304_until_the_catalog_changes()
+    test_image_and_source_backfills_change_the_listings()
+    test_ratings_tag_is_private_and_per_user()
+    print("✅ Conditional GETs answer 304 until their data changes")
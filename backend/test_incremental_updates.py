@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Check that comics created after the model was fitted are added to it
+incrementally, including with quantized dense (LSA) features and when
+another process inserted them.
+
+Runs against an in-memory SQLite database. The global registry's comic
+change tracking is detached and the registries here read the test database
+through their own session factory, so comic_recommender.db is never opened.
+Run with pytest or directly: python test_incremental_updates.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.models import Base, Comic
+from app.services.catalog_changes import CatalogChanges
+from app.services.data_versions import CATALOG, CATALOG_EDITS, COMICS, data_versions
+from app.services.model_registry import ModelRegistry, untrack_comic_changes
+from app.services.quantization import QuantizedDense
+
+# Otherwise every comic committed here asks the global registry to rebuild from comic_recommender.db
+untrack_comic_changes()
+
+GENRES = ["Superhero", "Horror", "Science Fiction", "Fantasy", "Crime"]
+WORDS = ["hero", "city", "mutant", "space", "magic", "detective", "vampire", "robot", "team", "villain"]
+
+
+def _make_registry():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    for i in range(40):
+        db.add(Comic(
+            title=f"Comic #{i}",
+            description=" ".join(WORDS[(i + j) % len(WORDS)] for j in range(4)),
+            characters=[f"Character {i % 7}"],
+            genre=GENRES[i % len(GENRES)],
+        ))
+    db.commit()
+    return db, ModelRegistry(session_factory=session_factory, changes=CatalogChanges())
+
+
+def _create_comic_and_rebuild(db, registry) -> int:
+    registry.get_model(db)
+    comic = Comic(title="New Comic", description="mutant robot team in space", characters=["Character 1"], genre="Superhero")
+    db.add(comic)
+    db.commit()
+    registry.changes.record([comic.id])
+    assert registry.rebuild()
+    return comic.id
+
+
+def test_created_comic_is_added_with_quantized_lsa_features():
+    overrides = {"recommendation_features": "lsa", "vector_precision": "int8", "lsa_dimensions": 8}
+    previous = {name: getattr(settings, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    try:
+        db, registry = _make_registry()
+        comic_id = _create_comic_and_rebuild(db, registry)
+        model = registry.get_model(db)
+    finally:
+        for name, value in previous.items():
+            setattr(settings, name, value)
+
+    assert registry.last_error is None, registry.last_error
+    assert isinstance(model.features, QuantizedDense)
+    assert model.revision == 1  # Applied incrementally, not refitted
+    assert comic_id in model.id_to_row
+    assert model.features.shape[0] == len(model)
+
+
+def test_created_comic_is_hashed_into_the_ann_index():
+    previous = settings.recommendation_strategy, settings.ann_index_path
+    settings.recommendation_strategy, settings.ann_index_path = "ann", None
+    try:
+        db, registry = _make_registry()
+        before = registry.get_model(db).ann_index
+        comic_id = _create_comic_and_rebuild(db, registry)
+        model = registry.get_model(db)
+    finally:
+        settings.recommendation_strategy, settings.ann_index_path = previous
+
+    assert model.revision == 1
+    # Same hyperplanes, one more row in every table
+    assert model.ann_index.planes is before.planes
+    assert model.ann_index.sorted_rows.shape == (before.n_tables, len(model))
+    assert model.id_to_row[comic_id] in model.ann_index.sorted_rows[0]
+
+
+def _write_from_another_process(db, statement, keys):
+    """Run statement and bump keys on a connection of its own, as an ingest script's process would"""
+    with db.get_bind().begin() as connection:
+        connection.execute(statement)
+        data_versions.bump(connection, keys)
+
+
+def test_comics_inserted_by_other_processes_are_appended():
+    previous = settings.recommendation_features
+    settings.recommendation_features = "hashing"
+    try:
+        db, registry = _make_registry()
+        registry.get_model(db)
+        _write_from_another_process(db, Comic.__table__.insert().values(
+            title="Fetched Comic", description="vampire detective city", characters=["Character 2"], genre="Horror",
+        ), [CATALOG, COMICS])
+        assert registry.rebuild()
+        model = registry.get_model(db)
+        assert model.revision == 1  # Appended without a refit
+        assert "Fetched Comic" in model.titles
+
+        _write_from_another_process(db, Comic.__table__.update().where(Comic.id == 1).values(
+            description="magic team villain",
+        ), [CATALOG, CATALOG_EDITS, COMICS])
+        assert registry.rebuild()
+        assert registry.get_model(db).revision == 0  # An edit this process has no id for forces a refit
+    finally:
+        settings.recommendation_features = previous
+
+
+if __name__ == "__main__":
+    test_created_comic_is_added_with_quantized_lsa_features()
+    test_created_comic_is_hashed_into_the_ann_index()
+    test_comics_inserted_by_other_processes_are_appended()
+    print("✅ New comics are added to quantized LSA models and ANN indexes incrementally")
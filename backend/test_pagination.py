@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Check recommendation paging: cursors walk one stored ranking without gaps or
+repeats, forged or foreign cursors answer 400, and cursors into an outdated
+or differently ranked list answer 410.
+
+Runs against an in-memory SQLite database. The global registry's comic
+change tracking is detached and the endpoint is served with private model
+state reading the test database, so comic_recommender.db is never opened.
+Run with pytest or directly: python test_pagination.py
+"""
+import base64
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api import recommendations
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.security import create_access_token
+from app.main import app
+from app.models import Base, Comic, User, UserRating
+from app.services.cache import RecommendationCache
+from app.services.model_registry import ModelRegistry, untrack_comic_changes
+from app.services.pagination import CursorExpired, InvalidCursor, check_cursor, decode_cursor, encode_cursor
+from app.services.popularity import PopularityRanking
+from app.services.recommendation import RecommendationService
+
+# Otherwise every comic committed here asks the global registry to rebuild from comic_recommender.db
+untrack_comic_changes()
+
+GENRES = ["Superhero", "Horror", "Science Fiction", "Fantasy", "Crime"]
+WORDS = ["hero", "city", "mutant", "space", "magic", "detective", "vampire", "robot", "team", "villain"]
+FAN = "fan@example.com"
+
+
+def _make_session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    for i in range(40):
+        db.add(Comic(
+            title=f"Comic #{i}",
+            description=" ".join(WORDS[(i + j) % len(WORDS)] for j in range(4)),
+            characters=[f"Character {i % 7}"],
+            genre=GENRES[i % len(GENRES)],
+        ))
+    db.add(User(email=FAN, password_hash="x"))
+    db.commit()
+    fan = db.query(User).first()
+    for comic_id, rating in [(1, 5.0), (2, 4.0), (3, 1.0)]:
+        db.add(UserRating(user_id=fan.id, comic_id=comic_id, rating=rating))
+    db.commit()
+    db.close()
+    return session_factory
+
+
+class _Api:
+    """A test client whose recommendation endpoint uses private model state over the test database"""
+
+    def __init__(self):
+        self.session_factory = _make_session_factory()
+        self.registry = ModelRegistry(session_factory=self.session_factory)
+        self.cache = RecommendationCache()
+        self.popularity = PopularityRanking(session_factory=self.session_factory)
+        self.headers = {"Authorization": f"Bearer {create_access_token(data={'sub': FAN})}"}
+        self.client = TestClient(app)
+
+    def service(self, db) -> RecommendationService:
+        return RecommendationService(db, registry=self.registry, cache=self.cache, popularity=self.popularity)
+
+    def __enter__(self) -> '_Api':
+        def test_db():
+            db = self.session_factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = test_db
+        recommendations.RecommendationService = self.service
+        return self
+
+    def __exit__(self, *exc_info):
+        app.dependency_overrides.pop(get_db, None)
+        recommendations.RecommendationService = RecommendationService
+
+    def page(self, limit: int, cursor: str = None):
+        params = {"limit": limit} if cursor is None else {"limit": limit, "cursor": cursor}
+        return self.client.get("/api/recommendations/", params=params, headers=self.headers)
+
+
+def _raw_cursor(cursor: str) -> str:
+    return base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+
+
+def _forge(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def test_cursor_round_trip():
+    ranked_ids = [7, 3, 9, 1]
+    cursor = encode_cursor(2, 4, 1, ('v', 1), ranked_ids)
+    offset, size, fingerprint = decode_cursor(cursor, max_size=4)
+    assert (offset, size) == (2, 4)
+    check_cursor(fingerprint, 1, 4, ('v', 1), ranked_ids)
+
+    for user_id, size, version, ids in [(2, 4, ('v', 1), ranked_ids), (1, 4, ('v', 2), ranked_ids),
+                                         (1, 4, ('v', 1), [3, 7, 9, 1]), (1, 3, ('v', 1), ranked_ids)]:
+        try:
+            check_cursor(fingerprint, user_id, size, version, ids)
+        except CursorExpired:
+            continue
+        raise AssertionError(f"cursor accepted for {(user_id, size, version, ids)}")
+
+
+def test_malformed_or_oversized_cursors_are_rejected():
+    for cursor in ["", "not a cursor", _forge("0.10.abc"), _forge("5.5.abc"), _forge("1.10")]:
+        try:
+            decode_cursor(cursor, max_size=100)
+        except InvalidCursor as e:
+            assert not isinstance(e, CursorExpired)
+            continue
+        raise AssertionError(f"accepted {cursor!r}")
+    try:
+        decode_cursor(_forge("1.1000000.abc"), max_size=100)
+    except InvalidCursor:
+        pass
+    else:
+        raise AssertionError("accepted a ranking size no page was issued with")
+
+
+def test_pages_walk_one_ranking_without_gaps_or_repeats():
+    with _Api() as api:
+        response = api.page(5)
+        assert response.status_code == 200
+        seen = [item["comic"]["id"] for item in response.json()]
+        cursor = response.headers.get("x-next-cursor")
+        while cursor is not None:
+            response = api.page(5, cursor)
+            assert response.status_code == 200
+            seen.extend(item["comic"]["id"] for item in response.json())
+            cursor = response.headers.get("x-next-cursor")
+
+        db = api.session_factory()
+        try:
+            expected = [comic_id for comic_id, _, _ in api.service(db).rank(
+                api.registry.get_model(db), 1, {1: 5.0, 2: 4.0, 3: 1.0}, settings.recommendation_ranking_size,
+            )]
+        finally:
+            db.close()
+        assert seen == expected
+        assert len(seen) == len(set(seen)) == 37  # Every comic but the three rated ones
+
+
+def test_bad_cursors_and_limits_answer_400_or_422():
+    with _Api() as api:
+        assert api.page(5, "garbage").status_code == 400
+        cursor = api.page(5).headers["x-next-cursor"]
+        offset, size, fingerprint = _raw_cursor(cursor).split('.')
+        # A forged ranking size is refused before anything is ranked for it
+        assert api.page(5, _forge(f"{offset}.{10 ** 9}.{fingerprint}")).status_code == 400
+        # Within bounds, a size the cursor was not issued with fails its fingerprint
+        assert api.page(5, _forge(f"{offset}.{int(size) - 1}.{fingerprint}")).status_code == 410
+        assert api.page(settings.recommendation_max_page_size + 1).status_code == 422
+
+
+def test_cursors_expire_when_the_user_rates_or_the_ranking_differs():
+    with _Api() as api:
+        cursor = api.page(5).headers["x-next-cursor"]
+        assert api.page(5, cursor).status_code == 200
+
+        # Another worker at the same data versions whose model ranks differently
+        api.cache = RecommendationCache(max_entries=0)
+        original = RecommendationService.rank
+
+        def reversed_rank(self, *args, **kwargs):
+            return original(self, *args, **kwargs)[::-1]
+
+        RecommendationService.rank = reversed_rank
+        try:
+            response = api.page(5, cursor)
+        finally:
+            RecommendationService.rank = original
+        assert response.status_code == 410
+
+        db = api.session_factory()
+        try:
+            db.add(UserRating(user_id=1, comic_id=4, rating=2.0))
+            db.commit()
+        finally:
+            db.close()
+        response = api.page(5, cursor)
+        assert response.status_code == 410
+        assert "first page" in response.json()["detail"]
+
+
+if __name__ == "__main__":
+    test_cursor_round_trip()
+    test_malformed_or_oversized_cursors_are_rejected()
+    test_pages_walk_one_ranking_without_gaps_or_repeats()
+    test_bad_cursors_and_limits_answer_400_or_422()
+    test_cursors_expire_when_the_user_rates_or_the_ranking_differs()
+    print("✅ Recommendation cursors page one ranking and expire with it")
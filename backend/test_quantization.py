@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Check that float16 and int8 stored features score close to the exact
+features, keep row norms, and append rows without re-quantizing old ones
+or copying the matrix on every append.
+
+Needs no database. Run with pytest or directly: python test_quantization.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__))
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from app.services.quantization import (
+    QuantizedDense, QuantizedSparse, full_precision, quantize, stack_rows, stored_values,
+)
+
+WORDS = ["hero", "city", "mutant", "space", "magic", "detective", "vampire", "robot", "team", "villain"]
+# Largest absolute cosine error allowed per precision
+TOLERANCE = {'float16': 2e-3, 'int8': 3e-2}
+
+
+def _sparse_features() -> sparse.csr_matrix:
+    rng = np.random.default_rng(0)
+    texts = [" ".join(rng.choice(WORDS, 6)) + f" issue{i % 50}" for i in range(300)]
+    return TfidfVectorizer().fit_transform(texts).astype(np.float32)
+
+
+def _dense_features() -> np.ndarray:
+    features = np.random.default_rng(1).standard_normal((300, 64)).astype(np.float32)
+    return features / np.linalg.norm(features, axis=1, keepdims=True)
+
+
+def _dense(matrix) -> np.ndarray:
+    matrix = full_precision(matrix)
+    return matrix.toarray() if sparse.issparse(matrix) else np.asarray(matrix)
+
+
+def _codes(matrix) -> np.ndarray:
+    return matrix.data if isinstance(matrix, QuantizedSparse) else matrix.codes
+
+
+def test_quantized_scores_match_exact():
+    for exact in (_sparse_features(), _dense_features()):
+        query = np.asarray(exact[:5].sum(axis=0)).ravel()
+        query /= np.linalg.norm(query)
+        expected = np.asarray(exact @ query).ravel()
+        for precision, tolerance in TOLERANCE.items():
+            stored = quantize(exact, precision)
+            assert isinstance(stored, (QuantizedSparse, QuantizedDense)) and stored.precision == precision
+            scores = np.asarray(stored @ query).ravel()
+            assert np.abs(scores - expected).max() < tolerance, precision
+            assert np.allclose(np.linalg.norm(_dense(stored), axis=1), 1.0, atol=1e-4)
+            # Top of the ranking survives the rounding
+            assert set(np.argsort(-scores)[:5]) & set(np.argsort(-expected)[:5])
+
+
+def test_appended_rows_keep_existing_codes():
+    for exact in (_sparse_features(), _dense_features()):
+        stored = quantize(exact[:200], 'int8')
+        grown = stack_rows(stored, exact[200:])
+        assert grown.shape == exact.shape
+        assert np.array_equal(_codes(grown.take(np.arange(200))), _codes(stored))
+        # New rows are quantized exactly as a full quantization would
+        assert np.allclose(_dense(grown)[200:], _dense(quantize(exact, 'int8'))[200:])
+
+
+def test_appends_fill_spare_capacity_and_leave_older_matrices_alone():
+    for exact in (_sparse_features(), _dense_features()):
+        for precision in (None, 'int8'):
+            first = stack_rows(quantize(exact[:100], precision), exact[100:101])
+            matrices = [first]
+            for row in range(101, 110):
+                matrices.append(stack_rows(matrices[-1], exact[row:row + 1]))
+            # Later appends wrote into the first append's buffer instead of copying it
+            assert np.shares_memory(stored_values(first), stored_values(matrices[-1])), precision
+            for matrix in matrices:
+                n = matrix.shape[0]
+                assert np.allclose(_dense(matrix), _dense(quantize(exact[:n], precision)), atol=1e-2)
+
+            # A discarded append past an older matrix is overwritten by the next one from it
+            older = matrices[3]
+            replaced = stack_rows(older, exact[200:201])
+            assert np.allclose(_dense(replaced)[-1], _dense(quantize(exact[200:201], precision))[0], atol=1e-2)
+            assert np.allclose(_dense(older), _dense(quantize(exact[:older.shape[0]], precision)), atol=1e-2)
+
+
+if __name__ == "__main__":
+    test_quantized_scores_match_exact()
+    test_appended_rows_keep_existing_codes()
+    test_appends_fill_spare_capacity_and_leave_older_matrices_alone()
+    print("✅ Quantized features score like the exact ones")
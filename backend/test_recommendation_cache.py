@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Check the per-user recommendation cache: LRU eviction, expiry after the
+time-to-live, version-keyed lookups and per-user invalidation.
+
+Needs no database. Run with pytest or directly: python test_recommendation_cache.py
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(__file__))
+
+from app.services.cache import RecommendationCache
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = RecommendationCache(max_entries=2)
+    cache.set(1, 100, "v1", ["a"])
+    cache.set(2, 100, "v1", ["b"])
+    assert cache.get(1, 100, "v1") == ["a"]  # User 1 is now the most recently used
+    cache.set(3, 100, "v1", ["c"])
+    assert cache.get(2, 100, "v1") is None
+    assert cache.get(1, 100, "v1") == ["a"]
+    assert cache.get(3, 100, "v1") == ["c"]
+    stats = cache.stats()
+    assert (stats["entries"], stats["evictions"], stats["hits"], stats["misses"]) == (2, 1, 3, 1)
+
+
+def test_entries_expire_after_the_ttl():
+    cache = RecommendationCache(ttl_seconds=0.05)
+    cache.set(1, 100, "v1", ["a"])
+    assert cache.get(1, 100, "v1") == ["a"]
+    time.sleep(0.1)
+    assert cache.get(1, 100, "v1") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_entries_are_keyed_on_size_and_version():
+    cache = RecommendationCache()
+    cache.set(1, 100, ("model", 1, "ratings", 4), ["a"])
+    assert cache.get(1, 100, ("model", 1, "ratings", 5)) is None
+    assert cache.get(1, 200, ("model", 1, "ratings", 4)) is None
+    assert cache.get(2, 100, ("model", 1, "ratings", 4)) is None
+    assert cache.get(1, 100, ("model", 1, "ratings", 4)) == ["a"]
+
+
+def test_invalidate_user_drops_only_that_user():
+    cache = RecommendationCache()
+    cache.set(1, 100, "v1", ["a"])
+    cache.set(1, 200, "v2", ["b"])
+    cache.set(2, 100, "v1", ["c"])
+    cache.invalidate_user(1)
+    assert cache.get(1, 100, "v1") is None
+    assert cache.get(1, 200, "v2") is None
+    assert cache.get(2, 100, "v1") == ["c"]
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+
+
+if __name__ == "__main__":
+    test_least_recently_used_entries_are_evicted()
+    test_entries_expire_after_the_ttl()
+    test_entries_are_keyed_on_size_and_version()
+    test_invalidate_user_drops_only_that_user()
+    print("✅ Recommendation cache evicts, expires and invalidates")
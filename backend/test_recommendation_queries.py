@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Check that generating recommendations runs a fixed number of SQL queries,
+whatever the requested limit is.
+
+Runs against an in-memory SQLite database. The global registry's comic
+change tracking is detached and every model here reads the test database
+through its own session factory, so comic_recommender.db is never opened.
+Run with pytest or directly: python test_recommendation_queries.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(__file__))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.models import Base, Comic, User, UserRating
+from app.services.cache import RecommendationCache
+from app.services.collaborative import CoRatingModel
+from app.services.model_registry import ModelRegistry, untrack_comic_changes
+from app.services.popularity import PopularityRanking
+from app.services.recommendation import RecommendationService
+
+# Otherwise every comic committed here asks the global registry to rebuild from comic_recommender.db
+untrack_comic_changes()
+
+GENRES = ["Superhero", "Horror", "Science Fiction", "Fantasy", "Crime"]
+WORDS = ["hero", "city", "mutant", "space", "magic", "detective", "vampire", "robot", "team", "villain"]
+
+
+def _make_session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    for i in range(40):
+        db.add(Comic(
+            title=f"Comic #{i}",
+            description=" ".join(WORDS[(i + j) % len(WORDS)] for j in range(4)),
+            characters=[f"Character {i % 7}", f"Character {i % 3}"],
+            genre=GENRES[i % len(GENRES)],
+        ))
+    db.add_all([User(email="fan@example.com", password_hash="x"), User(email="new@example.com", password_hash="x")])
+    db.commit()
+
+    fan = db.query(User).filter(User.email == "fan@example.com").first()
+    for comic_id, rating in [(1, 5.0), (2, 4.0), (3, 3.0), (4, 1.0)]:
+        db.add(UserRating(user_id=fan.id, comic_id=comic_id, rating=rating))
+    db.commit()
+    return engine, db
+
+
+def _count_queries(engine, func) -> int:
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        func()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return len(statements)
+
+
+def _service(db) -> RecommendationService:
+    # Private model state reading the test database, and a cache that keeps nothing, so every call recomputes
+    session_factory = sessionmaker(bind=db.get_bind())
+    return RecommendationService(
+        db,
+        registry=ModelRegistry(session_factory=session_factory),
+        cache=RecommendationCache(max_entries=0),
+        popularity=PopularityRanking(session_factory=session_factory),
+    )
+
+
+def test_recommendation_query_count_is_independent_of_limit():
+    engine, db = _make_session()
+    service = _service(db)
+    fan = db.query(User).filter(User.email == "fan@example.com").first()
+    service.get_recommendations(fan.id, 1)  # Fit the content model first
+
+    counts = {}
+    for limit in (1, 5, 20):
+        recommendations = []
+        counts[limit] = _count_queries(engine, lambda: recommendations.extend(service.get_recommendations(fan.id, limit)))
+        assert len(recommendations) == limit
+
+    # Data versions, the user's ratings, and one IN query for the results
+    assert set(counts.values()) == {3}, counts
+
+
+def test_cold_start_query_count_is_independent_of_limit():
+    engine, db = _make_session()
+    service = _service(db)
+    new_user = db.query(User).filter(User.email == "new@example.com").first()
+    service.get_recommendations(new_user.id, 1)
+
+    counts = {limit: _count_queries(engine, lambda: service.get_recommendations(new_user.id, limit)) for limit in (1, 5, 20)}
+    # Data versions, the user's ratings, and one IN query; popularity is precomputed
+    assert set(counts.values()) == {3}, counts
+
+
+def test_collaborative_strategies_fall_back_to_the_profile_ranking():
+    engine, db = _make_session()
+    service = _service(db)
+    # The fan is the only rater, so nothing is co-rated, and no ALS factors were trained
+    service.co_rating = CoRatingModel()
+    service.co_rating.load(db.query(UserRating.user_id, UserRating.comic_id, UserRating.rating).all())
+    fan = db.query(User).filter(User.email == "fan@example.com").first()
+    ratings = dict(db.query(UserRating.comic_id, UserRating.rating).filter(UserRating.user_id == fan.id).all())
+    model = service.registry.get_model(db)
+
+    previous = settings.als_model_dir
+    settings.als_model_dir = tempfile.mkdtemp(prefix="als-test-")
+    try:
+        expected = [comic_id for comic_id, _, _ in service.rank(model, fan.id, ratings, 5, strategy="profile")]
+        for strategy in ("collaborative", "als"):
+            assert [comic_id for comic_id, _, _ in service.rank(model, fan.id, ratings, 5, strategy=strategy)] == expected
+    finally:
+        os.rmdir(settings.als_model_dir)
+        settings.als_model_dir = previous
+
+
+if __name__ == "__main__":
+    test_recommendation_query_count_is_independent_of_limit()
+    test_cold_start_query_count_is_independent_of_limit()
+    test_collaborative_strategies_fall_back_to_the_profile_ranking()
+    print("✅ Recommendation query counts are independent of the limit")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Train the ALS matrix-factorization recommender from the user_ratings table.
+
+Writes float32 user/item factor matrices and their id arrays as .npy files to
+a new version directory under ALS_MODEL_DIR (default ./model_data/als), or
+float16 / int8 codes with per-row scales when --precision (default VECTOR_PRECISION) asks for
+them, and then points ALS_MODEL_DIR/CURRENT at it. A running API picks up the
+new factors on its next "als" recommendation request.
+
+Usage: python train_als.py [--factors 32] [--iterations 10] [--regularization 0.1] [--jobs N]
+                           [--precision float16|int8]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(__file__))
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import UserRating
+from app.services.als import save_factors, train_als
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train ALS factors from user ratings")
+    parser.add_argument('--factors', type=int, default=32)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--regularization', type=float, default=0.1)
+    parser.add_argument('--jobs', type=int, default=None, help="Solver threads (default: all cores)")
+    parser.add_argument('--output', default=settings.als_model_dir)
+    parser.add_argument('--precision', default=settings.vector_precision, choices=('float32', 'float16', 'int8'))
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        ratings = db.query(UserRating.user_id, UserRating.comic_id, UserRating.rating).all()
+    finally:
+        db.close()
+
+    if not ratings:
+        print("❌ No ratings to train on")
+        return
+
+    print(f"🧮 Training ALS on {len(ratings)} ratings ({args.factors} factors, {args.iterations} iterations)...")
+    start = time.perf_counter()
+    user_factors, item_factors, user_ids, item_ids = train_als(
+        ratings,
+        n_factors=args.factors,
+        regularization=args.regularization,
+        iterations=args.iterations,
+        n_jobs=args.jobs,
+    )
+    print(f"✅ Trained {len(user_ids)} users x {len(item_ids)} comics in {time.perf_counter() - start:.1f}s")
+
+    name = save_factors(args.output, user_factors, item_factors, user_ids, item_ids, precision=args.precision)
+    print(f"💾 Saved {args.precision or 'float32'} factors to {os.path.join(args.output, name)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Compare the approximate (LSH) recommendation index against exact search.
+
+Builds the content model from the current database, then reports recall@k and
+per-query latency for a grid of ANN settings so the ANN_* settings can be tuned.
+
+Usage: python tune_ann.py [--k 10] [--queries 200] [--tables 4 8 16] [--bits 6 8 10] [--probes 0 2 4]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+from scipy import sparse
+
+sys.path.append(os.path.dirname(__file__))
+
+from app.core.database import SessionLocal
+from app.services.ann import LSHIndex, compare_with_exact
+from app.services.model_registry import model_registry
+from app.services.quantization import full_precision
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the ANN recommendation index against exact search")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--tables', type=int, nargs='+', default=[4, 8, 16])
+    parser.add_argument('--bits', type=int, nargs='+', default=None)
+    parser.add_argument('--probes', type=int, nargs='+', default=[0, 2, 4])
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        model = model_registry.get_model(db)
+    finally:
+        db.close()
+
+    if model.features is None:
+        print("❌ Need at least two comics in the database")
+        return
+
+    vectors = model.features
+    rng = np.random.default_rng(0)
+    rows = rng.choice(vectors.shape[0], size=min(args.queries, vectors.shape[0]), replace=False)
+    # Query with the full-precision rows; CSR (tfidf, hashing) or dense (lsa)
+    query_rows = full_precision(vectors)[rows]
+    queries = list(query_rows.toarray() if sparse.issparse(query_rows) else np.asarray(query_rows))
+    bits_grid = args.bits or [None]
+
+    print(f"📚 {vectors.shape[0]} comics, {vectors.shape[1]} features, {len(queries)} queries, k={args.k}")
+    print(f"{'tables':>6} {'bits':>5} {'probes':>6} {'recall':>7} {'ann ms':>8} {'exact ms':>9} {'index KB':>9}")
+    for n_tables in args.tables:
+        for n_bits in bits_grid:
+            index = LSHIndex(n_tables=n_tables, n_bits=n_bits).build(vectors)
+            for n_probes in args.probes:
+                index.n_probes = n_probes
+                result = compare_with_exact(index, queries, k=args.k)
+                print(f"{n_tables:>6} {index.n_bits:>5} {n_probes:>6} {result['recall_at_k']:>7.3f} "
+                      f"{result['ann_ms']:>8.3f} {result['exact_ms']:>9.3f} {index.nbytes / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
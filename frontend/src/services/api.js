@@ -67,6 +67,10 @@ export const ratingsAPI = {
 export const recommendationsAPI = {
   getRecommendations: (limit = 5) => 
     api.get(`/recommendations?limit=${limit}`),
+  
+  // The cursor is the X-Next-Cursor header of the previous page
+  getMoreRecommendations: (cursor, limit = 5) => 
+    api.get(`/recommendations?limit=${limit}&cursor=${encodeURIComponent(cursor)}`),
 };
 
 export default api;
\ No newline at end of file